@@ -0,0 +1,112 @@
+"""
+Payload compression: bytes and airtime saved per message and CPU cost.
+
+Compares plain raw deflate with deflate against a preset dictionary trained
+on half of the corpus, measured on the other half. The corpus is one payload
+per line (e.g. captured `sender_name|content` messages). Without one, a
+synthetic corpus of chat lines and telemetry readings is used.
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/compression.py [--corpus FILE] [--output DICT]
+
+--output writes the trained dictionary, for SecureLoRa(compression_dict=...).
+"""
+import argparse
+import random
+import time
+
+from secure_lora.airtime import time_on_air
+from secure_lora.compression import Compressor, train_dictionary
+from secure_lora.constants import MAX_PAYLOAD_SIZE
+from secure_lora.packet import COMPACT_HEADER, DESTINATION
+
+# Compact unicast frame around the payload: header, 3-byte counter, 8-byte tag, RadioHead
+FRAME_OVERHEAD = COMPACT_HEADER.size + DESTINATION.size + 3 + 8 + 4
+SPREADING_FACTORS = (7, 10, 12)
+
+NAMES = ("alice", "bob", "field-station-3", "pump house", "north gate", "Micah")
+PHRASES = (
+    "on my way back to the gate", "battery low, heading to base", "all clear here",
+    "can you check the north fence?", "water level looks normal", "see you at the truck",
+    "signal is weak near the creek", "ok", "copy that", "need a hand with the pump",
+)
+
+
+def synthetic_corpus(count: int, seed: int = 1) -> list[bytes]:
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        name = rng.choice(NAMES)
+        if rng.random() < 0.5:
+            content = rng.choice(PHRASES)
+        else:
+            content = (f"temp={rng.uniform(-5, 35):.1f}C hum={rng.randint(10, 99)}% "
+                       f"batt={rng.uniform(3.3, 4.2):.2f}V rssi={rng.randint(-120, -40)}")
+        corpus.append(f"{name}|{content}".encode("utf-8")[:MAX_PAYLOAD_SIZE])
+    return corpus
+
+
+def measure(compressor: Compressor, messages: list[bytes]) -> dict:
+    sizes = []
+    raw = 0
+    start = time.perf_counter()
+    for message in messages:
+        compressed = compressor.compress(message)
+        if compressed is None:
+            raw += 1
+            sizes.append(len(message))
+        else:
+            sizes.append(len(compressed))
+    compress_time = (time.perf_counter() - start) / len(messages)
+
+    compressed_messages = [c for c in map(compressor.compress, messages) if c is not None]
+    start = time.perf_counter()
+    for data in compressed_messages:
+        compressor.decompress(data, MAX_PAYLOAD_SIZE)
+    decompress_time = (time.perf_counter() - start) / max(1, len(compressed_messages))
+
+    return {"sizes": sizes, "raw": raw, "compress_us": compress_time * 1e6, "decompress_us": decompress_time * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="file with one payload per line")
+    parser.add_argument("--output", help="write the dictionary trained on the whole corpus here")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, "rb") as f:
+            corpus = [line.rstrip(b"\n") for line in f if line.strip()]
+    else:
+        corpus = synthetic_corpus(2000)
+    random.Random(2).shuffle(corpus)
+    training, messages = corpus[:len(corpus) // 2], corpus[len(corpus) // 2:]
+
+    start = time.perf_counter()
+    zdict = train_dictionary(training)
+    print(f"{len(corpus)} messages, dictionary of {len(zdict)} bytes trained in {time.perf_counter() - start:.1f}s")
+
+    original = sum(map(len, messages)) / len(messages)
+    print(f"\n{'':>12} {'bytes/msg':>10} {'ratio':>6} {'raw':>5} {'compress':>10} {'decompress':>11} "
+          + " ".join(f"{'SF' + str(sf) + ' saved':>12}" for sf in SPREADING_FACTORS))
+    print(f"{'none':>12} {original:>10.1f} {1:>6.2f}")
+    for label, compressor in (("deflate", Compressor()), ("dictionary", Compressor(zdict))):
+        result = measure(compressor, messages)
+        sizes = result["sizes"]
+        mean = sum(sizes) / len(sizes)
+        saved = []
+        for sf in SPREADING_FACTORS:
+            before = sum(time_on_air(len(m) + FRAME_OVERHEAD, sf) for m in messages)
+            after = sum(time_on_air(size + FRAME_OVERHEAD, sf) for size in sizes)
+            saved.append(f"{100 * (before - after) / before:>11.0f}%")
+        print(f"{label:>12} {mean:>10.1f} {original / mean:>6.2f} {100 * result['raw'] / len(messages):>4.0f}% "
+              f"{result['compress_us']:>8.1f}us {result['decompress_us']:>9.1f}us " + " ".join(saved))
+
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(train_dictionary(corpus))
+        print(f"\nDictionary written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Discovery beacon airtime per hour: fixed 5 s beacons vs. Trickle intervals.
+
+Simulates a mesh on a virtual clock. Every node runs the same TrickleTimer
+as SecureLoRa, suppresses its beacon when it broadcast DATA within the
+current interval, and resets when a node joins halfway through the hour.
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/discovery_airtime.py
+"""
+import heapq
+import itertools
+import random
+
+from secure_lora.airtime import time_on_air
+from secure_lora.packet import PACKET_HEADER
+from secure_lora.constants import AUTH_TAG_SIZE
+from secure_lora.trickle import TrickleTimer
+
+HOUR = 3600.0
+FIXED_INTERVAL = 5.0
+NODES = (5, 20, 50)
+SPREADING_FACTORS = (7, 10, 12)
+DATA_INTERVALS = (None, 60.0)  # seconds between broadcast DATA frames per node
+DISCOVERY_FRAME = PACKET_HEADER.size + 5 + AUTH_TAG_SIZE + 4  # header, payload, tag, RadioHead
+
+
+class Simulation:
+    def __init__(self, nodes: int, data_interval: float | None, seed: int = 1):
+        self.now = 0.0
+        self._events = []
+        self._sequence = itertools.count()
+        self.rng = random.Random(seed)
+        self.data_interval = data_interval
+        self.beacons = 0
+        self.timers = []
+        self.last_data = []
+        for _ in range(nodes):
+            self.add_node()
+        self.schedule(HOUR / 2, self.join)
+
+    def schedule(self, delay, callback):
+        heapq.heappush(self._events, (self.now + delay, next(self._sequence), callback))
+
+    def add_node(self):
+        index = len(self.timers)
+        self.last_data.append(float("-inf"))
+        timer = TrickleTimer(lambda: self.beacon(index), self.schedule, rng=self.rng)
+        self.timers.append(timer)
+        timer.start()
+        if self.data_interval:
+            self.schedule(self.rng.uniform(0, self.data_interval), lambda: self.send_data(index))
+
+    def beacon(self, index):
+        if self.now - self.last_data[index] >= self.timers[index].interval:
+            self.beacons += 1
+
+    def send_data(self, index):
+        self.last_data[index] = self.now
+        self.schedule(self.data_interval, lambda: self.send_data(index))
+
+    def join(self):
+        # Everyone hears the newcomer: a topology change
+        for timer in self.timers:
+            timer.reset()
+        self.add_node()
+
+    def run(self) -> int:
+        while self._events and self._events[0][0] <= HOUR:
+            self.now, _, callback = heapq.heappop(self._events)
+            callback()
+        return self.beacons
+
+
+def main():
+    print("Discovery beacon airtime per hour (s), one node joins at 30 min")
+    header = f"{'nodes':>6} {'data':>6} {'beacons fixed/trickle':>22}"
+    header += "".join(f" {'SF' + str(sf) + ' fixed/trickle':>22}" for sf in SPREADING_FACTORS)
+    print(header)
+    for nodes in NODES:
+        for data_interval in DATA_INTERVALS:
+            # The joining node beacons for the second half-hour
+            fixed = int(nodes * HOUR / FIXED_INTERVAL + HOUR / 2 / FIXED_INTERVAL)
+            trickle = Simulation(nodes, data_interval).run()
+            row = f"{nodes:>6} {data_interval or '-':>6} {f'{fixed}/{trickle}':>22}"
+            for sf in SPREADING_FACTORS:
+                airtime = time_on_air(DISCOVERY_FRAME, spreading_factor=sf)
+                row += f" {f'{fixed * airtime:.0f}/{trickle * airtime:.1f}':>22}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
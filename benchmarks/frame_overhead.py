@@ -0,0 +1,48 @@
+"""
+Bytes on air per message: full-header (version 3) frames vs. compact (version 2) frames.
+
+Run from the repo root:
+    PYTHONPATH=src python benchmarks/frame_overhead.py
+"""
+from secure_lora.constants import *
+from secure_lora.packet import Packet, make_nonce
+
+SENDER_ID = 0xA3F91C42
+DESTINATION = 0xB4E82D53
+COUNTER = 5000  # a node that has been up for a while
+PAYLOAD_SIZES = (8, 16, 32, 64, 128)
+
+
+def frame_size(version: int, payload_size: int, destination: int, tag_size: int = AUTH_TAG_SIZE) -> int:
+    packet = Packet(
+        version=version,
+        sender_id=SENDER_ID,
+        msg_type=MsgType.DATA,
+        payload=bytes(payload_size),
+        auth_tag=bytes(tag_size),
+        nonce=make_nonce(COUNTER, SENDER_ID),
+        destination=destination,
+        tag_size=tag_size,
+    )
+    return len(packet.serialize())
+
+
+def main():
+    columns = [("full", PROTOCOL_VERSION, AUTH_TAG_SIZE)] + [
+        (f"v2/tag{size}", COMPACT_PROTOCOL_VERSION, size) for size in COMPACT_TAG_SIZES
+    ]
+
+    for label, destination in (("unicast", DESTINATION), ("broadcast", BROADCAST_ID)):
+        print(f"\n{label} frames (bytes on air, saving vs full)")
+        print(f"{'payload':>8} " + " ".join(f"{name:>14}" for name, _, _ in columns))
+        for payload_size in PAYLOAD_SIZES:
+            full = frame_size(PROTOCOL_VERSION, payload_size, destination)
+            cells = []
+            for _, version, tag_size in columns:
+                size = frame_size(version, payload_size, destination, tag_size)
+                cells.append(f"{size:>5} ({full - size:>2}, {100 * (full - size) / full:>3.0f}%)")
+            print(f"{payload_size:>8} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
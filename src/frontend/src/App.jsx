@@ -135,6 +135,12 @@ function App() {
           );
         }
 
+        if (data.type === 'message_update') {
+          setMessages((prev) =>
+            prev.map((m) => (m.id === data.data.id ? data.data : m))
+          );
+        }
+
         if (data.type === 'nodes_update') {
           console.log('Nodes updated via websocket:', data.data);
           setNodes(data.data);
@@ -445,6 +451,12 @@ function App() {
                               <div className="w-3 h-3 border-2 border-gray-400 border-t-transparent rounded-full animate-spin" />
                             )}
                             
+                            {m.status === 'queued' && (
+                              <span title="Waiting for the recipient to come back in range" className="text-gray-400 text-xs leading-none">
+                                🕓
+                              </span>
+                            )}
+
                             {m.status === 'sent' && (
                               <svg className="w-3.5 h-3.5 text-blue-400" fill="none" stroke="currentColor" viewBox="0 0 24 24">
                                 <path strokeLinecap="round" strokeLinejoin="round" strokeWidth="3" d="M5 13l4 4L19 7" />
@@ -192,7 +192,7 @@ def example_message_parser(data: bytes) -> dict:
 def secure_lora_packet_parser(data: bytes) -> dict:
     """
     Parse SecureLora packet structure and extract header fields.
-    Packet format: Version (1) | SenderID (4) | MsgType (1) | Nonce (12) | Payload (encrypted) | AuthTag (16)
+    Packet format: Version (1) | SenderID (4) | MsgType (1) | Destination (4) | Nonce (12) | Payload (encrypted) | AuthTag (16)
 
     Note: This parser can only extract header information. The payload is encrypted and cannot
     be decrypted without the encryption keys. Decryption happens at the receiver side in SecureLora._process_raw_packet.
@@ -205,12 +205,34 @@ def secure_lora_packet_parser(data: bytes) -> dict:
         2: 'ACK',
         3: 'COMMAND',
         4: 'RESPONSE',
-        5: 'DISCOVERY'
+        5: 'DISCOVERY',
+        6: 'FRAGMENT',
+        7: 'AGGREGATE',
+        8: 'RELIABLE',
+        9: 'ROUTE_REQUEST',
+        10: 'ROUTE_REPLY',
+        11: 'ROUTE_ERROR',
+        12: 'ROUTED'
     }
 
     try:
-        # Header format: "!B I B 12s" = 1 + 4 + 1 + 12 = 18 bytes
-        header_size = 18
+        # Compact (v2) frames carry the version in the high nibble of byte 0
+        if data and data[0] >> 4 == 2:
+            from secure_lora.packet import Packet
+            packet = Packet.parse(data)
+            return {
+                'format': 'SecureLora',
+                'version': packet.version,
+                'packet_sender_id': f'0x{packet.sender_id:08X}',
+                'msg_type': MSG_TYPES.get(packet.msg_type, f'UNKNOWN({packet.msg_type})'),
+                'destination': 'BROADCAST' if packet.destination == 0xFFFFFFFF else f'0x{packet.destination:08X}',
+                'counter': packet.counter,
+                'payload_size': len(packet.payload),
+                'payload_preview': bytes(packet.payload[:16]).hex()
+            }
+
+        # Header format: "!B I B I 12s" = 1 + 4 + 1 + 4 + 12 = 22 bytes
+        header_size = 22
         auth_tag_size = 16
 
         # Check if this looks like a SecureLora packet
@@ -224,10 +246,11 @@ def secure_lora_packet_parser(data: bytes) -> dict:
             }
 
         # Try to parse as SecureLora packet
-        version, sender_id, msg_type, nonce = struct.unpack("!B I B 12s", data[:header_size])
+        version, sender_id, msg_type, destination, nonce = struct.unpack("!B I B I 12s", data[:header_size])
+        msg_type &= 0x0F  # high nibble is the relay hop field
 
-        # Validate version (should be 1)
-        if version != 1:
+        # Validate version (3, the full header)
+        if version != 3:
             # Probably not a SecureLora packet
             text = data.decode('utf-8', errors='ignore')
             return {
@@ -252,6 +275,7 @@ def secure_lora_packet_parser(data: bytes) -> dict:
             'version': version,
             'packet_sender_id': f'0x{sender_id:08X}',
             'msg_type': MSG_TYPES.get(msg_type, f'UNKNOWN({msg_type})'),
+            'destination': 'BROADCAST' if destination == 0xFFFFFFFF else f'0x{destination:08X}',
             'counter': counter,
             'payload_size': payload_size,
             'payload_preview': f'{payload_preview}...' if len(payload_preview) == 32 else payload_preview
@@ -0,0 +1,79 @@
+"""
+Adaptive data rate: per-neighbour spreading factor / bandwidth selection.
+
+The SNR of frames heard from a neighbour is smoothed per link and, assuming
+the link is symmetric, used to pick the fastest SF/BW pair whose demodulation
+floor plus a safety margin is still below the expected SNR. Narrowing the
+bandwidth lowers the noise floor by 10*log10(bw_heard / bw).
+"""
+import math
+
+from .airtime import time_on_air
+from .constants import ADR_EWMA_ALPHA, ADR_MIN_SAMPLES, ADR_SNR_MARGIN
+
+# SX127x demodulator SNR floor per spreading factor (dB), from the datasheet
+REQUIRED_SNR = {6: -5.0, 7: -7.5, 8: -10.0, 9: -12.5, 10: -15.0, 11: -17.5, 12: -20.0}
+
+
+class LinkEstimate:
+    """Smoothed signal quality of one neighbour, normalised to its bandwidth."""
+    __slots__ = ("rssi", "snr", "bandwidth", "samples")
+
+    def __init__(self):
+        self.rssi = None
+        self.snr = None
+        self.bandwidth = None
+        self.samples = 0
+
+    def update(self, rssi: float, snr: float, bandwidth: int, alpha: float):
+        if self.snr is None:
+            self.rssi, self.snr = rssi, snr
+        else:
+            # Re-reference the running SNR if the frame came in at another bandwidth
+            snr_now = self.snr + 10 * math.log10(self.bandwidth / bandwidth)
+            self.rssi += alpha * (rssi - self.rssi)
+            self.snr = snr_now + alpha * (snr - snr_now)
+        self.bandwidth = bandwidth
+        self.samples += 1
+
+
+class AdrController:
+    """
+    Picks per-destination radio settings from observed link quality.
+
+    `select()` returns the {"spreading_factor", "signal_bandwidth"} with the
+    shortest time-on-air that keeps `margin` dB above the demodulation floor,
+    or None until a link has `min_samples` observations.
+    """
+
+    def __init__(self, spreading_factors=(7, 8, 9, 10, 11, 12), bandwidths=(125000,),
+                 margin: float = ADR_SNR_MARGIN, alpha: float = ADR_EWMA_ALPHA,
+                 min_samples: int = ADR_MIN_SAMPLES):
+        self.margin = margin
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.links = {}  # sender_id -> LinkEstimate
+        # Candidate settings, fastest first; airtime of a typical frame decides
+        self._candidates = sorted(
+            ((sf, bw) for sf in spreading_factors for bw in bandwidths),
+            key=lambda c: time_on_air(64, spreading_factor=c[0], bandwidth=c[1]),
+        )
+
+    def observe(self, sender_id: int, rssi: float, snr: float, bandwidth: int):
+        link = self.links.get(sender_id)
+        if link is None:
+            link = self.links[sender_id] = LinkEstimate()
+        link.update(rssi, snr, bandwidth, self.alpha)
+
+    def select(self, destination: int) -> dict | None:
+        link = self.links.get(destination)
+        if link is None or link.samples < self.min_samples:
+            return None
+
+        for sf, bw in self._candidates:
+            expected_snr = link.snr + 10 * math.log10(link.bandwidth / bw)
+            if expected_snr >= REQUIRED_SNR[sf] + self.margin:
+                return {"spreading_factor": sf, "signal_bandwidth": bw}
+        # Even the most robust setting is marginal; use it anyway
+        sf, bw = max(self._candidates, key=lambda c: (c[0], -c[1]))
+        return {"spreading_factor": sf, "signal_bandwidth": bw}
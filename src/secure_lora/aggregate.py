@@ -0,0 +1,169 @@
+import struct
+import threading
+from collections import deque
+
+from .constants import AGGREGATE_MAX_READY, MAX_PAYLOAD_SIZE, MsgType
+
+# Aggregate payload (inside the encrypted AGGREGATE frame), repeated:
+#   MsgType (1) | Length (1) | Payload
+SUB_HEADER = struct.Struct("!B B")
+
+
+def split_aggregate(payload):
+    """Yields (msg_type, payload) for each sub-message. Raises ValueError if malformed."""
+    view = memoryview(payload)
+    offset = 0
+    while offset < len(view):
+        if offset + SUB_HEADER.size > len(view):
+            raise ValueError("Truncated sub-message header")
+        msg_type, length = SUB_HEADER.unpack_from(view, offset)
+        offset += SUB_HEADER.size
+        if msg_type == MsgType.AGGREGATE or offset + length > len(view):
+            raise ValueError("Bad sub-message")
+        yield msg_type, bytes(view[offset:offset + length])
+        offset += length
+
+
+class _Batch:
+    __slots__ = ("buffer", "count")
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.count = 0
+
+
+class Aggregator:
+    """
+    Holds small messages per destination and emits them as one AGGREGATE frame
+    once `max_delay` seconds have passed since the first one or the next
+    message would not fit in `max_bytes`.
+
+    `send_frame(msg_type, payload, destination)` transmits a single frame. A
+    batch holding one message is sent as that plain message.
+
+    Complete batches wait in a per-destination FIFO until `send_frame` takes
+    them. While it raises RuntimeError (the TX queue is full) they are retried
+    after another `max_delay` through `schedule(delay, callback)`, which runs
+    on the I/O thread, so add() and flush() never fail on a full queue. Beyond
+    `max_ready` waiting batches the oldest is dropped and
+    `on_drop(destination, count)` called.
+    """
+
+    def __init__(self, send_frame, schedule, max_delay: float, max_bytes: int = MAX_PAYLOAD_SIZE,
+                 max_ready: int = AGGREGATE_MAX_READY, on_drop=None):
+        self._send_frame = send_frame
+        self._schedule = schedule
+        self._on_drop = on_drop
+        self.max_delay = max_delay
+        self.max_bytes = max_bytes
+        self.max_ready = max_ready
+        self._batches = {}  # destination -> _Batch still filling
+        self._ready = {}  # destination -> deque of complete batches, oldest first
+        self._retrying = set()  # destinations with a retry scheduled
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()  # keeps each destination's batches in order
+        self.frames_saved = 0  # frames not sent thanks to aggregation
+
+    def fits(self, payload) -> bool:
+        return SUB_HEADER.size + len(payload) <= self.max_bytes
+
+    def add(self, msg_type: int, payload: bytes, destination: int):
+        if not self.fits(payload):
+            raise ValueError(f"Payload of {len(payload)} bytes too large to aggregate")
+
+        full = False
+        with self._lock:
+            batch = self._batches.get(destination)
+            if batch is not None and len(batch.buffer) + SUB_HEADER.size + len(payload) > self.max_bytes:
+                self._close(destination)
+                full = True
+                batch = None
+            if batch is None:
+                batch = self._batches[destination] = _Batch()
+                self._schedule_flush(destination, batch)
+            batch.buffer += SUB_HEADER.pack(msg_type, len(payload))
+            batch.buffer += payload
+            batch.count += 1
+
+        # Transmit outside the lock so other senders can keep batching
+        if full:
+            self._drain(destination)
+
+    def flush(self, destination: int | None = None):
+        """Sends the pending batch for `destination`, or all batches when None."""
+        with self._lock:
+            for d in list(self._batches) if destination is None else [destination]:
+                self._close(d)
+            destinations = list(self._ready) if destination is None else [destination]
+        for d in destinations:
+            self._drain(d)
+
+    def discard(self):
+        """Drops every batch still waiting, reporting each to on_drop. For shutdown."""
+        with self._lock:
+            for d in list(self._batches):
+                self._close(d)
+            ready, self._ready = self._ready, {}
+            for d, batches in ready.items():
+                for batch in batches:
+                    self._dropped(d, batch)
+
+    def _schedule_flush(self, destination: int, batch: _Batch):
+        self._schedule(self.max_delay, lambda: self._flush_due(destination, batch))
+
+    def _flush_due(self, destination: int, batch: _Batch):
+        with self._lock:
+            # Already closed by flush() or because it filled up
+            if self._batches.get(destination) is not batch:
+                return
+            self._close(destination)
+        self._drain(destination)
+
+    def _close(self, destination: int):
+        # Caller holds the lock
+        batch = self._batches.pop(destination, None)
+        if batch is None:
+            return
+        ready = self._ready.setdefault(destination, deque())
+        ready.append(batch)
+        if len(ready) > self.max_ready:
+            self._dropped(destination, ready.popleft())
+
+    def _dropped(self, destination: int, batch: _Batch):
+        if self._on_drop is not None:
+            self._on_drop(destination, batch.count)
+
+    def _drain(self, destination: int):
+        with self._send_lock:
+            while True:
+                with self._lock:
+                    ready = self._ready.get(destination)
+                    if not ready:
+                        self._ready.pop(destination, None)
+                        return
+                    batch = ready[0]
+                try:
+                    self._emit(batch, destination)
+                except RuntimeError:
+                    # TX queue full: leave the batch at the head and try again later
+                    with self._lock:
+                        if destination not in self._retrying:
+                            self._retrying.add(destination)
+                            self._schedule(self.max_delay, lambda: self._retry(destination))
+                    return
+                with self._lock:
+                    if ready and ready[0] is batch:
+                        ready.popleft()
+
+    def _retry(self, destination: int):
+        with self._lock:
+            self._retrying.discard(destination)
+        self._drain(destination)
+
+    def _emit(self, batch: _Batch, destination: int):
+        if batch.count == 1:
+            msg_type, payload = next(split_aggregate(batch.buffer))
+            self._send_frame(msg_type, payload, destination)
+            return
+        self._send_frame(MsgType.AGGREGATE, bytes(batch.buffer), destination)
+        self.frames_saved += batch.count - 1
@@ -0,0 +1,101 @@
+"""
+asyncio facade for a running SecureLoRa.
+
+The radio stays on SecureLoRa's I/O thread; packets, peer events and
+store-and-forward events are handed to the event loop with
+call_soon_threadsafe, so coroutines are woken as soon as a frame is processed
+and never block on radio I/O.
+"""
+import asyncio
+from collections import Counter
+
+from .constants import BROADCAST_ID, RX_QUEUE_SIZE
+from .packet import Packet
+from .peers import Peer
+from .rx_queue import DROP_NEWEST, DROP_OLDEST
+
+
+class AsyncSecureLoRa:
+    """
+    Wraps a SecureLoRa for use from coroutines. Create it inside the running
+    event loop. While it is open, received packets go to packets() / receive()
+    here instead of SecureLoRa.receive().
+
+    Each queue holds at most `queue_size` items. When one is full, `overflow`
+    discards the oldest item (DROP_OLDEST) or the arriving one (DROP_NEWEST),
+    counted per queue in `overflows`. BLOCK is not offered: the I/O thread
+    would wait on coroutines that may themselves be waiting on it.
+    """
+
+    def __init__(self, lora, queue_size: int = RX_QUEUE_SIZE, overflow: str = DROP_OLDEST):
+        if queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+        if overflow not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"overflow must be {DROP_OLDEST} or {DROP_NEWEST}")
+        self.lora = lora
+        self.overflow = overflow
+        self.overflows = Counter()  # "packets", "peers" or "store" -> items dropped
+        self._loop = asyncio.get_running_loop()
+        self._packets = asyncio.Queue(queue_size)
+        self._peer_changes = asyncio.Queue(queue_size)
+        self._store_events = asyncio.Queue(queue_size)
+        lora.add_packet_listener(self._on_packet)
+        lora.subscribe_peers(self._on_peer_change)
+        lora.subscribe_store(self._on_store_event)
+
+    def close(self):
+        """Detaches from the SecureLoRa (which keeps running)."""
+        self.lora.remove_packet_listener(self._on_packet)
+        self.lora.unsubscribe_peers(self._on_peer_change)
+        self.lora.unsubscribe_store(self._on_store_event)
+
+    # Called on the SecureLoRa I/O thread
+    def _on_packet(self, packet: Packet):
+        self._loop.call_soon_threadsafe(self._put, self._packets, "packets", packet)
+
+    def _on_peer_change(self, event: str, peer: Peer):
+        self._loop.call_soon_threadsafe(self._put, self._peer_changes, "peers", (event, peer))
+
+    def _on_store_event(self, event: str, entry_id: int):
+        self._loop.call_soon_threadsafe(self._put, self._store_events, "store", (event, entry_id))
+
+    # Runs on the event loop, the queues' only thread
+    def _put(self, queue: asyncio.Queue, name: str, item):
+        if queue.full():
+            self.overflows[name] += 1
+            if self.overflow == DROP_NEWEST:
+                return
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    async def send(self, msg_type: int, payload: bytes, destination: int = BROADCAST_ID):
+        """Queues a message of any size. Raises TxQueueFull like SecureLoRa.send()."""
+        await self._loop.run_in_executor(None, self.lora.send_large, msg_type, payload, destination)
+
+    async def send_reliable(self, msg_type: int, payload: bytes, destination: int) -> bool:
+        """Sends with retransmission and returns once ACKed. Raises TimeoutError otherwise."""
+        return await asyncio.wrap_future(self.lora.send_reliable(msg_type, payload, destination))
+
+    async def send_or_store(self, msg_type: int, payload: bytes, destination: int) -> int | None:
+        """Like SecureLoRa.send_or_store(): the store entry ID, or None if sent unacknowledged."""
+        # Storing is a SQLite write, so it runs in the default executor like send()
+        return await self._loop.run_in_executor(None, self.lora.send_or_store, msg_type, payload, destination)
+
+    async def receive(self, timeout: float | None = None) -> Packet | None:
+        try:
+            return await asyncio.wait_for(self._packets.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def packets(self):
+        """Yields received packets forever."""
+        while True:
+            yield await self._packets.get()
+
+    async def wait_peer_change(self) -> tuple[str, Peer]:
+        """Returns the next (PEER_ADDED or PEER_LOST, peer) event."""
+        return await self._peer_changes.get()
+
+    async def wait_store_event(self) -> tuple[str, int]:
+        """Returns the next (STORE_SENT or STORE_EVICTED, entry_id) event."""
+        return await self._store_events.get()
@@ -0,0 +1,96 @@
+"""
+LoRa time-on-air and duty-cycle accounting.
+
+time_on_air() implements the Semtech formula (SX1276 datasheet, section
+4.1.1.7 / AN1200.13) so the TX path can charge every frame against a
+regulatory duty-cycle budget such as the 1% of the EU868 g sub-bands.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+from .constants import DUTY_CYCLE_WINDOW
+
+
+class DutyCycleExceeded(RuntimeError):
+    """Raised when a frame cannot be sent without exceeding the duty-cycle budget."""
+
+
+def time_on_air(payload_length: int, spreading_factor: int = 7, bandwidth: int = 125000,
+                coding_rate: int = 5, preamble_length: int = 8, crc: bool = True,
+                explicit_header: bool = True, low_data_rate_optimize: bool | None = None) -> float:
+    """
+    Seconds a LoRa frame with `payload_length` PHY payload bytes occupies the
+    channel. `coding_rate` is the denominator (5-8 for 4/5-4/8). Low data rate
+    optimisation defaults to on when a symbol lasts longer than 16 ms, as the
+    SX127x drivers do.
+    """
+    symbol_time = (1 << spreading_factor) / bandwidth
+    if low_data_rate_optimize is None:
+        low_data_rate_optimize = symbol_time > 0.016
+
+    de = 1 if low_data_rate_optimize else 0
+    ih = 0 if explicit_header else 1
+    numerator = 8 * payload_length - 4 * spreading_factor + 28 + 16 * crc - 20 * ih
+    payload_symbols = 8 + max(
+        math.ceil(numerator / (4 * (spreading_factor - 2 * de))) * coding_rate, 0
+    )
+    return (preamble_length + 4.25 + payload_symbols) * symbol_time
+
+
+class DutyCycleLimiter:
+    """
+    Sliding-window duty-cycle ledger.
+
+    Every transmission is recorded with its airtime; at most
+    `duty_cycle * window` seconds of airtime may fall within any `window`
+    seconds. Entries are dropped as they age out, keeping a running total.
+    """
+
+    def __init__(self, duty_cycle: float, window: float = DUTY_CYCLE_WINDOW, clock=time.monotonic):
+        if not 0 < duty_cycle <= 1:
+            raise ValueError("duty_cycle must be in (0, 1]")
+        self.duty_cycle = duty_cycle
+        self.window = window
+        self.budget = duty_cycle * window
+        self._clock = clock
+        self._ledger = deque()  # (timestamp, airtime), oldest first
+        self._used = 0.0
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        while self._ledger and self._ledger[0][0] <= now - self.window:
+            self._used -= self._ledger.popleft()[1]
+        if not self._ledger:
+            self._used = 0.0  # don't let float error accumulate
+
+    def remaining(self) -> float:
+        """Seconds of airtime still available in the current window."""
+        with self._lock:
+            self._expire(self._clock())
+            return max(0.0, self.budget - self._used)
+
+    def reserve(self, airtime: float) -> float:
+        """
+        Records `airtime` if it fits in the budget and returns 0. Otherwise
+        records nothing and returns the seconds until it would fit.
+        """
+        if airtime > self.budget:
+            raise DutyCycleExceeded(f"Frame airtime {airtime:.3f}s exceeds the whole budget")
+
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            excess = self._used + airtime - self.budget
+            if excess <= 0:
+                self._ledger.append((now, airtime))
+                self._used += airtime
+                return 0.0
+
+            # Wait until enough of the oldest entries have aged out
+            for timestamp, used in self._ledger:
+                excess -= used
+                if excess <= 0:
+                    return timestamp + self.window - now
+            return self.window
@@ -0,0 +1,105 @@
+"""
+Payload compression for short messages.
+
+Generic deflate has nothing to refer back to in a 40-byte chat line, so
+payloads are compressed against a preset dictionary shared by every node
+(like the keys, it is configuration). Raw deflate is used: AES-GCM already
+authenticates the payload, so the zlib header and checksum would only cost
+airtime. Compressing sets a header flag, and payloads that don't shrink are
+sent as they are.
+
+Nodes advertise a one-byte ID of their dictionary in discovery beacons and
+only compress towards peers with the same one. The ID is also authenticated
+with every compressed frame, so a stale or mismatched dictionary fails
+AES-GCM instead of inflating to garbage.
+"""
+import zlib
+from collections import Counter
+
+from .constants import COMPRESSION_DICT_SIZE, COMPRESSION_LEVEL
+
+RAW_DEFLATE = -15  # wbits: 32 KiB window, no zlib header or checksum
+
+
+def dictionary_id(zdict: bytes | None) -> int:
+    """0 without a dictionary, else 1-255 from its CRC."""
+    if not zdict:
+        return 0
+    return zlib.crc32(zdict) % 255 + 1
+
+
+class Compressor:
+    """
+    Raw-deflate compressor with an optional preset dictionary. The dictionary
+    is loaded once into template streams that are copied per message, which
+    is much cheaper than priming a fresh stream each time.
+    """
+
+    def __init__(self, zdict: bytes | None = None, level: int = COMPRESSION_LEVEL):
+        options = {"zdict": zdict} if zdict else {}
+        self.zdict = zdict
+        self.dictionary_id = dictionary_id(zdict)
+        self._compress = zlib.compressobj(level, zlib.DEFLATED, RAW_DEFLATE, 9, zlib.Z_DEFAULT_STRATEGY, **options)
+        self._decompress = zlib.decompressobj(RAW_DEFLATE, **options)
+
+    def compress(self, payload: bytes) -> bytes | None:
+        """Returns the compressed payload, or None if it would not be smaller."""
+        stream = self._compress.copy()
+        compressed = stream.compress(payload) + stream.flush()
+        if len(compressed) >= len(payload):
+            return None
+        return compressed
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        """Raises ValueError if `data` is corrupt or inflates past `max_length` bytes."""
+        stream = self._decompress.copy()
+        try:
+            payload = stream.decompress(data, max_length)
+        except zlib.error as e:
+            raise ValueError(f"Corrupt compressed payload: {e}") from None
+        if stream.unconsumed_tail or not stream.eof:
+            raise ValueError("Compressed payload truncated or too large")
+        return payload
+
+
+def train_dictionary(samples, size: int = COMPRESSION_DICT_SIZE, min_length: int = 3,
+                     max_length: int = 16) -> bytes:
+    """
+    Builds a preset dictionary from captured payloads: the substrings shared by
+    the most samples, weighted by length. Picks already covered are skipped and
+    overlapping ones are stitched together, so phrases longer than `max_length`
+    come out whole. The most valuable go last, where deflate reaches them with
+    the shortest distance codes.
+    """
+    counts = Counter()
+    for sample in samples:
+        sample = bytes(sample)
+        counts.update({
+            sample[i:i + n]
+            for n in range(min_length, max_length + 1)
+            for i in range(len(sample) - n + 1)
+        })
+
+    picked = []
+    total = 0
+    for substring, count in sorted(counts.items(), key=lambda item: (item[1] - 1) * len(item[0]), reverse=True):
+        if count < 2 or total >= size:
+            break
+        if any(substring in longer for longer in picked):
+            continue
+        total += _merge(picked, substring, min_length)
+    return b"".join(reversed(picked))[-size:]
+
+
+def _merge(picked: list[bytes], substring: bytes, min_overlap: int) -> int:
+    """Joins `substring` onto a pick it overlaps, else appends it. Returns the bytes added."""
+    for index, pick in enumerate(picked):
+        for overlap in range(len(substring) - 1, min_overlap - 1, -1):
+            if pick.endswith(substring[:overlap]):
+                picked[index] = pick + substring[overlap:]
+                return len(substring) - overlap
+            if pick.startswith(substring[-overlap:]):
+                picked[index] = substring[:-overlap] + pick
+                return len(substring) - overlap
+    picked.append(substring)
+    return len(substring)
@@ -1,18 +1,123 @@
 from enum import Enum, IntEnum
 
-PROTOCOL_VERSION = 1
+# Full header with destination. Version 1 was the same header without the
+# destination field; its frames are dropped as "version" instead of failing auth.
+PROTOCOL_VERSION = 3
+COMPACT_PROTOCOL_VERSION = 2  # see packet.py for the compact frame layout
+SUPPORTED_VERSIONS = (PROTOCOL_VERSION, COMPACT_PROTOCOL_VERSION)
 
 SENDER_ID_SIZE = 4
 COUNTER_SIZE = 4
 MSG_TYPE_SIZE = 1
 
 HMAC_SIZE = 8  # truncated HMAC-SHA256 (64-bit)
+AUTH_TAG_SIZE = 16  # AES-GCM tag
+COMPACT_TAG_SIZES = (16, 12, 8, 4)  # truncated tag lengths allowed in compact frames
+COMPACT_TAG_SIZE = 8  # default, 64-bit like HMAC_SIZE
 
-MAX_PAYLOAD_SIZE = 128
+MAX_PAYLOAD_SIZE = 128  # plaintext per frame, larger messages go through send_large()
+
+# Fragmentation / reassembly
+MAX_FRAGMENTS = 16  # keep below RATE_LIMIT_BURST so a whole message fits in one burst
+REASSEMBLY_MAX_MESSAGES = 8  # in-flight messages buffered at once
+REASSEMBLY_TIMEOUT = 30.0  # seconds to collect all fragments of a message
+
+# Destination addressing: unicast node ID, a group ID the node joined, or broadcast
+BROADCAST_ID = 0xFFFFFFFF
+
+# Compact frame flags byte
+FLAG_DESTINATION = 0x10  # destination field present, otherwise broadcast
+FLAG_TAG_SIZE_MASK = 0x60  # index into COMPACT_TAG_SIZES
+FLAG_TAG_SIZE_SHIFT = 5
+FLAG_HOPS_MASK = 0x0F  # hop field, see below
+FLAG_COMPRESSED = 0x80  # payload is raw-deflate compressed (compact frames only, the full header has no spare bit)
+
+# Hop field: 4 bits in the compact flags, or the high nibble of the full header's MsgType
+# byte. Relays rewrite it, so it is left out of the AES-GCM associated data.
+HOP_LIMIT_MASK = 0x07  # further relays allowed
+HOP_RELAYED = 0x08  # set by relays, the frame did not come from its sender directly
+MAX_HOP_LIMIT = HOP_LIMIT_MASK
+
+REPLAY_WINDOW_SIZE = 64  # counters tracked below the highest seen per sender
+COUNTER_RESERVATION_BLOCK = 1000  # TX counters reserved per fsync
+
+# Per-sender RX token bucket, applied before decryption
+RATE_LIMIT_PER_SECOND = 5.0
+RATE_LIMIT_BURST = 20
+
+TX_QUEUE_SIZE = 32  # frames waiting for the radio before send() raises
+AGGREGATE_MAX_READY = 4  # complete batches per destination waiting for room in the TX queue
+RX_QUEUE_SIZE = 256  # received packets waiting for receive()
+
+# Reliable unicast (send_reliable)
+RELIABLE_MAX_PENDING = 16  # unacknowledged messages held for retransmission
+RELIABLE_MAX_RETRIES = 4
+RELIABLE_INITIAL_RTO = 2.0  # seconds, before any RTT has been measured
+RELIABLE_MIN_RTO = 0.2
+RELIABLE_MAX_RTO = 60.0
+
+# Adaptive data rate (per-link SF/BW)
+ADR_SNR_MARGIN = 5.0  # dB kept above the demodulation floor
+ADR_EWMA_ALPHA = 0.25  # weight of each new SNR/RSSI sample
+ADR_MIN_SAMPLES = 3  # frames heard before a link's settings are adapted
+
+# Listen-before-talk: binary exponential backoff while CAD reports activity
+LBT_MAX_BACKOFFS = 5  # after this many the frame is sent anyway
+LBT_MIN_SLOT = 0.01  # seconds, backoff slot is the frame's airtime but at least this
+
+# Trickle discovery beacons (RFC 6206)
+TRICKLE_IMIN = 2.0  # seconds, interval after start-up or a topology change
+TRICKLE_IMAX = 300.0  # seconds, interval once the neighbourhood is stable
+
+# Peer table
+PEER_TIMEOUT = 3 * TRICKLE_IMAX  # seconds without a frame before a peer is lost
+PEER_EWMA_ALPHA = 0.25  # weight of each new RSSI/SNR sample and beacon heard or missed
+
+# Managed flooding (relay mode)
+FLOOD_CACHE_SIZE = 256  # (origin, counter) entries remembered for duplicate suppression
+RELAY_DELAY_SLOTS = 4  # rebroadcast after a random delay of up to this many frame airtimes
+RELAY_SUPPRESS_COPIES = 3  # skip the rebroadcast once this many copies were heard
+
+# On-demand unicast routing (AODV-style)
+ROUTE_LIFETIME = 300.0  # seconds a route stays valid without traffic over it
+ROUTE_DISCOVERY_TIMEOUT = 5.0  # seconds to wait for a route reply, doubled on each retry
+ROUTE_DISCOVERY_RETRIES = 2
+ROUTE_MAX_HOPS = 8
+ROUTE_BUFFER_SIZE = 8  # messages held per destination while its route is discovered
+ROUTE_REQUEST_HISTORY = 64  # (origin, request ID) pairs remembered to rebroadcast each request once
+ROUTE_MIN_DELIVERY = 0.1  # delivery ratio floor, so one bad link costs at most 100 transmissions
+ROUTE_METRIC_SCALE = 16  # path ETX is sent in 1/16 units
+
+# Store-and-forward for peers that are out of range
+STORE_MAX_AGE = 7 * 24 * 3600.0  # seconds a stored message is kept
+STORE_MAX_BYTES = 1 << 20  # payload bytes stored across all destinations
+STORE_FLUSH_INTERVAL = 2.0  # seconds between stored messages sent to a returning peer
+STORE_EXPIRE_INTERVAL = 60.0  # seconds between sweeps for stored messages past STORE_MAX_AGE
+
+# Payload compression
+COMPRESSION_LEVEL = 9
+COMPRESSION_DICT_SIZE = 2048  # bytes of trained preset dictionary
+
+# TX duty-cycle accounting (e.g. 0.01 for the EU868 1% sub-bands)
+DUTY_CYCLE_WINDOW = 3600.0  # seconds
 
 class MsgType(IntEnum):
     DATA = 1
     ACK = 2
     COMMAND = 3
     RESPONSE = 4
-    DISCOVERY = 5
\ No newline at end of file
+    DISCOVERY = 5
+    FRAGMENT = 6
+    AGGREGATE = 7
+    RELIABLE = 8
+    ROUTE_REQUEST = 9
+    ROUTE_REPLY = 10
+    ROUTE_ERROR = 11
+    ROUTED = 12
+
+class TxPriority(IntEnum):
+    """TX queue order, lowest value sent first."""
+    CONTROL = 0
+    ACK = 1
+    DATA = 2
+    DISCOVERY = 3
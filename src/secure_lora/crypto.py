@@ -1,6 +1,25 @@
 import hmac
 import hashlib
-from .constants import HMAC_SIZE
+import os
+import time
+
+from .constants import AUTH_TAG_SIZE, COMPACT_TAG_SIZE, HMAC_SIZE
+
+# Optional AES-GCM backends, at least one must be installed
+try:
+    from Crypto.Cipher import AES
+except ImportError:
+    AES = None
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    AESGCM = None
+
+AES_KEY_SIZES = (16, 24, 32)
+MIN_TAG_SIZE = 4
 
 def compute_hmac(key: bytes, data: bytes) -> bytes:
     digest = hmac.new(key, data, hashlib.sha256).digest()
@@ -9,3 +28,133 @@ def compute_hmac(key: bytes, data: bytes) -> bytes:
 def verify_hmac(key: bytes, data: bytes, received_hmac: bytes) -> bool:
     expected = compute_hmac(key, data)
     return hmac.compare_digest(expected, received_hmac)
+
+
+# ------------------------
+# AES-GCM backends
+# ------------------------
+
+class AesGcmContext:
+    """
+    AES-GCM bound to a single key.
+
+    Built once per key (see KeyStore.get_cipher) so the per-frame path only
+    creates the per-nonce cipher state. Subclasses wrap one crypto library
+    each and must produce byte-identical output.
+    """
+    name = None
+
+    def __init__(self, key: bytes):
+        if len(key) not in AES_KEY_SIZES:
+            raise ValueError(f"AES key must be 16, 24 or 32 bytes, got {len(key)}")
+        self.key = bytes(key)
+
+    def encrypt(self, nonce: bytes, plaintext: bytes, aad: bytes | None = None) -> tuple[bytes, bytes]:
+        """Returns (ciphertext, auth_tag)."""
+        raise NotImplementedError
+
+    def decrypt(self, nonce: bytes, ciphertext: bytes, auth_tag: bytes, aad: bytes | None = None) -> bytes:
+        """
+        Returns the plaintext. `auth_tag` may be truncated (4 to 16 bytes).
+        Raises ValueError if authentication fails.
+        """
+        raise NotImplementedError
+
+
+class PycryptodomeAesGcm(AesGcmContext):
+    """pycryptodome backend. Key schedule is rebuilt per nonce by the library."""
+    name = "pycryptodome"
+
+    def encrypt(self, nonce, plaintext, aad=None):
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce)
+        if aad:
+            cipher.update(aad)
+        return cipher.encrypt_and_digest(plaintext)
+
+    def decrypt(self, nonce, ciphertext, auth_tag, aad=None):
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=nonce, mac_len=len(auth_tag))
+        if aad:
+            cipher.update(aad)
+        return cipher.decrypt_and_verify(ciphertext, auth_tag)
+
+
+class CryptographyAesGcm(AesGcmContext):
+    """OpenSSL-backed `cryptography` backend. The expanded key is reused across nonces."""
+    name = "cryptography"
+
+    def __init__(self, key: bytes):
+        super().__init__(key)
+        self._aead = AESGCM(self.key)
+        self._algorithm = algorithms.AES(self.key)
+
+    def encrypt(self, nonce, plaintext, aad=None):
+        sealed = self._aead.encrypt(nonce, plaintext, aad or None)
+        return sealed[:-AUTH_TAG_SIZE], sealed[-AUTH_TAG_SIZE:]
+
+    def decrypt(self, nonce, ciphertext, auth_tag, aad=None):
+        if len(auth_tag) != AUTH_TAG_SIZE:
+            return self._decrypt_truncated(nonce, ciphertext, auth_tag, aad)
+        try:
+            return self._aead.decrypt(nonce, b"".join((ciphertext, auth_tag)), aad or None)
+        except InvalidTag:
+            raise ValueError("MAC check failed")
+
+    def _decrypt_truncated(self, nonce, ciphertext, auth_tag, aad):
+        # AESGCM only takes full tags; the streaming API accepts short ones
+        decryptor = Cipher(
+            self._algorithm,
+            modes.GCM(nonce, bytes(auth_tag), min_tag_length=MIN_TAG_SIZE)
+        ).decryptor()
+        if aad:
+            decryptor.authenticate_additional_data(aad)
+        try:
+            return decryptor.update(ciphertext) + decryptor.finalize()
+        except InvalidTag:
+            raise ValueError("MAC check failed")
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend, module in ((PycryptodomeAesGcm, AES), (CryptographyAesGcm, AESGCM))
+    if module is not None
+}
+
+_fastest_backend = None
+
+
+def benchmark_backend(backend: type[AesGcmContext], payload_size: int = 64, rounds: int = 200,
+                      tag_size: int = COMPACT_TAG_SIZE) -> float:
+    """
+    Returns the average seconds for one encrypt plus two decrypts, one with the
+    full tag and one with it truncated to `tag_size` as compact frames send it.
+    """
+    context = backend(os.urandom(16))
+    nonce = bytes(12)
+    payload = os.urandom(payload_size)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        ciphertext, tag = context.encrypt(nonce, payload)
+        context.decrypt(nonce, ciphertext, tag)
+        context.decrypt(nonce, ciphertext, tag[:tag_size])
+    return (time.perf_counter() - start) / rounds
+
+
+def select_backend(name: str | None = None) -> type[AesGcmContext]:
+    """
+    Returns the backend called `name`, or when `name` is None the fastest
+    installed backend according to a one-off micro-benchmark.
+    """
+    global _fastest_backend
+
+    if name is not None:
+        if name not in BACKENDS:
+            raise ValueError(f"Crypto backend '{name}' is not available (installed: {list(BACKENDS)})")
+        return BACKENDS[name]
+
+    if not BACKENDS:
+        raise RuntimeError("No AES-GCM backend installed, install pycryptodome or cryptography")
+
+    if _fastest_backend is None:
+        _fastest_backend = min(BACKENDS.values(), key=benchmark_backend)
+    return _fastest_backend
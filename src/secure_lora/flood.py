@@ -0,0 +1,41 @@
+from collections import OrderedDict
+
+from .constants import FLOOD_CACHE_SIZE
+
+
+class FloodCache:
+    """
+    Bounded LRU of flooded frames keyed on (origin, counter), counting the
+    copies heard of each for counter-based rebroadcast suppression.
+
+    Copies are recognised before decryption, so an entry also keeps the
+    frame's auth tag: relays don't touch the tag, and a forged copy would
+    have to guess it to inflate the count.
+    """
+
+    def __init__(self, capacity: int = FLOOD_CACHE_SIZE):
+        self.capacity = capacity
+        self._entries = OrderedDict()  # (origin, counter) -> [auth tag, copies], oldest first
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, origin: int, counter: int, auth_tag) -> None:
+        """Records the first, authenticated copy of a frame."""
+        key = (origin, counter)
+        self._entries[key] = [bytes(auth_tag), 1]
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def heard_again(self, origin: int, counter: int, auth_tag) -> bool:
+        """Counts another copy. False if the frame isn't one we've seen."""
+        entry = self._entries.get((origin, counter))
+        if entry is None or entry[0] != auth_tag:
+            return False
+        entry[1] += 1
+        return True
+
+    def copies(self, origin: int, counter: int) -> int:
+        entry = self._entries.get((origin, counter))
+        return entry[1] if entry else 0
@@ -0,0 +1,116 @@
+import struct
+import time
+from collections import OrderedDict
+
+from .constants import (
+    MAX_FRAGMENTS, MAX_PAYLOAD_SIZE, REASSEMBLY_MAX_MESSAGES, REASSEMBLY_TIMEOUT
+)
+
+# Fragment payload (inside the encrypted FRAGMENT frame):
+#   InnerMsgType (1) | MessageID (2) | Index (1) | Count (1) | Chunk
+FRAGMENT_HEADER = struct.Struct("!B H B B")
+FRAGMENT_CHUNK_SIZE = MAX_PAYLOAD_SIZE - FRAGMENT_HEADER.size
+MAX_MESSAGE_SIZE = MAX_FRAGMENTS * FRAGMENT_CHUNK_SIZE
+
+
+def fragment_payload(msg_type: int, message_id: int, payload: bytes):
+    """Yields the FRAGMENT frame payloads carrying `payload`."""
+    count = -(-len(payload) // FRAGMENT_CHUNK_SIZE)
+    if not 0 < count <= MAX_FRAGMENTS:
+        raise ValueError(f"Payload of {len(payload)} bytes needs 1 to {MAX_FRAGMENTS} fragments")
+
+    view = memoryview(payload)
+    for index in range(count):
+        chunk = view[index * FRAGMENT_CHUNK_SIZE:(index + 1) * FRAGMENT_CHUNK_SIZE]
+        buffer = bytearray(FRAGMENT_HEADER.size + len(chunk))
+        FRAGMENT_HEADER.pack_into(buffer, 0, msg_type, message_id, index, count)
+        buffer[FRAGMENT_HEADER.size:] = chunk
+        yield bytes(buffer)
+
+
+class _PartialMessage:
+    __slots__ = ("msg_type", "count", "buffer", "received", "length", "deadline")
+
+    def __init__(self, msg_type: int, count: int, deadline: float):
+        self.msg_type = msg_type
+        self.count = count
+        # The only allocation per message; fragments are copied straight in
+        self.buffer = bytearray(count * FRAGMENT_CHUNK_SIZE)
+        self.received = 0  # bitmap of fragment indices
+        self.length = 0
+        self.deadline = deadline
+
+
+class Reassembler:
+    """
+    Bounded reassembly of fragmented messages.
+
+    At most `max_messages` messages are in flight; each gets one buffer sized
+    for its fragment count on first sight. Messages not completed within
+    `timeout` seconds are dropped, and when the table is full the oldest
+    message is evicted to make room.
+    """
+
+    def __init__(self, max_messages: int = REASSEMBLY_MAX_MESSAGES, timeout: float = REASSEMBLY_TIMEOUT,
+                 clock=time.monotonic):
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self._clock = clock
+        self._messages = OrderedDict()  # (sender_id, message_id) -> _PartialMessage, oldest first
+        self.timeouts = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._messages)
+
+    def add(self, sender_id: int, payload) -> tuple[int, bytes] | None:
+        """
+        Feeds one decrypted FRAGMENT payload.
+        Returns (msg_type, message) once the message is complete.
+        Raises ValueError for malformed fragments.
+        """
+        if len(payload) < FRAGMENT_HEADER.size:
+            raise ValueError("Fragment too short")
+        msg_type, message_id, index, count = FRAGMENT_HEADER.unpack_from(payload)
+        chunk = memoryview(payload)[FRAGMENT_HEADER.size:]
+
+        if not 0 < count <= MAX_FRAGMENTS or index >= count:
+            raise ValueError(f"Bad fragment {index}/{count}")
+        if index < count - 1 and len(chunk) != FRAGMENT_CHUNK_SIZE:
+            raise ValueError("Only the last fragment may be short")
+        if len(chunk) > FRAGMENT_CHUNK_SIZE:
+            raise ValueError("Fragment chunk too long")
+
+        now = self._clock()
+        self._expire(now)
+
+        key = (sender_id, message_id)
+        message = self._messages.get(key)
+        if message is None:
+            if len(self._messages) >= self.max_messages:
+                self._messages.popitem(last=False)
+                self.evictions += 1
+            message = self._messages[key] = _PartialMessage(msg_type, count, now + self.timeout)
+        elif message.count != count or message.msg_type != msg_type:
+            raise ValueError("Fragment does not match message in progress")
+
+        offset = index * FRAGMENT_CHUNK_SIZE
+        message.buffer[offset:offset + len(chunk)] = chunk
+        message.received |= 1 << index
+        if index == count - 1:
+            message.length = offset + len(chunk)
+
+        if message.received != (1 << count) - 1:
+            return None
+
+        del self._messages[key]
+        return message.msg_type, bytes(memoryview(message.buffer)[:message.length])
+
+    def _expire(self, now: float):
+        # Oldest first, so stop at the first message still in time
+        while self._messages:
+            key, message = next(iter(self._messages.items()))
+            if message.deadline > now:
+                break
+            del self._messages[key]
+            self.timeouts += 1
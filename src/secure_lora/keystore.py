@@ -1,12 +1,28 @@
+from .crypto import AesGcmContext, select_backend
+
 class KeyStore:
-    def __init__(self):
+    def __init__(self, backend: str | None = None):
+        # AES-GCM implementation, fastest installed one unless named explicitly
+        self.backend = select_backend(backend)
         self.keys = {}
+        self._ciphers = {}  # sender_id -> AesGcmContext, built on first use
 
     def add_key(self, sender_id: int, key: bytes):
         self.keys[sender_id] = key
+        # Drop any context built from a previous key
+        self._ciphers.pop(sender_id, None)
 
     def get_key(self, sender_id: int) -> bytes:
         return self.keys.get(sender_id)
+
+    def get_cipher(self, sender_id: int) -> AesGcmContext | None:
+        cipher = self._ciphers.get(sender_id)
+        if cipher is None:
+            key = self.keys.get(sender_id)
+            if not key:
+                return None
+            cipher = self._ciphers[sender_id] = self.backend(key)
+        return cipher
     
     def has_sender(self, sender_id: int) -> bool:
         return sender_id in self.keys
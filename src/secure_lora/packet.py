@@ -1,55 +1,235 @@
 import struct
 from .constants import *
 
-# Header format: Version (1) | SenderID (4) | MsgType (1) | Nonce (12)
-PACKET_HEADER_FMT = "!B I B 12s"  # 1 + 4 + 1 + 4 + 12 = 22 bytes
+# Full header: Version (1) | SenderID (4) | Hops << 4 | MsgType (1) | Destination (4) | Nonce (12)
+# The header minus the hop field is authenticated as AES-GCM associated data.
+PACKET_HEADER_FMT = "!B I B I 12s"  # 1 + 4 + 1 + 4 + 12 = 22 bytes
+PACKET_HEADER = struct.Struct(PACKET_HEADER_FMT)
+
+# Version 2 ("compact") header:
+#   Version << 4 | MsgType (1) | Flags (1) | SenderID (4) | [Destination (4)] | Counter (varint)
+# The nonce is not sent, it is rebuilt from counter and sender exactly as in
+# the full header, and the tag may be truncated (length coded in the flags). A
+# full-header frame always has a zero high nibble in its first byte, which is how the
+# two formats are told apart. The header minus the hop field (low nibble of
+# the flags) is the AES-GCM associated data.
+COMPACT_HEADER = struct.Struct("!B B I")
+DESTINATION = struct.Struct("!I")
+
+
+def encode_varint(value: int, buffer: bytearray, offset: int) -> int:
+    """LEB128-encodes `value` into `buffer`. Returns the offset past it."""
+    while value >= 0x80:
+        buffer[offset] = (value & 0x7F) | 0x80
+        value >>= 7
+        offset += 1
+    buffer[offset] = value
+    return offset + 1
+
+
+def decode_varint(data, offset: int) -> tuple[int, int]:
+    """Returns (value, offset past the varint)."""
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data) or shift > 63:
+            raise ValueError("Truncated or oversized varint")
+        byte = data[offset]
+        value |= (byte & 0x7F) << shift
+        offset += 1
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def varint_size(value: int) -> int:
+    return max(1, (value.bit_length() + 6) // 7)
+
+
+def set_hops(frame: bytearray, hop_limit: int) -> None:
+    """
+    Rewrites the hop field of a serialized frame in place for relaying: sets
+    the hop limit and marks the frame relayed. The tag stays valid.
+    """
+    hops = HOP_RELAYED | hop_limit
+    if frame[0] >> 4 == COMPACT_PROTOCOL_VERSION:
+        frame[1] = (frame[1] & ~FLAG_HOPS_MASK & 0xFF) | hops
+    else:
+        # MsgType byte of the full header
+        frame[5] = (hops << 4) | (frame[5] & 0x0F)
+
+
+def make_nonce(counter: int, sender_id: int) -> bytes:
+    # Nonce layout: Counter (8) | SenderID (4)
+    return counter.to_bytes(8, "big") + sender_id.to_bytes(4, "big")
+
 
 class Packet:
-    def __init__(self, version, sender_id, msg_type, payload, auth_tag, nonce):
+    __slots__ = ("version", "sender_id", "msg_type", "payload", "auth_tag", "nonce", "destination", "tag_size",
+                 "hop_limit", "relayed", "compressed", "rssi", "snr")
+
+    def __init__(self, version, sender_id, msg_type, payload, auth_tag, nonce, destination=BROADCAST_ID,
+                 tag_size=AUTH_TAG_SIZE, hop_limit=0, relayed=False, compressed=False):
         self.version = version
         self.sender_id = sender_id
         self.msg_type = msg_type
         self.payload = payload        # AES-GCM ciphertext
         self.auth_tag = auth_tag      # AES-GCM auth tag
         self.nonce = nonce            # 12-byte nonce
+        self.destination = destination  # unicast, group or BROADCAST_ID
+        self.tag_size = tag_size      # bytes of auth tag on the wire
+        self.hop_limit = hop_limit    # times relays may still forward the frame
+        self.relayed = relayed        # heard from a relay rather than the sender
+        self.compressed = compressed  # payload plaintext is deflated (compact frames only)
+        self.rssi = None              # dBm / dB as measured by the radio on receive
+        self.snr = None
+
+    @property
+    def counter(self) -> int:
+        return int.from_bytes(self.nonce[:8], "big")
+
+    def _hops(self) -> int:
+        if not 0 <= self.hop_limit <= MAX_HOP_LIMIT:
+            raise ValueError(f"Hop limit {self.hop_limit} out of range")
+        return (HOP_RELAYED if self.relayed else 0) | self.hop_limit
+
+    def _compact_flags(self) -> int:
+        flags = COMPACT_TAG_SIZES.index(self.tag_size) << FLAG_TAG_SIZE_SHIFT
+        if self.destination != BROADCAST_ID:
+            flags |= FLAG_DESTINATION
+        if self.compressed:
+            flags |= FLAG_COMPRESSED
+        return flags
+
+    def _header_size(self) -> int:
+        if self.version != COMPACT_PROTOCOL_VERSION:
+            return PACKET_HEADER.size
+        size = COMPACT_HEADER.size + varint_size(self.counter)
+        if self.destination != BROADCAST_ID:
+            size += DESTINATION.size
+        return size
+
+    def _pack_header_into(self, buffer, offset: int, hops: int = 0) -> int:
+        # `hops` is left at 0 for the associated data
+        if self.version != COMPACT_PROTOCOL_VERSION:
+            if self.compressed:
+                raise ValueError("Only compact frames can carry compressed payloads")
+            if hops and self.msg_type > 0x0F:
+                raise ValueError(f"Message type {self.msg_type} does not fit a hop-limited frame")
+            PACKET_HEADER.pack_into(
+                buffer,
+                offset,
+                self.version,
+                self.sender_id,
+                (hops << 4) | self.msg_type,
+                self.destination,
+                self.nonce
+            )
+            return offset + PACKET_HEADER.size
+
+        if self.msg_type > 0x0F:
+            raise ValueError(f"Message type {self.msg_type} does not fit a compact frame")
+        COMPACT_HEADER.pack_into(
+            buffer,
+            offset,
+            (self.version << 4) | self.msg_type,
+            self._compact_flags() | hops,
+            self.sender_id
+        )
+        offset += COMPACT_HEADER.size
+        if self.destination != BROADCAST_ID:
+            DESTINATION.pack_into(buffer, offset, self.destination)
+            offset += DESTINATION.size
+        return encode_varint(self.counter, buffer, offset)
+
+    def header(self) -> bytes:
+        # Also the AES-GCM associated data, so without the hop field
+        buffer = bytearray(self._header_size())
+        self._pack_header_into(buffer, 0)
+        return bytes(buffer)
+
+    def serialized_size(self) -> int:
+        return self._header_size() + len(self.payload) + self.tag_size
+
+    def serialize_into(self, buffer: bytearray, offset: int = 0) -> int:
+        """
+        Writes header + ciphertext + auth tag into a preallocated buffer.
+        Returns the offset just past the written frame.
+        """
+        offset = self._pack_header_into(buffer, offset, self._hops())
+
+        end = offset + len(self.payload)
+        buffer[offset:end] = self.payload
+        offset, end = end, end + self.tag_size
+        buffer[offset:end] = self.auth_tag[:self.tag_size]
+        return end
 
     def serialize_without_auth_tag(self):
         # Header + ciphertext
-        return struct.pack(
-            PACKET_HEADER_FMT,
-            self.version,
-            self.sender_id,
-            self.msg_type,
-            self.nonce
-        ) + self.payload
-
-    def serialize(self):
-        # Header + ciphertext + auth tag
-        return self.serialize_without_auth_tag() + self.auth_tag
+        return self.header() + self.payload
+
+    def serialize(self) -> bytearray:
+        # Header + ciphertext + auth tag, written once into a single buffer
+        buffer = bytearray(self.serialized_size())
+        self.serialize_into(buffer)
+        return buffer
 
     @staticmethod
-    def parse(data: bytes):
-        header_size = struct.calcsize(PACKET_HEADER_FMT)
-        header = data[:header_size]
-        payload_and_hmac = data[header_size:]
+    def parse(data: bytes | bytearray | memoryview):
+        # Payload and tag stay views into `data`; nothing is copied but the nonce
+        view = memoryview(data)
+        if len(view) and view[0] >> 4 == COMPACT_PROTOCOL_VERSION:
+            return Packet._parse_compact(view)
 
-        version, sender_id, msg_type, nonce = struct.unpack(
-            PACKET_HEADER_FMT, header
-        )
+        if len(view) < PACKET_HEADER.size + AUTH_TAG_SIZE:
+            raise ValueError(f"Frame too short: {len(view)} bytes")
 
-        # AES-GCM auth tag length (16 bytes standard)
-        auth_tag_size = 16
-        payload = payload_and_hmac[:-auth_tag_size]
-        auth_tag = payload_and_hmac[-auth_tag_size:]
+        version, sender_id, msg_type, destination, nonce = PACKET_HEADER.unpack_from(view)
+        hops = msg_type >> 4
 
         return Packet(
             version,
             sender_id,
-            msg_type,
-            payload,
-            auth_tag,
-            nonce
+            msg_type & 0x0F,
+            view[PACKET_HEADER.size:-AUTH_TAG_SIZE],
+            view[-AUTH_TAG_SIZE:],
+            nonce,
+            destination,
+            hop_limit=hops & HOP_LIMIT_MASK,
+            relayed=bool(hops & HOP_RELAYED)
+        )
+
+    @staticmethod
+    def _parse_compact(view: memoryview):
+        if len(view) < COMPACT_HEADER.size + 1:
+            raise ValueError(f"Frame too short: {len(view)} bytes")
+
+        version_type, flags, sender_id = COMPACT_HEADER.unpack_from(view)
+        offset = COMPACT_HEADER.size
+
+        destination = BROADCAST_ID
+        if flags & FLAG_DESTINATION:
+            (destination,) = DESTINATION.unpack_from(view, offset)
+            offset += DESTINATION.size
+
+        counter, offset = decode_varint(view, offset)
+        tag_size = COMPACT_TAG_SIZES[(flags & FLAG_TAG_SIZE_MASK) >> FLAG_TAG_SIZE_SHIFT]
+        if len(view) < offset + tag_size:
+            raise ValueError(f"Frame too short: {len(view)} bytes")
+
+        return Packet(
+            version_type >> 4,
+            sender_id,
+            version_type & 0x0F,
+            view[offset:len(view) - tag_size],
+            view[len(view) - tag_size:],
+            make_nonce(counter, sender_id),
+            destination,
+            tag_size,
+            flags & HOP_LIMIT_MASK,
+            bool(flags & HOP_RELAYED),
+            bool(flags & FLAG_COMPRESSED)
         )
 
     def get_payload_as_string(self) -> str:
-        return self.payload.decode('utf-8', errors='replace')
+        return bytes(self.payload).decode('utf-8', errors='replace')
@@ -0,0 +1,144 @@
+import heapq
+import threading
+import time
+
+from .constants import PEER_EWMA_ALPHA, PEER_TIMEOUT
+
+PEER_ADDED = "added"
+PEER_LOST = "lost"
+
+
+class Peer:
+    """What we know about one neighbour, updated from its authenticated frames."""
+    __slots__ = ("sender_id", "first_seen", "last_seen", "versions", "dictionary", "rssi", "snr", "packets",
+                 "beacon_seq", "delivery")
+
+    def __init__(self, sender_id: int, now: float):
+        self.sender_id = sender_id
+        self.first_seen = now
+        self.last_seen = now  # monotonic
+        self.versions = None  # frame versions from its discovery beacon, None until heard
+        self.dictionary = None  # compression dictionary ID from its beacon, None if it sent none
+        self.rssi = None  # EWMA, dBm
+        self.snr = None  # EWMA, dB
+        self.packets = 0
+        # Discovery beacons are numbered per sender and only ever go one hop,
+        # so the gaps between the ones we hear are exactly this link's losses
+        self.beacon_seq = None
+        self.delivery = 1.0  # EWMA of beacons heard, 1.0 until one is missed
+
+    def update(self, now: float, rssi: float | None, snr: float | None, alpha: float):
+        self.last_seen = now
+        self.packets += 1
+        if rssi is not None:
+            self.rssi = rssi if self.rssi is None else self.rssi + alpha * (rssi - self.rssi)
+        if snr is not None:
+            self.snr = snr if self.snr is None else self.snr + alpha * (snr - self.snr)
+
+    def beacon(self, seq: int, alpha: float):
+        if self.beacon_seq is not None:
+            step = (seq - self.beacon_seq) & 0xFFFF
+            if step == 0:
+                return  # a copy of the last one
+            if step < 0x8000:
+                self.delivery *= (1 - alpha) ** (step - 1)  # one miss per skipped beacon
+            # Otherwise the sender restarted its numbering, count from here
+        self.beacon_seq = seq
+        self.delivery += alpha * (1 - self.delivery)
+
+    @property
+    def delivery_ratio(self) -> float:
+        """Recent fraction of the neighbour's discovery beacons that we authenticated."""
+        return self.delivery
+
+
+class PeerTable:
+    """
+    Neighbours heard within the last `timeout` seconds.
+
+    Expiry uses a min-heap with one entry per peer keyed on the deadline it had
+    when pushed. Refreshing a peer doesn't touch the heap; a popped entry whose
+    peer was seen since is pushed back with the new deadline, so each check is
+    O(1) and each expiry or refresh O(log n).
+
+    Subscribers are called as `callback(event, peer)` with PEER_ADDED or
+    PEER_LOST from the thread that made the change (the SecureLoRa I/O thread),
+    so they should return quickly.
+    """
+
+    def __init__(self, timeout: float = PEER_TIMEOUT, alpha: float = PEER_EWMA_ALPHA, clock=time.monotonic):
+        self.timeout = timeout
+        self.alpha = alpha
+        self._clock = clock
+        self._peers = {}  # sender_id -> Peer
+        self._deadlines = []  # heap of (deadline, sender_id)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def __contains__(self, sender_id):
+        return sender_id in self._peers
+
+    def __len__(self):
+        return len(self._peers)
+
+    def get(self, sender_id: int) -> Peer | None:
+        return self._peers.get(sender_id)
+
+    def ids(self) -> set[int]:
+        with self._lock:
+            return set(self._peers)
+
+    def values(self) -> list[Peer]:
+        with self._lock:
+            return list(self._peers.values())
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        self._listeners.remove(callback)
+
+    def observe(self, sender_id: int, rssi: float | None = None, snr: float | None = None) -> Peer:
+        """Records an authenticated frame from `sender_id`."""
+        now = self._clock()
+        with self._lock:
+            peer = self._peers.get(sender_id)
+            added = peer is None
+            if added:
+                peer = self._peers[sender_id] = Peer(sender_id, now)
+                heapq.heappush(self._deadlines, (now + self.timeout, sender_id))
+            peer.update(now, rssi, snr, self.alpha)
+        if added:
+            self._notify(PEER_ADDED, peer)
+        return peer
+
+    def beacon(self, sender_id: int, seq: int) -> None:
+        """Records the sequence number of a discovery beacon from a known peer."""
+        with self._lock:
+            peer = self._peers.get(sender_id)
+            if peer is not None:
+                peer.beacon(seq, self.alpha)
+
+    def expire(self) -> list[Peer]:
+        """Drops peers not heard within the timeout and returns them."""
+        now = self._clock()
+        lost = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, sender_id = heapq.heappop(self._deadlines)
+                peer = self._peers.get(sender_id)
+                if peer is None:
+                    continue
+                deadline = peer.last_seen + self.timeout
+                if deadline > now:
+                    heapq.heappush(self._deadlines, (deadline, sender_id))
+                else:
+                    del self._peers[sender_id]
+                    lost.append(peer)
+        for peer in lost:
+            self._notify(PEER_LOST, peer)
+        return lost
+
+    def _notify(self, event: str, peer: Peer):
+        for callback in list(self._listeners):
+            callback(event, peer)
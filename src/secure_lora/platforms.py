@@ -1,8 +1,57 @@
+import contextlib
+import threading
 import busio
 from digitalio import DigitalInOut
 import board
 import adafruit_rfm9x
+from adafruit_bus_device import spi_device
 from .radio import RadioInterface, radio_param
+from .airtime import time_on_air
+from .sx127x import ContinuousReceiver, FrameRingBuffer, InterruptPin, RegisterBus
+
+RH_HEADER_SIZE = 4  # RadioHead To|From|ID|Flags header added by adafruit_rfm9x
+RH_BROADCAST_ADDRESS = 0xFF
+
+
+class SPIRegisterBus(RegisterBus):
+    """SX127x register access over an adafruit_bus_device SPIDevice."""
+
+    def __init__(self, device: spi_device.SPIDevice):
+        self.device = device
+        self._buf = bytearray(2)
+
+    def read_u8(self, address: int) -> int:
+        self.read_into(address, self._buf, 1)
+        return self._buf[0]
+
+    def write_u8(self, address: int, value: int) -> None:
+        with self.device as spi:
+            self._buf[0] = (address | 0x80) & 0xFF
+            self._buf[1] = value & 0xFF
+            spi.write(self._buf, end=2)
+
+    def read_into(self, address: int, buf, length: int) -> None:
+        with self.device as spi:
+            self._buf[0] = address & 0x7F
+            spi.write(self._buf, end=1)
+            spi.readinto(buf, end=length)
+
+
+class RPiGPIOInterruptPin(InterruptPin):
+    """Rising-edge callbacks on a Raspberry Pi GPIO line (BCM numbering)."""
+
+    def __init__(self, bcm_pin: int):
+        import RPi.GPIO as GPIO
+        self._gpio = GPIO
+        self.pin = bcm_pin
+        GPIO.setmode(GPIO.BCM)
+        GPIO.setup(bcm_pin, GPIO.IN, pull_up_down=GPIO.PUD_DOWN)
+
+    def on_rising(self, callback) -> None:
+        self._gpio.add_event_detect(self.pin, self._gpio.RISING, callback=callback)
+
+    def close(self) -> None:
+        self._gpio.remove_event_detect(self.pin)
 
 
 class RFM95xRadio(RadioInterface):
@@ -10,14 +59,23 @@ class RFM95xRadio(RadioInterface):
     Radio interface for the Adafruit RFM95x module (based on Semtech SX1276).
 
     Exposes all tunable LoRa parameters for UI generation via @radio_param decorators.
+
+    Passing `irq_pin` (the board pin wired to DIO0) enables continuous-receive
+    mode: the chip stays in RX_CONTINUOUS and frames are buffered on RxDone
+    edges instead of being polled for on each receive() call.
     """
 
     # Valid bandwidth values in Hz for RFM9x
     BANDWIDTHS = [7800, 10400, 15600, 20800, 31250, 41700, 62500, 125000, 250000, 500000]
 
-    def __init__(self, spi, cs_pin, reset_pin, freq_mhz: float = 915.0, tx_power: int = 13):
+    def __init__(self, spi, cs_pin, reset_pin, freq_mhz: float = 915.0, tx_power: int = 13,
+                 irq_pin=None, rx_buffer_slots: int = 16):
         self.cs = DigitalInOut(cs_pin)
         self.reset = DigitalInOut(reset_pin)
+        self._pending = None  # frame picked up by wait_for_packet()
+        self._receiver = None
+        self._last_rssi = 0.0
+        self._last_snr = 0.0
 
         try:
             self.radio = adafruit_rfm9x.RFM9x(spi, self.cs, self.reset, freq_mhz)
@@ -27,20 +85,106 @@ class RFM95xRadio(RadioInterface):
         except Exception as e:
             raise RuntimeError(f"Failed to initialize RFM9x: {e}")
 
+        if irq_pin is not None:
+            bus = SPIRegisterBus(spi_device.SPIDevice(spi, self.cs, baudrate=5000000, polarity=0, phase=0))
+            self._receiver = ContinuousReceiver(
+                bus,
+                RPiGPIOInterruptPin(irq_pin.id),
+                FrameRingBuffer(rx_buffer_slots),
+                threading.Lock(),
+            )
+            self._receiver.start()
+
     def send(self, data: bytes) -> None:
         """Send bytes over the radio."""
-        self.radio.send(data)
+        if self._receiver is None:
+            self.radio.send(data)
+            return
+
+        # Drop back to RX_CONTINUOUS straight after TX; the lock keeps the
+        # DIO0 handler off the FIFO while the driver fills it
+        with self._receiver.lock:
+            self.radio.send(data, keep_listening=True)
+
+    def wait_for_packet(self, timeout: float | None = None) -> bool:
+        """
+        Block until a frame arrives or the timeout expires.
+        The adafruit driver polls RxDone itself, so the frame is held here
+        until the next receive() call.
+        """
+        if self._receiver is not None:
+            return self._receiver.ring.wait(timeout)
+
+        if self._pending is None:
+            self._pending = self.radio.receive(timeout=0.5 if timeout is None else timeout)
+        return self._pending is not None
 
     def receive(self, timeout: float = 0.5) -> bytes | None:
         """
         Receive bytes from the radio.
         Returns None if no packet is received within the timeout.
         """
-        packet = self.radio.receive(timeout=timeout)
+        if self._receiver is not None:
+            self._receiver.ring.wait(timeout)
+            packet = self._receive_buffered()
+        elif self._pending is not None:
+            packet, self._pending = self._pending, None
+        else:
+            packet = self.radio.receive(timeout=timeout)
         if packet is not None:
             print(f"RFM95x received raw data: {packet}")
         return packet
 
+    def _registers(self):
+        """
+        The lock the DIO0 handler holds while reading the FIFO, in continuous-
+        receive mode. Every register access here goes through it, as ADR and
+        time-on-air estimates read and change settings while frames arrive.
+        """
+        if self._receiver is None:
+            return contextlib.nullcontext()
+        return self._receiver.lock
+
+    def wake(self) -> None:
+        if self._receiver is not None:
+            self._receiver.ring.wake()
+
+    def channel_busy(self) -> bool:
+        # CAD needs register access, which only continuous-receive mode sets up
+        if self._receiver is None:
+            return False
+        return self._receiver.channel_activity()
+
+    def signal_quality(self) -> tuple[float, float] | None:
+        return self.last_rssi, self.last_snr
+
+    def time_on_air(self, length: int) -> float:
+        # The driver prepends the RadioHead header to every frame
+        return time_on_air(
+            length + RH_HEADER_SIZE,
+            spreading_factor=self.spreading_factor,
+            bandwidth=self.signal_bandwidth,
+            coding_rate=self.coding_rate,
+            preamble_length=self.preamble_length,
+            crc=self.enable_crc,
+        )
+
+    def _receive_buffered(self) -> bytes | None:
+        # Drain the ring, applying the same RadioHead header handling as
+        # adafruit_rfm9x.RFM9x.receive()
+        while True:
+            entry = self._receiver.ring.pop()
+            if entry is None:
+                return None
+
+            frame, self._last_rssi, self._last_snr = entry
+            if len(frame) <= RH_HEADER_SIZE:
+                continue
+            node = self.radio.node
+            if node != RH_BROADCAST_ADDRESS and frame[0] not in (RH_BROADCAST_ADDRESS, node):
+                continue
+            return frame[RH_HEADER_SIZE:]
+
     # -------------------------------------------------------------------------
     # Tunable Parameters (exposed via @radio_param for UI generation)
     # -------------------------------------------------------------------------
@@ -48,29 +192,35 @@ class RFM95xRadio(RadioInterface):
     @property
     @radio_param("float", (240.0, 960.0), unit="MHz", description="Carrier frequency", step=0.1)
     def frequency(self) -> float:
-        return self.radio.frequency_mhz
+        with self._registers():
+            return self.radio.frequency_mhz
 
     @frequency.setter
     def frequency(self, value: float) -> None:
-        self.radio.frequency_mhz = value
+        with self._registers():
+            self.radio.frequency_mhz = value
 
     @property
     @radio_param("int", (5, 23), unit="dBm", description="Transmit power", step=1)
     def tx_power(self) -> int:
-        return self.radio.tx_power
+        with self._registers():
+            return self.radio.tx_power
 
     @tx_power.setter
     def tx_power(self, value: int) -> None:
-        self.radio.tx_power = value
+        with self._registers():
+            self.radio.tx_power = value
 
     @property
     @radio_param("enum", [6, 7, 8, 9, 10, 11, 12], description="Spreading factor (higher = longer range, slower)")
     def spreading_factor(self) -> int:
-        return self.radio.spreading_factor
+        with self._registers():
+            return self.radio.spreading_factor
 
     @spreading_factor.setter
     def spreading_factor(self, value: int) -> None:
-        self.radio.spreading_factor = value
+        with self._registers():
+            self.radio.spreading_factor = value
 
     @property
     @radio_param(
@@ -80,56 +230,68 @@ class RFM95xRadio(RadioInterface):
         description="Signal bandwidth (lower = longer range, slower)",
     )
     def signal_bandwidth(self) -> int:
-        return self.radio.signal_bandwidth
+        with self._registers():
+            return self.radio.signal_bandwidth
 
     @signal_bandwidth.setter
     def signal_bandwidth(self, value: int) -> None:
-        self.radio.signal_bandwidth = value
+        with self._registers():
+            self.radio.signal_bandwidth = value
 
     @property
     @radio_param("enum", [5, 6, 7, 8], description="Coding rate denominator (4/5 to 4/8, higher = more redundancy)")
     def coding_rate(self) -> int:
-        return self.radio.coding_rate
+        with self._registers():
+            return self.radio.coding_rate
 
     @coding_rate.setter
     def coding_rate(self, value: int) -> None:
-        self.radio.coding_rate = value
+        with self._registers():
+            self.radio.coding_rate = value
 
     @property
     @radio_param("int", (6, 65535), description="Preamble length in symbols", step=1)
     def preamble_length(self) -> int:
-        return self.radio.preamble_length
+        with self._registers():
+            return self.radio.preamble_length
 
     @preamble_length.setter
     def preamble_length(self, value: int) -> None:
-        self.radio.preamble_length = value
+        with self._registers():
+            self.radio.preamble_length = value
 
     @property
     @radio_param("bool", [True, False], description="Enable CRC checking")
     def enable_crc(self) -> bool:
-        return self.radio.enable_crc
+        with self._registers():
+            return self.radio.enable_crc
 
     @enable_crc.setter
     def enable_crc(self, value: bool) -> None:
-        self.radio.enable_crc = value
+        with self._registers():
+            self.radio.enable_crc = value
 
     @property
     @radio_param("int", (0, 255), description="Node address for filtering", step=1)
     def node(self) -> int:
-        return self.radio.node
+        with self._registers():
+            return self.radio.node
 
     @node.setter
     def node(self, value: int) -> None:
-        self.radio.node = value
+        with self._registers():
+            self.radio.node = value
 
     @property
     @radio_param("int", (0, 255), description="Destination address (255 = broadcast)", step=1)
     def destination(self) -> int:
-        return self.radio.destination
+        with self._registers():
+            return self.radio.destination
 
     @destination.setter
     def destination(self, value: int) -> None:
-        self.radio.destination = value
+        with self._registers():
+            self.radio.destination = value
 
     # -------------------------------------------------------------------------
     # Read-only Parameters (signal quality)
@@ -138,9 +300,13 @@ class RFM95xRadio(RadioInterface):
     @property
     @radio_param("float", (-150.0, 0.0), unit="dBm", description="Last received signal strength", readonly=True)
     def last_rssi(self) -> float:
+        if self._receiver is not None:
+            return self._last_rssi
         return self.radio.last_rssi
 
     @property
     @radio_param("float", (-20.0, 20.0), unit="dB", description="Last signal-to-noise ratio", readonly=True)
     def last_snr(self) -> float:
+        if self._receiver is not None:
+            return self._last_snr
         return self.radio.last_snr
@@ -1,6 +1,10 @@
+import time
 from dataclasses import dataclass
 from typing import Any, Callable, Literal
 
+# Sleep used by the default wait_for_packet() for radios that can only poll
+POLL_INTERVAL = 0.01
+
 
 @dataclass
 class RadioParameter:
@@ -55,6 +59,10 @@ class RadioInterface:
 
     Subclasses should implement send/receive and use @radio_param decorator
     on properties to expose tunable parameters for UI generation.
+
+    Radios that can block until a frame arrives (interrupt line, condition
+    variable, socket) should also override wait_for_packet/wake so callers
+    don't have to poll receive().
     """
 
     def send(self, data: bytes) -> None:
@@ -65,6 +73,41 @@ class RadioInterface:
         """Receive data from the radio. Returns None if no data available."""
         raise NotImplementedError
 
+    def wait_for_packet(self, timeout: float | None = None) -> bool:
+        """
+        Block until a frame is ready for receive(), the timeout expires or
+        wake() is called. Returns True if a frame is (probably) ready.
+
+        The default sleeps for one poll interval and reports ready, which keeps
+        radios that only implement receive() working in polled mode.
+        """
+        if timeout is None:
+            timeout = POLL_INTERVAL
+        time.sleep(min(timeout, POLL_INTERVAL))
+        return True
+
+    def wake(self) -> None:
+        """Interrupt a pending wait_for_packet() call, e.g. on shutdown."""
+        pass
+
+    def channel_busy(self) -> bool:
+        """
+        Listen-before-talk check (channel activity detection on LoRa).
+        Radios that can't sense the channel report it as free.
+        """
+        return False
+
+    def signal_quality(self) -> tuple[float, float] | None:
+        """(RSSI in dBm, SNR in dB) of the frame last returned by receive(), if measured."""
+        return None
+
+    def time_on_air(self, length: int) -> float:
+        """
+        Seconds the channel is occupied sending a `length` byte frame with the
+        current settings. Radios without an airtime model report 0.
+        """
+        return 0.0
+
     @classmethod
     def get_parameter_definitions(cls) -> list[RadioParameter]:
         """
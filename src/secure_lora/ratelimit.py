@@ -0,0 +1,35 @@
+import time
+
+from .constants import RATE_LIMIT_BURST, RATE_LIMIT_PER_SECOND
+
+class TokenBucketLimiter:
+    """
+    Per-sender token bucket.
+
+    Each sender earns `rate` tokens per second up to `burst`; every frame
+    costs one token. Buckets are refilled lazily on access, so an idle
+    sender costs nothing but its dict entry.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: float = RATE_LIMIT_BURST,
+                 clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._buckets = {}  # sender_id -> [tokens, last refill time]
+
+    def allow(self, sender_id: int) -> bool:
+        now = self._clock()
+        bucket = self._buckets.get(sender_id)
+        if bucket is None:
+            self._buckets[sender_id] = [self.burst - 1, now]
+            return True
+
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+
+        bucket[0] = tokens - 1
+        return True
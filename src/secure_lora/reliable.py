@@ -0,0 +1,179 @@
+import random
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from .constants import (
+    MsgType, RELIABLE_INITIAL_RTO, RELIABLE_MAX_PENDING, RELIABLE_MAX_RETRIES, RELIABLE_MAX_RTO,
+    RELIABLE_MIN_RTO
+)
+
+# Reliable payload (inside the encrypted RELIABLE frame):
+#   InnerMsgType (1) | Sequence (2) | Payload
+RELIABLE_HEADER = struct.Struct("!B H")
+# ACK payload: Sequence (2) of the RELIABLE frame being acknowledged
+ACK_PAYLOAD = struct.Struct("!H")
+
+DEDUP_HISTORY = 32  # sequences remembered per sender to suppress retransmitted duplicates
+
+
+class RttEstimator:
+    """Smoothed RTT and variance per RFC 6298."""
+    __slots__ = ("srtt", "rttvar")
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = 0.0
+
+    def sample(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def rto(self) -> float:
+        return self.srtt + 4 * self.rttvar
+
+
+class _Pending:
+    __slots__ = ("future", "payload", "destination", "attempts", "sent_at")
+
+    def __init__(self, future, payload, destination):
+        self.future = future
+        self.payload = payload
+        self.destination = destination
+        self.attempts = 0
+        self.sent_at = 0.0
+
+
+class ReliableSender:
+    """
+    Retransmission buffer for reliable unicast.
+
+    `transmit(msg_type, payload, destination)` queues one frame and
+    `schedule(delay, callback)` runs a callback later on the I/O thread.
+    Every attempt, the first included, runs there, since `airtime` may read
+    the radio's settings.
+    The retransmit timeout is the destination's RTT estimate plus the frame's
+    and its ACK's time-on-air (`airtime(payload_length)`), doubled on each
+    retry. RTT is only sampled from frames ACKed on the first attempt.
+
+    Sequences start at a random point each session, so a restarted sender
+    isn't mistaken for retransmissions by the receivers' DuplicateFilter.
+    """
+
+    def __init__(self, transmit, schedule, airtime=lambda length: 0.0,
+                 max_pending: int = RELIABLE_MAX_PENDING, max_retries: int = RELIABLE_MAX_RETRIES,
+                 clock=time.monotonic):
+        self._transmit = transmit
+        self._schedule = schedule
+        self._airtime = airtime
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.initial_rto = RELIABLE_INITIAL_RTO  # until the destination's RTT is measured
+        self._clock = clock
+        self._pending = {}  # sequence -> _Pending
+        self._rtt = {}  # destination -> RttEstimator
+        self._sequence = random.getrandbits(16)
+        self._lock = threading.Lock()
+        self.retransmissions = 0
+
+    def send(self, msg_type: int, payload: bytes, destination: int) -> Future:
+        future = Future()
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                raise RuntimeError(f"Retransmission buffer full ({self.max_pending} messages)")
+            # Skip sequences still waiting for an ACK after wrapping
+            self._sequence = (self._sequence + 1) & 0xFFFF
+            while self._sequence in self._pending:
+                self._sequence = (self._sequence + 1) & 0xFFFF
+            sequence = self._sequence
+            body = RELIABLE_HEADER.pack(msg_type, sequence) + payload
+            self._pending[sequence] = _Pending(future, body, destination)
+        self._schedule(0.0, lambda: self._attempt(sequence))
+        return future
+
+    def on_ack(self, sender_id: int, payload) -> bool:
+        """Completes the message an ACK refers to. Returns False for stale or bogus ACKs."""
+        if len(payload) != ACK_PAYLOAD.size:
+            return False
+        (sequence,) = ACK_PAYLOAD.unpack(payload)
+        with self._lock:
+            pending = self._pending.get(sequence)
+            if pending is None or pending.destination != sender_id:
+                return False
+            del self._pending[sequence]
+            if pending.attempts == 1:
+                self._rtt.setdefault(sender_id, RttEstimator()).sample(self._clock() - pending.sent_at)
+        pending.future.set_result(True)
+        return True
+
+    def cancel_all(self):
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for p in pending:
+            p.future.cancel()
+
+    def rto(self, destination: int, payload_length: int) -> float:
+        estimator = self._rtt.get(destination)
+        rto = estimator.rto() if estimator is not None else self.initial_rto
+        return max(RELIABLE_MIN_RTO, rto + self._airtime(payload_length) + self._airtime(ACK_PAYLOAD.size))
+
+    def _attempt(self, sequence: int):
+        with self._lock:
+            pending = self._pending.get(sequence)
+            if pending is None:
+                return
+            if pending.attempts > self.max_retries:
+                del self._pending[sequence]
+                give_up = True
+            else:
+                give_up = False
+                if pending.attempts:
+                    self.retransmissions += 1
+                pending.attempts += 1
+                attempts = pending.attempts
+                pending.sent_at = self._clock()
+                timeout = min(RELIABLE_MAX_RTO, self.rto(pending.destination, len(pending.payload))
+                              * (1 << (pending.attempts - 1)))
+
+        if give_up:
+            pending.future.set_exception(TimeoutError(
+                f"No ACK from {hex(pending.destination)} after {pending.attempts} attempts"
+            ))
+            return
+
+        try:
+            self._transmit(MsgType.RELIABLE, pending.payload, pending.destination)
+        except RuntimeError:
+            pass  # TX queue full, counts as a lost attempt
+        self._schedule(timeout, lambda: self._attempt_if_current(sequence, attempts))
+
+    def _attempt_if_current(self, sequence: int, attempts: int):
+        # Ignore timers from earlier attempts or messages already ACKed
+        pending = self._pending.get(sequence)
+        if pending is not None and pending.attempts == attempts:
+            self._attempt(sequence)
+
+
+class DuplicateFilter:
+    """Remembers recent reliable sequences per sender so retransmissions are delivered once."""
+
+    def __init__(self, history: int = DEDUP_HISTORY):
+        self.history = history
+        self._seen = {}  # sender_id -> (deque, set) of recent sequences
+
+    def first_time(self, sender_id: int, sequence: int) -> bool:
+        order, seen = self._seen.setdefault(sender_id, (deque(), set()))
+        if sequence in seen:
+            return False
+        order.append(sequence)
+        seen.add(sequence)
+        if len(order) > self.history:
+            seen.discard(order.popleft())
+        return True
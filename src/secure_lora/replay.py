@@ -1,12 +1,53 @@
+from .constants import REPLAY_WINDOW_SIZE
+
 class ReplayProtection:
-    def __init__(self):
-        self.last_counter = {}
+    """
+    Per-sender sliding-window replay filter (IPsec style, RFC 4303 3.4.3).
 
-    def check_and_update(self, sender_id: int, counter: int) -> bool:
-        last = self.last_counter.get(sender_id, -1)
+    For each sender we keep the highest counter accepted and a bitmap of
+    which of the `window_size` counters below it have been seen, so frames
+    reordered by the mesh are still accepted once. Both checks and updates
+    are O(1) and memory is two ints per sender.
+    """
+
+    def __init__(self, window_size: int = REPLAY_WINDOW_SIZE):
+        self.window_size = window_size
+        self._windows = {}  # sender_id -> [highest counter, seen bitmap]
+
+    def check(self, sender_id: int, counter: int) -> bool:
+        """True if `counter` is new for this sender. Does not modify state."""
+        window = self._windows.get(sender_id)
+        if window is None:
+            return True
+
+        highest, bitmap = window
+        if counter > highest:
+            return True
 
-        if counter <= last:
+        offset = highest - counter
+        if offset >= self.window_size:
+            return False
+        return not (bitmap >> offset) & 1
+
+    def update(self, sender_id: int, counter: int) -> None:
+        """Marks `counter` as seen. Call only after the frame authenticated."""
+        window = self._windows.get(sender_id)
+        if window is None:
+            self._windows[sender_id] = [counter, 1]
+            return
+
+        highest, bitmap = window
+        if counter > highest:
+            shift = counter - highest
+            bitmap = (bitmap << shift) & ((1 << self.window_size) - 1) if shift < self.window_size else 0
+            window[0] = counter
+            window[1] = bitmap | 1
+        else:
+            window[1] = bitmap | (1 << (highest - counter))
+
+    def check_and_update(self, sender_id: int, counter: int) -> bool:
+        if not self.check(sender_id, counter):
             return False
 
-        self.last_counter[sender_id] = counter
+        self.update(sender_id, counter)
         return True
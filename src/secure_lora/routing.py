@@ -0,0 +1,299 @@
+"""
+On-demand unicast routing, after AODV (RFC 3561).
+
+A node without a route to a destination buffers the message and broadcasts a
+ROUTE_REQUEST. Every node that hears it records a reverse route to the origin
+through the neighbour it came from and rebroadcasts it once. The destination
+answers with a ROUTE_REPLY that travels back along the reverse routes,
+installing the forward route as it goes. Traffic then moves hop by hop in
+ROUTED frames, each hop a normal unicast frame encrypted by the forwarding node,
+so the message crosses one path instead of flooding the mesh. The message
+inside is sealed end-to-end by the origin, and is opaque to the Router.
+
+Routes are ranked by path ETX (expected transmissions), the sum of each link's
+cost, with per-node sequence numbers keeping them loop-free. A node that can't
+forward a ROUTED frame sends a ROUTE_ERROR back to the origin, and routes
+through a lost neighbour are dropped, so the next message rediscovers the path.
+"""
+import struct
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+from .constants import (
+    ADR_SNR_MARGIN, BROADCAST_ID, MsgType, ROUTE_BUFFER_SIZE, ROUTE_DISCOVERY_RETRIES,
+    ROUTE_DISCOVERY_TIMEOUT, ROUTE_LIFETIME, ROUTE_MAX_HOPS, ROUTE_METRIC_SCALE, ROUTE_MIN_DELIVERY,
+    ROUTE_REQUEST_HISTORY
+)
+
+# ROUTE_REQUEST (broadcast):
+#   Origin (4) | OriginSeq (4) | RequestID (2) | Destination (4) | DestSeq (4) | Hops (1) | Metric (2)
+ROUTE_REQUEST = struct.Struct("!I I H I I B H")
+# ROUTE_REPLY (unicast towards the origin): Origin (4) | Destination (4) | DestSeq (4) | Hops (1) | Metric (2)
+ROUTE_REPLY = struct.Struct("!I I I B H")
+# ROUTE_ERROR (unicast towards the origin): Origin (4) | Unreachable destination (4)
+ROUTE_ERROR = struct.Struct("!I I")
+# ROUTED (unicast to the next hop): Origin (4) | Destination (4) | Hops (1) | InnerMsgType (1) | Sealed
+ROUTED_HEADER = struct.Struct("!I I B B")
+# Sealed payload, encrypted under the origin's key: Counter (8) | Ciphertext | AuthTag (16)
+# The nonce is Counter | Origin, and the AAD the ROUTED header with Hops zeroed
+ROUTED_COUNTER = struct.Struct("!Q")
+
+ROUTING_TYPES = (MsgType.ROUTE_REQUEST, MsgType.ROUTE_REPLY, MsgType.ROUTE_ERROR, MsgType.ROUTED)
+
+
+def link_etx(peer, required_snr: float | None = None) -> float:
+    """
+    Expected transmissions to deliver a frame over the link to a neighbour and
+    get an answer back, assuming the link is symmetric: 1 / d^2, with d the
+    recent fraction of the neighbour's discovery beacons we heard (its other
+    frames share a counter with traffic we never see). d is scaled down as the
+    link's SNR nears the demodulation floor, where fading loses frames first.
+    """
+    if peer is None:
+        ratio = ROUTE_MIN_DELIVERY
+    else:
+        ratio = peer.delivery_ratio
+        if peer.snr is not None and required_snr is not None:
+            ratio *= min(1.0, max(0.0, (peer.snr - required_snr) / ADR_SNR_MARGIN))
+    ratio = max(ROUTE_MIN_DELIVERY, ratio)
+    return 1 / (ratio * ratio)
+
+
+def _encode_metric(metric: float) -> int:
+    return min(0xFFFF, round(metric * ROUTE_METRIC_SCALE))
+
+
+class Route:
+    __slots__ = ("next_hop", "hops", "metric", "seq", "expires")
+
+    def __init__(self, next_hop: int, hops: int, metric: float, seq: int, expires: float):
+        self.next_hop = next_hop
+        self.hops = hops
+        self.metric = metric  # path ETX
+        self.seq = seq  # destination sequence number the route was learnt with
+        self.expires = expires
+
+
+class Router:
+    """
+    Route cache and AODV-style discovery for one node.
+
+    `transmit(msg_type, payload, destination)` queues one frame (raising
+    RuntimeError if the TX queue is full), `schedule(delay, callback)` runs a
+    callback later on the I/O thread, and `link_cost(neighbour)` returns the
+    ETX of the link to a neighbour.
+    """
+
+    def __init__(self, node_id: int, transmit, schedule, link_cost, lifetime: float = ROUTE_LIFETIME,
+                 max_hops: int = ROUTE_MAX_HOPS, clock=time.monotonic):
+        self.node_id = node_id
+        self._transmit = transmit
+        self._schedule = schedule
+        self._link_cost = link_cost
+        self.lifetime = lifetime
+        self.max_hops = max_hops
+        self._clock = clock
+        self.seq = 0  # our sequence number, bumped per request and per first reply
+        self._request_id = 0
+        self._routes = {}  # destination -> Route
+        self._requests_seen = OrderedDict()  # (origin, request ID) -> None, oldest first
+        self._waiting = {}  # destination -> deque of (msg_type, payload) awaiting a route
+        self._discovering = {}  # destination -> attempt number of the discovery in progress
+        self._lock = threading.Lock()
+        self.counts = Counter()  # requests, replies, forwarded, no_route, errors, links_lost, buffer_overflow
+
+    def next_hop(self, destination: int) -> int | None:
+        with self._lock:
+            route = self._route(destination)
+            return route.next_hop if route else None
+
+    def routes(self) -> dict[int, int]:
+        """Valid routes as destination -> next hop."""
+        now = self._clock()
+        with self._lock:
+            return {dest: route.next_hop for dest, route in self._routes.items() if route.expires > now}
+
+    def send(self, msg_type: int, payload: bytes, destination: int):
+        """Sends along the cached route, or buffers the message and discovers one."""
+        with self._lock:
+            route = self._route(destination)
+            if route is not None:
+                self._forward(route, ROUTED_HEADER.pack(self.node_id, destination, 0, msg_type) + payload)
+                return
+
+            waiting = self._waiting.setdefault(destination, deque())
+            if len(waiting) >= ROUTE_BUFFER_SIZE:
+                waiting.popleft()
+                self.counts["buffer_overflow"] += 1
+            waiting.append((msg_type, payload))
+            if destination not in self._discovering:
+                self._discover(destination, 0)
+
+    def handle(self, packet) -> tuple[int, int, bytes] | None:
+        """
+        Processes a routing frame heard from a neighbour. Returns
+        (origin, msg_type, payload) for a ROUTED message addressed to us.
+        Raises ValueError for malformed frames.
+        """
+        handlers = {
+            MsgType.ROUTE_REQUEST: self._on_request,
+            MsgType.ROUTE_REPLY: self._on_reply,
+            MsgType.ROUTE_ERROR: self._on_error,
+            MsgType.ROUTED: self._on_routed,
+        }
+        cost = self._link_cost(packet.sender_id)
+        with self._lock:
+            return handlers[packet.msg_type](packet.sender_id, packet.payload, cost)
+
+    def link_lost(self, neighbour: int):
+        """Drops the routes through a neighbour that left."""
+        with self._lock:
+            for dest in [d for d, route in self._routes.items() if route.next_hop == neighbour]:
+                del self._routes[dest]
+                self.counts["links_lost"] += 1
+
+    # Everything below runs with the lock held
+
+    def _route(self, destination: int) -> Route | None:
+        route = self._routes.get(destination)
+        if route is None:
+            return None
+        if route.expires <= self._clock():
+            del self._routes[destination]
+            return None
+        return route
+
+    def _update(self, destination: int, next_hop: int, hops: int, metric: float, seq: int) -> bool:
+        """Installs a route unless a valid one is fresher or, at the same freshness, cheaper."""
+        route = self._route(destination)
+        if route is not None and (seq < route.seq or (seq == route.seq and metric >= route.metric)):
+            return False
+        self._routes[destination] = Route(next_hop, hops, metric, seq, self._clock() + self.lifetime)
+        return True
+
+    def _send(self, msg_type: int, payload: bytes, destination: int) -> bool:
+        try:
+            self._transmit(msg_type, payload, destination)
+        except RuntimeError:
+            self.counts["tx_queue_full"] += 1
+            return False
+        return True
+
+    def _forward(self, route: Route, payload: bytes):
+        route.expires = self._clock() + self.lifetime
+        self._send(MsgType.ROUTED, payload, route.next_hop)
+
+    def _discover(self, destination: int, attempt: int):
+        self._discovering[destination] = attempt
+        self.seq += 1
+        self._request_id = (self._request_id + 1) & 0xFFFF
+        self._remember_request(self.node_id, self._request_id)
+        known = self._routes.get(destination)
+        request = ROUTE_REQUEST.pack(self.node_id, self.seq, self._request_id, destination,
+                                     known.seq if known else 0, 0, 0)
+        self._send(MsgType.ROUTE_REQUEST, request, BROADCAST_ID)
+        self.counts["requests"] += 1
+        self._schedule(ROUTE_DISCOVERY_TIMEOUT * (1 << attempt),
+                       lambda: self._discovery_timeout(destination, attempt))
+
+    def _discovery_timeout(self, destination: int, attempt: int):
+        with self._lock:
+            if self._discovering.get(destination) != attempt:
+                return  # a reply arrived
+            if attempt < ROUTE_DISCOVERY_RETRIES:
+                self._discover(destination, attempt + 1)
+                return
+            del self._discovering[destination]
+            self.counts["no_route"] += len(self._waiting.pop(destination, ()))
+
+    def _remember_request(self, origin: int, request_id: int) -> bool:
+        """False if the request was seen before."""
+        key = (origin, request_id)
+        if key in self._requests_seen:
+            return False
+        self._requests_seen[key] = None
+        if len(self._requests_seen) > ROUTE_REQUEST_HISTORY:
+            self._requests_seen.popitem(last=False)
+        return True
+
+    def _on_request(self, neighbour: int, payload, cost: float):
+        if len(payload) != ROUTE_REQUEST.size:
+            raise ValueError("Bad route request")
+        origin, origin_seq, request_id, destination, dest_seq, hops, metric = ROUTE_REQUEST.unpack(payload)
+        if origin == self.node_id:
+            return None
+        first = self._remember_request(origin, request_id)
+        hops += 1
+        metric = metric / ROUTE_METRIC_SCALE + cost
+
+        # Later copies that came a cheaper way still improve the reverse route
+        improved = self._update(origin, neighbour, hops, metric, origin_seq)
+        if destination == self.node_id:
+            if improved:
+                if first:
+                    self.seq = max(self.seq + 1, dest_seq)
+                reply = ROUTE_REPLY.pack(origin, self.node_id, self.seq, 0, 0)
+                if self._send(MsgType.ROUTE_REPLY, reply, neighbour):
+                    self.counts["replies"] += 1
+        elif first and hops < self.max_hops:
+            self._send(MsgType.ROUTE_REQUEST, ROUTE_REQUEST.pack(
+                origin, origin_seq, request_id, destination, dest_seq, hops, _encode_metric(metric)
+            ), BROADCAST_ID)
+        return None
+
+    def _on_reply(self, neighbour: int, payload, cost: float):
+        if len(payload) != ROUTE_REPLY.size:
+            raise ValueError("Bad route reply")
+        origin, destination, dest_seq, hops, metric = ROUTE_REPLY.unpack(payload)
+        hops += 1
+        metric = metric / ROUTE_METRIC_SCALE + cost
+        self._update(destination, neighbour, hops, metric, dest_seq)
+
+        if origin == self.node_id:
+            route = self._route(destination)
+            self._discovering.pop(destination, None)
+            for msg_type, body in self._waiting.pop(destination, ()):
+                self._forward(route, ROUTED_HEADER.pack(self.node_id, destination, 0, msg_type) + body)
+            return None
+
+        reverse = self._route(origin)
+        if reverse is not None:
+            self._send(MsgType.ROUTE_REPLY, ROUTE_REPLY.pack(
+                origin, destination, dest_seq, hops, _encode_metric(metric)
+            ), reverse.next_hop)
+        return None
+
+    def _on_error(self, neighbour: int, payload, cost: float):
+        if len(payload) != ROUTE_ERROR.size:
+            raise ValueError("Bad route error")
+        origin, destination = ROUTE_ERROR.unpack(payload)
+        route = self._routes.get(destination)
+        if route is not None and route.next_hop == neighbour:
+            del self._routes[destination]
+
+        if origin == self.node_id:
+            self.counts["errors"] += 1
+            return None
+        reverse = self._route(origin)
+        if reverse is not None:
+            self._send(MsgType.ROUTE_ERROR, payload, reverse.next_hop)
+        return None
+
+    def _on_routed(self, neighbour: int, payload, cost: float):
+        if len(payload) < ROUTED_HEADER.size:
+            raise ValueError("Bad routed frame")
+        origin, destination, hops, msg_type = ROUTED_HEADER.unpack_from(payload)
+        body = bytes(payload[ROUTED_HEADER.size:])
+        if destination == self.node_id:
+            return origin, msg_type, body
+
+        route = self._route(destination)
+        if route is None or hops + 1 >= self.max_hops:
+            self.counts["no_route"] += 1
+            # The previous hop is on the origin's path, which may be all we know
+            self._send(MsgType.ROUTE_ERROR, ROUTE_ERROR.pack(origin, destination), neighbour)
+            return None
+        self._forward(route, ROUTED_HEADER.pack(origin, destination, hops + 1, msg_type) + body)
+        self.counts["forwarded"] += 1
+        return None
@@ -0,0 +1,78 @@
+import threading
+from collections import deque
+
+from .constants import RX_QUEUE_SIZE
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class PacketQueue:
+    """
+    Bounded FIFO between the I/O thread and application consumers.
+
+    When full, `policy` decides: DROP_OLDEST discards the oldest queued
+    packet, DROP_NEWEST discards the arriving one (both counted in
+    `overflows`), and BLOCK makes put() wait for space, which stalls the
+    radio I/O thread until the consumer catches up.
+    """
+
+    def __init__(self, capacity: int = RX_QUEUE_SIZE, policy: str = DROP_OLDEST):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"policy must be one of {OVERFLOW_POLICIES}")
+        self.capacity = capacity
+        self.policy = policy
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.overflows = 0
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+    def put(self, item) -> bool:
+        """Queues `item`. Returns False if it (or an older item) was dropped."""
+        with self._cond:
+            if len(self._items) >= self.capacity:
+                if self.policy == BLOCK:
+                    self._cond.wait_for(lambda: len(self._items) < self.capacity or self._closed)
+                    if self._closed:
+                        return False
+                elif self.policy == DROP_NEWEST:
+                    self.overflows += 1
+                    return False
+                else:
+                    self._items.popleft()
+                    self.overflows += 1
+                    self._items.append(item)
+                    self._cond.notify_all()
+                    return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get_many(self, max_n: int, timeout: float | None = 0.0) -> list:
+        """
+        Removes up to `max_n` items, waiting up to `timeout` seconds (forever
+        if None) for the first one. Returns an empty list on timeout.
+        """
+        with self._cond:
+            if not self._items and timeout != 0:
+                self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            count = min(max_n, len(self._items))
+            items = [self._items.popleft() for _ in range(count)]
+            if items:
+                # Wake a producer waiting for space
+                self._cond.notify_all()
+            return items
+
+    def close(self):
+        """Releases blocked producers and consumers."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -1,128 +1,765 @@
 from .constants import *
-from .packet import Packet
+from .packet import Packet, PACKET_HEADER, make_nonce, set_hops
 from .keystore import KeyStore
-
+from .replay import ReplayProtection
+from .counter_store import CounterStore
+from .ratelimit import TokenBucketLimiter
+from .fragment import MAX_MESSAGE_SIZE, Reassembler, fragment_payload
+from .aggregate import Aggregator, split_aggregate
+from .airtime import DutyCycleExceeded, DutyCycleLimiter
+from .adr import AdrController, REQUIRED_SNR
+from .trickle import TrickleTimer
+from .peers import PEER_ADDED, PEER_LOST, PeerTable
+from .rx_queue import DROP_OLDEST, PacketQueue
+from .flood import FloodCache
+from .compression import Compressor
+from .store_forward import STORE_EVICTED, STORE_SENT, MessageStore
+from .routing import ROUTED_COUNTER, ROUTED_HEADER, ROUTING_TYPES, Router, link_etx
+from .reliable import ACK_PAYLOAD, RELIABLE_HEADER, DuplicateFilter, ReliableSender
+
+import heapq
+import itertools
+import random
 import threading
 import queue
 import time
-from collections import defaultdict
+from collections import Counter
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+
+# Frame versions this node can decode, advertised in discovery beacons
+VERSION_CAPABILITIES = sum(1 << v for v in SUPPORTED_VERSIONS)
+
+# TX queue order; anything not listed is sent as DATA
+TX_PRIORITIES = {
+    MsgType.COMMAND: TxPriority.CONTROL,
+    MsgType.RESPONSE: TxPriority.CONTROL,
+    MsgType.ACK: TxPriority.ACK,
+    MsgType.DISCOVERY: TxPriority.DISCOVERY,
+    MsgType.ROUTE_REQUEST: TxPriority.CONTROL,
+    MsgType.ROUTE_REPLY: TxPriority.CONTROL,
+    MsgType.ROUTE_ERROR: TxPriority.CONTROL,
+}
+
+# Frames for neighbours only, never flooded by relays
+LINK_LOCAL_TYPES = (MsgType.DISCOVERY,) + ROUTING_TYPES
+
+
+class TxQueueFull(RuntimeError):
+    """Raised by send() when the TX queue is at capacity."""
 
-from Crypto.Cipher import AES
-from Crypto.Random import get_random_bytes
 
 class SecureLoRa:
-    def __init__(self, radio, sender_id, key_store: 'KeyStore', debug: bool = False):
+    def __init__(self, radio, sender_id, key_store: 'KeyStore', debug: bool = False,
+                 counter_path: str | None = None, groups=(), compact: bool = False,
+                 tag_size: int = COMPACT_TAG_SIZE, aggregation_delay: float = 0.0,
+                 duty_cycle: float | None = None, duty_cycle_max_wait: float = 0.0,
+                 tx_queue_size: int = TX_QUEUE_SIZE, adr: bool = False,
+                 listen_before_talk: bool = False, rx_queue_size: int = RX_QUEUE_SIZE,
+                 rx_overflow: str = DROP_OLDEST, relay: bool = False, hop_limit: int = 0,
+                 routing: bool = False, store_path: str | None = None, compression: bool = False,
+                 compression_dict: bytes | None = None, min_rx_tag_size: int | None = None):
         self.radio = radio
         self.sender_id = sender_id
         self.key_store = key_store
+        # Only the I/O thread assigns counters, so nonces are never reused
         self.counter = 0
+        # Persist the TX counter so nonces aren't reused after a restart
+        self._counter_store = None
+        if counter_path is not None:
+            self._counter_store = CounterStore(counter_path)
+            self.counter = self._counter_store.load()
         self.debug = debug
-        self.peers = defaultdict(dict)
-
-        # RX
-        self._rx_queue = queue.Queue()
+        # Destinations we accept besides our own ID and broadcast
+        self.groups = set(groups)
+        # Prefer compact (v2) frames towards peers that advertised support
+        if tag_size not in COMPACT_TAG_SIZES:
+            raise ValueError(f"tag_size must be one of {COMPACT_TAG_SIZES}")
+        self.compact = compact
+        self.tag_size = tag_size
+        # Shorter tags are refused on receive, or a forger could pick the weakest
+        if min_rx_tag_size is None:
+            min_rx_tag_size = tag_size
+        if min_rx_tag_size not in COMPACT_TAG_SIZES:
+            raise ValueError(f"min_rx_tag_size must be one of {COMPACT_TAG_SIZES}")
+        self.min_rx_tag_size = min_rx_tag_size
+        # Deflate payloads of compact frames towards peers that advertised the
+        # same preset dictionary. Received compressed frames are always inflated.
+        self.compression = compression
+        self.compressor = Compressor(compression_dict)
+        self.compression_counts = Counter()  # compressed, raw, bytes_saved
+        self.peers = PeerTable()
+        self.replay = ReplayProtection()
+        self.rate_limiter = TokenBucketLimiter()
+        self.drop_counts = Counter()  # reason -> frames dropped by the RX filter
+        self.reassembler = Reassembler()
+        # Identifies the fragments of one send_large() call. Starts at random so a
+        # rebooted sender's messages don't collide with its stale partial ones.
+        self._message_ids = itertools.count(random.getrandbits(16))
+        # Batch small DATA messages into one frame for up to aggregation_delay seconds
+        self.aggregator = None
+        if aggregation_delay > 0:
+            self.aggregator = Aggregator(self._send_frame, self._call_later, aggregation_delay,
+                                         on_drop=self._aggregate_dropped)
+        # Charge every frame's time-on-air against a sliding-window budget; frames
+        # wait up to duty_cycle_max_wait seconds for budget, then are dropped
+        self.duty_cycle = None
+        if duty_cycle is not None:
+            self.duty_cycle = DutyCycleLimiter(duty_cycle)
+        self.duty_cycle_max_wait = duty_cycle_max_wait
+        # Per-destination SF/BW from the SNR heard on each link. The destination
+        # must be listening on the chosen settings (e.g. a multi-SF gateway or
+        # nodes configured to match), so this is off by default.
+        self.adr = None
+        if adr:
+            names = {p.name for p in radio.get_parameter_definitions()}
+            if not {"spreading_factor", "signal_bandwidth"} <= names:
+                raise ValueError("ADR needs a radio with spreading_factor and signal_bandwidth parameters")
+            self.adr = AdrController()
+
+        # Multi-hop: frames we send may be relayed up to hop_limit times, and in
+        # relay mode we rebroadcast others' frames after a random delay unless
+        # enough copies were already heard. Relays need the keys of the nodes
+        # they forward for, so unauthenticated frames are never amplified.
+        if not 0 <= hop_limit <= MAX_HOP_LIMIT:
+            raise ValueError(f"hop_limit must be between 0 and {MAX_HOP_LIMIT}")
+        self.relay = relay
+        self.hop_limit = hop_limit
+        self.flood_cache = FloodCache()
+        self.relay_counts = Counter()  # scheduled, relayed, suppressed, dropped
+
+        # TX: (priority, sequence, (msg_type, payload, destination, version)), sent by
+        # the I/O thread. Relayed frames are queued ready-built, with version None.
+        self._tx_queue = queue.PriorityQueue(tx_queue_size)
+        self._tx_sequence = itertools.count()  # FIFO within a priority
+        self._tx_held = None  # (frame, msg_type, destination, relayed, give up time) waiting for a clear channel or budget
+        self.tx_drop_counts = Counter()  # reason -> queued frames never transmitted
+        # Check the channel (CAD) before each frame and back off while it is busy
+        self.listen_before_talk = listen_before_talk
+        self._tx_backoffs = 0  # backoffs taken by the held frame
+        self._tx_not_before = 0.0  # monotonic time the held frame may be retried
+        self.lbt_counts = Counter()  # deferrals, collisions_avoided, forced
+
+        # Callbacks run on the I/O thread: heap of (due, sequence, callback)
+        self._timers = []
+        self._timer_sequence = itertools.count()
+        self._timer_lock = threading.Lock()
+
+        # Reliable unicast: retransmit until ACKed, deliver duplicates once
+        self.reliable = ReliableSender(self._send_frame, self._call_later, self._frame_airtime)
+        self._duplicates = DuplicateFilter()
+
+        # On-demand unicast routes for send_routed(), dropped when their next hop is lost
+        self.router = None
+        if routing:
+            self.router = Router(sender_id, self._send_frame, self._call_later, self._link_cost)
+
+        # Store-and-forward: messages for absent peers wait on disk until the peer
+        # is heard again, then go out one per STORE_FLUSH_INTERVAL. Ones whose
+        # peer never returns age out in a sweep every STORE_EXPIRE_INTERVAL
+        self.store = None
+        self._store_listeners = []
+        self._flushing = set()  # destinations being flushed, I/O thread only
+        self._flush_stalled = set()  # destinations that stopped ACKing, flushed when heard again
+        if store_path is not None:
+            self.store = MessageStore(store_path, on_evict=lambda entry_id, reason: self._store_event(
+                STORE_EVICTED, entry_id))
+            self._call_later(STORE_EXPIRE_INTERVAL, self._expire_store)
+
+        # RX: delivered to listeners if any are registered, else queued for receive()
+        self._rx_queue = PacketQueue(rx_queue_size, rx_overflow)
+        self._packet_listeners = []
+        # Bounds how long stop() can lag, and the TX latency of radios whose
+        # wait_for_packet() can't be woken
+        self._rx_wait_timeout = 0.1  # seconds
+
+        # Discovery beacons on a Trickle interval, run by the I/O thread
+        self.beacon_counts = Counter()  # sent, suppressed, airtime (seconds)
+        self._beacon_seq = 0  # numbers our discovery beacons for the neighbours' link estimates
+        self._last_presence = float("-inf")  # monotonic time of our last broadcast frame
+        self.trickle = TrickleTimer(self._beacon, self._call_later)
+        self.trickle.start()
+        # Peers coming and going are topology changes
+        self.peers.subscribe(lambda event, peer: self.trickle.reset())
+        if self.router is not None:
+            self.peers.subscribe(self._route_peer_event)
+        if self.store is not None:
+            self.peers.subscribe(self._store_peer_event)
+
+        # The I/O thread is the only user of the radio: it multiplexes RX and
+        # the TX queue, so half-duplex hardware never sees concurrent access
         self._running = True
-        self._rx_thread = threading.Thread(
-            target=self._rx_loop,
-            daemon=True
-        )
-        self._rx_thread.start()
-
-        # Discovery TX
-        self._discovery_interval = 5.0  # seconds
-        self._discovery_thread = threading.Thread(
-            target=self._discovery_loop,
+        self._io_thread = threading.Thread(
+            target=self._io_loop,
             daemon=True
         )
-        self._discovery_thread.start()
+        self._io_thread.start()
 
     # ------------------------
     # Public API
     # ------------------------
 
-    def send(self, msg_type: int, payload: bytes):
-        if msg_type != MsgType.DISCOVERY:
-            self.counter += 1
+    def send(self, msg_type: int, payload: bytes, destination: int = BROADCAST_ID):
+        if len(payload) > MAX_PAYLOAD_SIZE:
+            raise ValueError(f"Payload of {len(payload)} bytes exceeds {MAX_PAYLOAD_SIZE}, use send_large()")
 
-        # Get encryption key
-        key = self.key_store.get_key(self.sender_id)
-        if not key:
+        if self.aggregator is not None:
+            if msg_type == MsgType.DATA and self.aggregator.fits(payload):
+                self.aggregator.add(msg_type, payload, destination)
+                return
+            # Keep ordering with messages already waiting for this destination
+            self.aggregator.flush(destination)
+
+        self._send_frame(msg_type, payload, destination)
+
+    def _send_frame(self, msg_type: int, payload: bytes, destination: int):
+        if not self.key_store.has_sender(self.sender_id):
             raise ValueError(f"No key for sender {self.sender_id}")
 
-        # Use counter + sender_id as a 12-byte nonce (8+4)
-        nonce = self.counter.to_bytes(8, "big") + self.sender_id.to_bytes(4, "big")
+        self._enqueue((msg_type, payload, destination, self._frame_version(msg_type, destination)))
+
+    def _enqueue(self, job):
+        priority = TX_PRIORITIES.get(job[0], TxPriority.DATA)
+        try:
+            self._tx_queue.put_nowait((priority, next(self._tx_sequence), job))
+        except queue.Full:
+            raise TxQueueFull(f"TX queue full ({self._tx_queue.maxsize} frames)") from None
+        self.radio.wake()
+
+    def _frame_airtime(self, payload_length: int) -> float:
+        # Full-header framing is the worst case
+        return self.radio.time_on_air(PACKET_HEADER.size + payload_length + AUTH_TAG_SIZE)
+
+    def _call_later(self, delay: float, callback):
+        """Runs `callback` on the I/O thread after `delay` seconds."""
+        with self._timer_lock:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._timer_sequence), callback))
+        self.radio.wake()
+
+    def _run_timers(self) -> float:
+        """Runs due timers. Returns the seconds until the next one."""
+        while True:
+            with self._timer_lock:
+                if not self._timers:
+                    return self._rx_wait_timeout
+                due, _, callback = self._timers[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    return wait
+                heapq.heappop(self._timers)
+            try:
+                callback()
+            except Exception as e:
+                if self.debug:
+                    print(f"Timer callback failed: {e}")
+
+    def _next_counter(self) -> int:
+        # I/O thread only
+        self.counter += 1
+        if self._counter_store is not None:
+            self._counter_store.ensure_reserved(self.counter)
+        return self.counter
+
+    def _build_frame(self, msg_type: int, payload: bytes, destination: int, version: int) -> bytearray:
+        # Every frame, discovery included, needs a fresh nonce
+        self._next_counter()
+
+        # Get the cached cipher context for our key
+        cipher = self.key_store.get_cipher(self.sender_id)
 
-        # Encrypt payload with AES-GCM
-        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
-        ciphertext, auth_tag = cipher.encrypt_and_digest(payload)
+        # Use counter + sender_id as a 12-byte nonce (8+4)
+        nonce = make_nonce(self.counter, self.sender_id)
 
         # Build packet
         packet = Packet(
-            version=PROTOCOL_VERSION,
+            version=version,
             sender_id=self.sender_id,
             msg_type=msg_type,
-            payload=ciphertext,
-            auth_tag=auth_tag,   # reuse auth_tag field for AES-GCM tag
-            nonce=nonce
+            payload=b"",
+            auth_tag=b"",
+            nonce=nonce,
+            destination=destination,
+            tag_size=self.tag_size if version == COMPACT_PROTOCOL_VERSION else AUTH_TAG_SIZE,
+            # Beacons build the peer table and routing does its own forwarding
+            hop_limit=0 if msg_type in LINK_LOCAL_TYPES else self.hop_limit
         )
 
+        # Compress before encrypting, ciphertext doesn't compress
+        if self.compression and version == COMPACT_PROTOCOL_VERSION and self._share_dictionary(destination):
+            compressed = self.compressor.compress(payload)
+            if compressed is None:
+                self.compression_counts["raw"] += 1
+            else:
+                self.compression_counts["compressed"] += 1
+                self.compression_counts["bytes_saved"] += len(payload) - len(compressed)
+                payload = compressed
+                packet.compressed = True
+
+        # Encrypt payload with AES-GCM, authenticating the header as AAD
+        packet.payload, packet.auth_tag = cipher.encrypt(nonce, payload, self._associated_data(packet))
+
         if self.debug and msg_type != MsgType.DISCOVERY:
             print(f"Sending packet | type={msg_type} counter={self.counter}")
 
-        self.radio.send(packet.serialize())
+        return packet.serialize()
+
+    def send_large(self, msg_type: int, payload: bytes, destination: int = BROADCAST_ID):
+        """Sends a payload of any size, splitting it into FRAGMENT frames if needed."""
+        if len(payload) <= MAX_PAYLOAD_SIZE:
+            return self.send(msg_type, payload, destination)
+
+        message_id = next(self._message_ids) & 0xFFFF
+        for fragment in fragment_payload(msg_type, message_id, payload):
+            self.send(MsgType.FRAGMENT, fragment, destination)
+
+    def send_reliable(self, msg_type: int, payload: bytes, destination: int) -> Future:
+        """
+        Sends a unicast message that is retransmitted until the destination
+        ACKs it. The returned future resolves to True on ACK, or raises
+        TimeoutError once the retries are used up.
+        """
+        if destination == BROADCAST_ID or destination in self.groups:
+            raise ValueError("Reliable delivery needs a unicast destination")
+        if RELIABLE_HEADER.size + len(payload) > MAX_PAYLOAD_SIZE:
+            raise ValueError(f"Payload of {len(payload)} bytes too large for reliable delivery")
+        return self.reliable.send(msg_type, payload, destination)
+
+    def send_routed(self, msg_type: int, payload: bytes, destination: int):
+        """
+        Sends a unicast message along a single multi-hop path, discovering the
+        route first if none is cached. Needs routing=True on every node of the path.
+        """
+        if self.router is None:
+            raise RuntimeError("Routing is not enabled")
+        if destination == BROADCAST_ID or destination in self.groups:
+            raise ValueError("Routing needs a unicast destination")
+        if ROUTED_HEADER.size + ROUTED_COUNTER.size + len(payload) + AUTH_TAG_SIZE > MAX_PAYLOAD_SIZE:
+            raise ValueError(f"Payload of {len(payload)} bytes too large for a routed frame")
+        if not self.key_store.has_sender(self.sender_id):
+            raise ValueError(f"No key for sender {self.sender_id}")
+        # Sealed on the I/O thread, which owns the counter
+        self._call_later(0, lambda: self.router.send(
+            msg_type, self._seal_routed(msg_type, payload, destination), destination
+        ))
+
+    def _seal_routed(self, msg_type: int, payload: bytes, destination: int) -> bytes:
+        """Encrypts a routed message end-to-end, so relaying nodes can't alter or forge it."""
+        counter = self._next_counter()
+        cipher = self.key_store.get_cipher(self.sender_id)
+        aad = ROUTED_HEADER.pack(self.sender_id, destination, 0, msg_type)
+        ciphertext, auth_tag = cipher.encrypt(make_nonce(counter, self.sender_id), payload, aad)
+        return ROUTED_COUNTER.pack(counter) + ciphertext + auth_tag
+
+    def send_or_store(self, msg_type: int, payload: bytes, destination: int) -> int | None:
+        """
+        Stores a message until `destination` ACKs it and returns the store
+        entry ID; STORE_SENT follows the ACK. Peers in range are tried straight
+        away, the rest when they are heard again. Messages too large for one
+        reliable frame can't be ACKed: they are sent unacknowledged to a peer
+        in range (returning None), and count as sent once handed to the radio.
+        Needs a store_path.
+        """
+        if self.store is None:
+            raise RuntimeError("Store-and-forward needs a store_path")
+        if destination == BROADCAST_ID or destination in self.groups:
+            raise ValueError("Store-and-forward needs a unicast destination")
+        if len(payload) > MAX_MESSAGE_SIZE:
+            raise ValueError(f"Payload of {len(payload)} bytes exceeds {MAX_MESSAGE_SIZE}")
+
+        # Messages already waiting go first
+        if (destination in self.peers and not self._fits_reliable(payload)
+                and not self.store.count(destination)):
+            self.send_large(msg_type, payload, destination)
+            return None
+        entry_id = self.store.put(destination, msg_type, payload)
+        if destination in self.peers:
+            self._call_later(0.0, lambda: self._start_flush(destination))
+        return entry_id
+
+    @staticmethod
+    def _fits_reliable(payload) -> bool:
+        return RELIABLE_HEADER.size + len(payload) <= MAX_PAYLOAD_SIZE
+
+    def _store_peer_event(self, event: str, peer):
+        if event == PEER_ADDED:
+            self._flush_stalled.discard(peer.sender_id)
+            self._start_flush(peer.sender_id)
+
+    def _start_flush(self, destination: int):
+        if destination not in self._flushing:
+            self._flushing.add(destination)
+            self._flush_stored(destination)
+
+    def _flush_stored(self, destination: int):
+        entry = self.store.peek(destination) if destination in self.peers else None
+        if entry is None:
+            self._flushing.discard(destination)
+            return
+
+        entry_id, msg_type, payload = entry
+        if self._fits_reliable(payload):
+            try:
+                future = self.reliable.send(msg_type, payload, destination)
+            except RuntimeError:
+                pass  # retransmission buffer full, try again next interval
+            else:
+                future.add_done_callback(lambda f: self._stored_acked(destination, entry_id, f))
+                return
+        else:
+            try:
+                self.send_large(msg_type, payload, destination)
+            except TxQueueFull:
+                pass  # try again next interval
+            else:
+                self.store.remove(entry_id)
+                self._store_event(STORE_SENT, entry_id)
+        # Paced, so a returning node's backlog leaves room for other traffic
+        self._call_later(STORE_FLUSH_INTERVAL, lambda: self._flush_stored(destination))
+
+    def _stored_acked(self, destination: int, entry_id: int, future: Future):
+        # Runs on the I/O thread, which resolves reliable futures
+        if future.cancelled():
+            return  # stopping
+        if future.exception() is not None:
+            # In the peer table but not answering: keep the entry until it's heard again
+            self._flushing.discard(destination)
+            self._flush_stalled.add(destination)
+            return
+        self.store.remove(entry_id)
+        self._store_event(STORE_SENT, entry_id)
+        self._call_later(STORE_FLUSH_INTERVAL, lambda: self._flush_stored(destination))
+
+    def _expire_store(self):
+        self.store.expire()  # reported through on_evict
+        self._call_later(STORE_EXPIRE_INTERVAL, self._expire_store)
+
+    def _store_event(self, event: str, entry_id: int):
+        for callback in list(self._store_listeners):
+            callback(event, entry_id)
+
+    def _link_cost(self, neighbour: int) -> float:
+        required_snr = REQUIRED_SNR.get(getattr(self.radio, "spreading_factor", None))
+        return link_etx(self.peers.get(neighbour), required_snr)
+
+    def _route_peer_event(self, event: str, peer):
+        if event == PEER_LOST:
+            self.router.link_lost(peer.sender_id)
 
     def receive(self, timeout: float | None = 0.0) -> Packet | None:
+        packets = self._rx_queue.get_many(1, timeout)
+        return packets[0] if packets else None
+
+    def receive_many(self, max_n: int = 32, timeout: float | None = 0.0) -> list[Packet]:
+        """
+        Returns up to `max_n` queued packets in one call, waiting up to
+        `timeout` seconds for the first. Empty list on timeout.
+        """
+        return self._rx_queue.get_many(max_n, timeout)
+
+    def _beacon(self):
+        # Any broadcast frame this interval already told neighbours we're here
+        if time.monotonic() - self._last_presence < self.trickle.interval:
+            self.beacon_counts["suppressed"] += 1
+            return
         try:
-            return self._rx_queue.get(block=True, timeout=timeout)
-        except queue.Empty:
-            return None
-
-    def _discovery_loop(self):
-        time.sleep(1.0)
-        while self._running:
             self._send_discovery()
-            time.sleep(self._discovery_interval)
+        except TxQueueFull:
+            if self.debug:
+                print("Skipping discovery beacon, TX queue full")
 
     def _send_discovery(self):
-        payload = self.sender_id.to_bytes(4, "big")
+        # SenderID (4) | bitmask of frame versions we can decode (1) | compression dictionary ID (1) |
+        # beacon sequence (2)
+        seq = (self._beacon_seq + 1) & 0xFFFF
+        payload = (self.sender_id.to_bytes(4, "big") + bytes([VERSION_CAPABILITIES, self.compressor.dictionary_id])
+                   + seq.to_bytes(2, "big"))
         self.send(MsgType.DISCOVERY, payload)
+        # Only beacons that were queued count, or neighbours would see losses
+        self._beacon_seq = seq
+
+    def _frame_version(self, msg_type: int, destination: int) -> int:
+        # Discovery stays on the full header so every node can read the capability byte
+        if not self.compact or msg_type == MsgType.DISCOVERY:
+            return PROTOCOL_VERSION
+
+        capable = self._receivers(destination)
+        if capable and all(COMPACT_PROTOCOL_VERSION in (p.versions or ()) for p in capable):
+            return COMPACT_PROTOCOL_VERSION
+        return PROTOCOL_VERSION
+
+    def _share_dictionary(self, destination: int) -> bool:
+        receivers = self._receivers(destination)
+        return bool(receivers) and all(p.dictionary == self.compressor.dictionary_id for p in receivers)
+
+    def _receivers(self, destination: int) -> list:
+        peer = self.peers.get(destination)
+        if peer is not None:
+            return [peer]
+        # Broadcast or group: everyone we know must understand it
+        return self.peers.values()
+
+    def _associated_data(self, packet) -> bytes:
+        # A compressed frame also authenticates the dictionary it was deflated
+        # against, so a receiver holding another one fails auth
+        if packet.compressed:
+            return packet.header() + bytes([self.compressor.dictionary_id])
+        return packet.header()
 
     def stop(self):
-        self._running = False
-        self._rx_thread.join(timeout=1.0)
-        self._discovery_thread.join(timeout=1.0)
+        try:
+            if self.aggregator is not None:
+                self.aggregator.flush()
+        finally:
+            self._running = False
+            self._rx_queue.close()  # releases an I/O thread blocked on a full queue
+            self.radio.wake()
+            self._io_thread.join(timeout=1.0)
+            if self.aggregator is not None:
+                self.aggregator.discard()  # batches the TX queue never took
+            self.reliable.cancel_all()
+            if self.store is not None:
+                self.store.close()
 
     # ------------------------
-    # Background RX logic
+    # Background radio I/O
     # ------------------------
 
-    def _rx_loop(self):
+    def _io_loop(self):
         while self._running:
-            data = self.radio.receive()
+            self.peers.expire()
+            timeout = min(self._run_timers(), self._service_tx())
 
-            if not data:
-                time.sleep(0.01)
+            # Blocks until the radio signals a frame, send() wakes us or the
+            # next held frame is due (or falls back to polling for radios
+            # that can't block)
+            if not self.radio.wait_for_packet(timeout):
                 continue
 
-            packet = self._process_raw_packet(data)
+            data = self.radio.receive()
+            if data:
+                # One bad frame must not take the I/O thread down with it
+                try:
+                    self._handle_frame(data)
+                except Exception as e:
+                    if self.debug:
+                        print(f"Failed to handle frame: {e}")
+
+        # Last chance for frames queued before stop()
+        self._service_tx()
+
+    def _service_tx(self) -> float:
+        """Sends queued frames in priority order. Returns how long the I/O loop may block."""
+        while True:
+            if self._tx_held is None:
+                try:
+                    _, _, job = self._tx_queue.get_nowait()
+                except queue.Empty:
+                    return self._rx_wait_timeout
+
+                msg_type, frame, destination, version = job
+                if version is not None:
+                    try:
+                        frame = self._build_frame(*job)
+                    except ValueError as e:
+                        self._tx_drop("no_key", str(e))
+                        continue
+                self._tx_held = (frame, msg_type, destination, version is None,
+                                 time.monotonic() + self.duty_cycle_max_wait)
+
+            frame, msg_type, destination, relayed, give_up = self._tx_held
+            backoff = self._tx_not_before - time.monotonic()
+            if backoff > 0:
+                return min(backoff, self._rx_wait_timeout)
+
+            with self._link_parameters(destination):
+                if self.listen_before_talk:
+                    backoff = self._listen_before_talk(frame)
+                    if backoff:
+                        self._tx_not_before = time.monotonic() + backoff
+                        return min(backoff, self._rx_wait_timeout)
+
+                if self.duty_cycle is not None:
+                    try:
+                        delay = self.duty_cycle.reserve(self.radio.time_on_air(len(frame)))
+                    except DutyCycleExceeded:
+                        delay, give_up = float("inf"), 0.0
+                    if delay > 0:
+                        if time.monotonic() + delay > give_up:
+                            self._release_held()
+                            self._tx_drop("duty_cycle", f"Duty-cycle budget exhausted, next slot in {delay:.1f}s")
+                            continue
+                        # Keep receiving until there is budget again
+                        return min(delay, self._rx_wait_timeout)
+
+                self._release_held()
+                try:
+                    self.radio.send(frame)
+                except Exception as e:
+                    self._tx_drop("radio_error", f"Radio send failed: {e}")
+                    continue
+
+                if msg_type == MsgType.DISCOVERY:
+                    self.beacon_counts["sent"] += 1
+                    self.beacon_counts["airtime"] += self.radio.time_on_air(len(frame))
+                elif relayed:
+                    self.relay_counts["relayed"] += 1
+                elif destination == BROADCAST_ID:
+                    self._last_presence = time.monotonic()
+
+    def _listen_before_talk(self, frame) -> float:
+        """Returns a randomized backoff if the channel is busy, 0 to transmit now."""
+        if self.radio.channel_busy():
+            if self._tx_backoffs < LBT_MAX_BACKOFFS:
+                self._tx_backoffs += 1
+                self.lbt_counts["deferrals"] += 1
+                # Binary exponential backoff in slots of this frame's airtime
+                slot = max(LBT_MIN_SLOT, self.radio.time_on_air(len(frame)))
+                return random.uniform(slot, slot * (1 << self._tx_backoffs))
+            self.lbt_counts["forced"] += 1
+        elif self._tx_backoffs:
+            # Deferred at least once and the channel has cleared
+            self.lbt_counts["collisions_avoided"] += 1
+        return 0.0
+
+    def _release_held(self):
+        self._tx_held = None
+        self._tx_backoffs = 0
+        self._tx_not_before = 0.0
+
+    @contextmanager
+    def _link_parameters(self, destination: int):
+        """Applies the ADR settings for a unicast destination, restoring the defaults after."""
+        settings = None
+        if self.adr is not None and destination != BROADCAST_ID and destination not in self.groups:
+            settings = self.adr.select(destination)
+        if not settings:
+            yield
+            return
+
+        previous = {name: getattr(self.radio, name) for name in settings}
+        for name, value in settings.items():
+            if previous[name] != value:
+                self.radio.set_parameter(name, value)
+        try:
+            yield
+        finally:
+            for name, value in previous.items():
+                if settings[name] != value:
+                    self.radio.set_parameter(name, value)
+
+    def _aggregate_dropped(self, destination: int, count: int):
+        self._tx_drop("tx_queue_full", f"TX queue full, dropped batch of {count} messages to {hex(destination)}")
+
+    def _tx_drop(self, reason: str, message: str):
+        self.tx_drop_counts[reason] += 1
+        if self.debug:
+            print(message)
+
+    def _handle_frame(self, data):
+        quality = self.radio.signal_quality()
+        packet = self._process_raw_packet(data)
+        if not packet:
+            return
+
+        if quality is not None:
+            packet.rssi, packet.snr = quality
+            # Only authenticated frames feed the link estimates
+            if self.adr is not None and not packet.relayed:
+                self.adr.observe(packet.sender_id, *quality, self.radio.signal_bandwidth)
+
+        # Every authenticated frame heard directly proves its sender is in range
+        if not packet.relayed:
+            self.peers.observe(packet.sender_id, packet.rssi, packet.snr)
+            if packet.sender_id in self._flush_stalled:
+                self._flush_stalled.discard(packet.sender_id)
+                self._start_flush(packet.sender_id)
+
+        if packet.hop_limit:
+            self.flood_cache.add(packet.sender_id, packet.counter, packet.auth_tag)
+            if self.relay and packet.destination != self.sender_id:
+                self._schedule_relay(packet, data)
+        # Relays authenticate frames for others, but only forward them
+        if not self._is_for_us(packet.destination):
+            self._drop("not_for_us", f"Relayed frame for {hex(packet.destination)}")
+            return
+
+        # Protocol-level handling
+        if packet.msg_type == MsgType.DISCOVERY:
+            self._handle_discovery(packet)
+            return
+
+        if packet.msg_type == MsgType.ACK:
+            if not self.reliable.on_ack(packet.sender_id, packet.payload):
+                self._drop("stale_ack", f"Unexpected ACK from {hex(packet.sender_id)}")
+            return
+
+        if packet.msg_type in ROUTING_TYPES:
+            packet = self._handle_routing(packet)
             if not packet:
-                continue
+                return
 
-            # Protocol-level handling
-            if packet.msg_type == MsgType.DISCOVERY:
-                self._handle_discovery(packet)
-                continue
+        if packet.msg_type == MsgType.RELIABLE:
+            packet = self._handle_reliable(packet)
+            if not packet:
+                return
 
-            # Application-level packets only
+        if packet.msg_type == MsgType.FRAGMENT:
+            packet = self._handle_fragment(packet)
+            if not packet:
+                return
+
+        if packet.msg_type == MsgType.AGGREGATE:
+            for sub_packet in self._split_aggregate(packet):
+                self._deliver(sub_packet)
+            return
+
+        # Application-level packets only
+        self._deliver(packet)
+
+    def _schedule_relay(self, packet, data):
+        frame = bytearray(data)
+        set_hops(frame, packet.hop_limit - 1)
+        origin, counter = packet.sender_id, packet.counter
+        job = (packet.msg_type, frame, packet.destination, None)
+        # Spread rebroadcasts so neighbouring relays don't collide, and so the
+        # ones that fire late hear the early ones and stand down
+        slot = max(LBT_MIN_SLOT, self.radio.time_on_air(len(frame)))
+        self._call_later(random.uniform(0, slot * RELAY_DELAY_SLOTS), lambda: self._relay(origin, counter, job))
+        self.relay_counts["scheduled"] += 1
+
+    def _relay(self, origin: int, counter: int, job):
+        if self.flood_cache.copies(origin, counter) >= RELAY_SUPPRESS_COPIES:
+            self.relay_counts["suppressed"] += 1
+            return
+        try:
+            self._enqueue(job)
+        except TxQueueFull:
+            self.relay_counts["dropped"] += 1
+
+    def _deliver(self, packet):
+        if not self._packet_listeners:
             self._rx_queue.put(packet)
+            return
+        for callback in list(self._packet_listeners):
+            callback(packet)
 
     def _process_raw_packet(self, data):
+        # Every check up to the rate limiter is a header parse or a dict
+        # lookup, so forged or replayed traffic never reaches AES-GCM
         try:
             packet = Packet.parse(data)
         except Exception:
-            if self.debug:
-                print("Failed to parse packet")
-            return None
+            return self._drop("malformed", "Failed to parse packet")
+
+        if packet.version not in SUPPORTED_VERSIONS:
+            return self._drop("version", f"Unsupported protocol version {packet.version}")
+
+        if packet.tag_size < self.min_rx_tag_size:
+            return self._drop("short_tag", f"{packet.tag_size}-byte tag below the {self.min_rx_tag_size}-byte minimum")
+
+        if packet.nonce[8:] != packet.sender_id.to_bytes(4, "big"):
+            return self._drop("malformed", "Nonce does not match sender")
 
         if self.debug:
             print(f"Received packet from {hex(packet.sender_id)}")
@@ -130,32 +767,59 @@ class SecureLoRa:
 
         # Ignore self
         if packet.sender_id == self.sender_id:
-            if self.debug:
-                print("Ignoring own packet")
-            return None
+            return self._drop("self", "Ignoring own packet")
 
-        key = self.key_store.get_key(packet.sender_id)
-        if not key:
-            if self.debug:
-                print("Unknown sender, dropping packet")
-            return None
+        # Link-local frames are never forwarded. The hop bits aren't
+        # authenticated, so a frame claiming otherwise has been tampered with
+        if packet.msg_type in LINK_LOCAL_TYPES and (packet.relayed or packet.hop_limit):
+            return self._drop("relayed_link_local", f"Relayed link-local frame from {hex(packet.sender_id)}")
+
+        # Relays decrypt frames for others too, if there are hops left
+        if not self._is_for_us(packet.destination) and not (self.relay and packet.hop_limit):
+            return self._drop("not_for_us", f"Frame for {hex(packet.destination)}, dropping packet")
+
+        cipher = self.key_store.get_cipher(packet.sender_id)
+        if cipher is None:
+            return self._drop("unknown_sender", "Unknown sender, dropping packet")
 
-        # Reconstruct nonce
-        cipher = AES.new(key, AES.MODE_GCM, nonce=packet.nonce)
+        counter = packet.counter
+        if not self.replay.check(packet.sender_id, counter):
+            if self.flood_cache.heard_again(packet.sender_id, counter, packet.auth_tag):
+                return self._drop("flood_duplicate", f"Another copy of {counter} from {hex(packet.sender_id)}")
+            return self._drop("replay", f"Replayed counter {counter}, dropping packet")
+
+        if not self.rate_limiter.allow(packet.sender_id):
+            return self._drop("rate_limited", f"Rate limit exceeded for {hex(packet.sender_id)}")
 
         try:
             # Decrypt and verify tag
-            plaintext = cipher.decrypt_and_verify(packet.payload, packet.auth_tag)
+            plaintext = cipher.decrypt(packet.nonce, packet.payload, packet.auth_tag, self._associated_data(packet))
         except ValueError:
-            if self.debug:
-                print("AES-GCM authentication failed")
-            return None
+            return self._drop("auth_failed", "AES-GCM authentication failed")
+
+        # Only authenticated frames may move the replay window
+        self.replay.update(packet.sender_id, counter)
+
+        if packet.compressed:
+            try:
+                plaintext = self.compressor.decompress(plaintext, MAX_PAYLOAD_SIZE)
+            except ValueError as e:
+                return self._drop("bad_compression", f"Bad compressed payload from {hex(packet.sender_id)}: {e}")
 
         # Replace payload with plaintext
         packet.payload = plaintext
 
         return packet
 
+    def _is_for_us(self, destination: int) -> bool:
+        return destination == BROADCAST_ID or destination == self.sender_id or destination in self.groups
+
+    def _drop(self, reason: str, message: str):
+        self.drop_counts[reason] += 1
+        if self.debug:
+            print(message)
+        return None
+
     def _handle_discovery(self, packet):
         if self.debug:
             print(f"Discovery from {hex(packet.sender_id)}")
@@ -164,10 +828,187 @@ class SecureLoRa:
             if self.debug:
                 print(f"Peer discovered but not recognized: {hex(packet.sender_id)}")
         else:
-            self.peers[packet.sender_id]['last_seen'] = time.time()
+            peer = self.peers.get(packet.sender_id)
+            if peer is None:
+                return  # not heard directly, so not a neighbour
+            versions, dictionary, seq = self._parse_capabilities(packet.payload)
+            if seq is not None:
+                self.peers.beacon(packet.sender_id, seq)
+            if (peer.versions, peer.dictionary) != (versions, dictionary):
+                peer.versions, peer.dictionary = versions, dictionary
+                self.trickle.reset()
+
+    def _handle_reliable(self, packet):
+        if len(packet.payload) < RELIABLE_HEADER.size or packet.destination != self.sender_id:
+            return self._drop("bad_reliable", f"Bad reliable frame from {hex(packet.sender_id)}")
+        msg_type, sequence = RELIABLE_HEADER.unpack_from(packet.payload)
+
+        # ACK every copy, the previous ACK may have been lost
+        try:
+            self._send_frame(MsgType.ACK, ACK_PAYLOAD.pack(sequence), packet.sender_id)
+        except TxQueueFull:
+            pass  # the sender will retransmit
+        if not self._duplicates.first_time(packet.sender_id, sequence):
+            return self._drop("duplicate", f"Duplicate reliable frame {sequence} from {hex(packet.sender_id)}")
+
+        packet.msg_type = msg_type
+        packet.payload = packet.payload[RELIABLE_HEADER.size:]
+        return packet
+
+    def _handle_routing(self, packet):
+        if self.router is None:
+            return self._drop("no_routing", f"Routing frame from {hex(packet.sender_id)}, routing disabled")
+        if packet.relayed:
+            return self._drop("bad_route", "Routing frames must come from a neighbour")
+        try:
+            message = self.router.handle(packet)
+        except ValueError as e:
+            return self._drop("bad_route", f"Bad routing frame from {hex(packet.sender_id)}: {e}")
+        if message is None:
+            return None
+
+        # The hop frame only proves which neighbour passed it on, the seal
+        # proves who wrote it
+        origin, msg_type, sealed = message
+        if len(sealed) < ROUTED_COUNTER.size + AUTH_TAG_SIZE:
+            return self._drop("bad_route", f"Truncated routed message from {hex(origin)}")
+        cipher = self.key_store.get_cipher(origin)
+        if cipher is None:
+            return self._drop("unknown_sender", f"Routed message from unknown origin {hex(origin)}")
+        (counter,) = ROUTED_COUNTER.unpack_from(sealed)
+        if not self.replay.check(origin, counter):
+            return self._drop("replay", f"Replayed routed counter {counter} from {hex(origin)}")
+        nonce = make_nonce(counter, origin)
+        aad = ROUTED_HEADER.pack(origin, self.sender_id, 0, msg_type)
+        try:
+            plaintext = cipher.decrypt(nonce, sealed[ROUTED_COUNTER.size:-AUTH_TAG_SIZE],
+                                       sealed[-AUTH_TAG_SIZE:], aad)
+        except ValueError:
+            return self._drop("auth_failed", f"Routed message from {hex(origin)} failed authentication")
+        self.replay.update(origin, counter)
+
+        # Deliver as if sent by the origin
+        packet.msg_type, packet.payload, packet.nonce = msg_type, plaintext, nonce
+        packet.relayed = origin != packet.sender_id
+        packet.sender_id = origin
+        return packet
+
+    def _handle_fragment(self, packet):
+        try:
+            message = self.reassembler.add(packet.sender_id, packet.payload)
+        except ValueError as e:
+            return self._drop("bad_fragment", f"Bad fragment from {hex(packet.sender_id)}: {e}")
+        if message is None:
+            return None
+
+        # Deliver the whole message in the last fragment's packet
+        packet.msg_type, packet.payload = message
+        return packet
+
+    def _split_aggregate(self, packet) -> list[Packet]:
+        try:
+            messages = list(split_aggregate(packet.payload))
+        except ValueError as e:
+            self._drop("bad_aggregate", f"Bad aggregate from {hex(packet.sender_id)}: {e}")
+            return []
+
+        sub_packets = []
+        for msg_type, payload in messages:
+            sub_packet = Packet(packet.version, packet.sender_id, msg_type, payload, packet.auth_tag,
+                                packet.nonce, packet.destination, packet.tag_size)
+            sub_packet.rssi, sub_packet.snr, sub_packet.relayed = packet.rssi, packet.snr, packet.relayed
+            sub_packets.append(sub_packet)
+        return sub_packets
+
+    @staticmethod
+    def _parse_capabilities(payload: bytes) -> tuple[set[int], int | None, int | None]:
+        """Returns (frame versions, compression dictionary ID, beacon sequence) from a discovery payload."""
+        # Nodes predating compact frames send only their 4-byte ID, those
+        # predating compression no dictionary ID, and older ones no sequence
+        if len(payload) < 5:
+            return {PROTOCOL_VERSION}, None, None
+        versions = {v for v in range(8) if payload[4] & (1 << v)}
+        dictionary = payload[5] if len(payload) > 5 else None
+        seq = int.from_bytes(payload[6:8], "big") if len(payload) >= 8 else None
+        return versions, dictionary, seq
+
+    def join_group(self, group_id: int):
+        self.groups.add(group_id)
+
+    def leave_group(self, group_id: int):
+        self.groups.discard(group_id)
+
+    def get_drop_stats(self) -> dict[str, int]:
+        stats = dict(self.drop_counts)
+        if self.reassembler.timeouts:
+            stats["reassembly_timeout"] = self.reassembler.timeouts
+        if self.reassembler.evictions:
+            stats["reassembly_evicted"] = self.reassembler.evictions
+        if self._rx_queue.overflows:
+            stats["rx_overflow"] = self._rx_queue.overflows
+        return stats
+
+    def get_tx_drop_stats(self) -> dict[str, int]:
+        return dict(self.tx_drop_counts)
+
+    def get_beacon_stats(self) -> dict[str, float]:
+        return dict(self.beacon_counts)
+
+    def get_relay_stats(self) -> dict[str, int]:
+        return dict(self.relay_counts)
+
+    def get_route_stats(self) -> dict[str, int]:
+        return dict(self.router.counts) if self.router is not None else {}
+
+    def get_routes(self) -> dict[int, int]:
+        """Valid routes as destination -> next hop."""
+        return self.router.routes() if self.router is not None else {}
+
+    def get_store_stats(self) -> dict[str, int]:
+        """Stored messages dropped before delivery, by reason ("age" or "bytes")."""
+        return dict(self.store.evictions) if self.store is not None else {}
+
+    def get_compression_stats(self) -> dict[str, int]:
+        return dict(self.compression_counts)
+
+    def get_lbt_stats(self) -> dict[str, int]:
+        return dict(self.lbt_counts)
+
+    def get_duty_cycle_remaining(self) -> float | None:
+        """Seconds of airtime left in the current duty-cycle window, None if unlimited."""
+        if self.duty_cycle is None:
+            return None
+        return self.duty_cycle.remaining()
+
+    def get_peers(self) -> set[int]:
+        return self.peers.ids()
+
+    def add_packet_listener(self, callback):
+        """
+        Calls `callback(packet)` on the I/O thread for every application packet.
+        While any listener is registered, packets bypass receive().
+        """
+        self._packet_listeners.append(callback)
+
+    def remove_packet_listener(self, callback):
+        self._packet_listeners.remove(callback)
+
+    def subscribe_peers(self, callback):
+        """Calls `callback(event, peer)` on the I/O thread when a peer is added or lost."""
+        self.peers.subscribe(callback)
+
+    def unsubscribe_peers(self, callback):
+        self.peers.unsubscribe(callback)
+
+    def subscribe_store(self, callback):
+        """
+        Calls `callback(event, entry_id)` when a stored message is delivered
+        (STORE_SENT) or dropped for age or space (STORE_EVICTED).
+        """
+        self._store_listeners.append(callback)
 
-    def get_peers(self):
-        return set(id for id in self.peers.keys())
+    def unsubscribe_store(self, callback):
+        self._store_listeners.remove(callback)
 
     def get_sender_id(self):
         return self.sender_id
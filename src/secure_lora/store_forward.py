@@ -0,0 +1,118 @@
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from .constants import STORE_MAX_AGE, STORE_MAX_BYTES
+
+STORE_SENT = "sent"
+STORE_EVICTED = "evicted"
+
+
+class MessageStore:
+    """
+    Persistent per-destination queue of messages waiting for a peer that is
+    out of range, kept in SQLite so it survives restarts.
+
+    Entries older than `max_age` seconds are dropped, and once the stored
+    payloads exceed `max_bytes` the oldest entries (of any destination) are
+    evicted. `on_evict(entry_id, reason)` is called for each, with reason
+    "age" or "bytes". Ages use the wall clock, since they span restarts.
+    """
+
+    def __init__(self, path: str, max_age: float = STORE_MAX_AGE, max_bytes: int = STORE_MAX_BYTES,
+                 on_evict=None, clock=time.time):
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._on_evict = on_evict
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.evictions = Counter()  # reason -> entries dropped before they could be sent
+        # Used from the I/O thread and the application's threads, always under the lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, destination INTEGER NOT NULL, "
+                "msg_type INTEGER NOT NULL, payload BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS messages_destination ON messages (destination, id)")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def put(self, destination: int, msg_type: int, payload: bytes) -> int:
+        """Stores a message and returns its entry ID."""
+        if len(payload) > self.max_bytes:
+            raise ValueError(f"Payload of {len(payload)} bytes exceeds the store size of {self.max_bytes}")
+        with self._lock:
+            with self._db:
+                entry_id = self._db.execute(
+                    "INSERT INTO messages (destination, msg_type, payload, created) VALUES (?, ?, ?, ?)",
+                    (destination, msg_type, bytes(payload), self._clock())
+                ).lastrowid
+                evicted = self._evict_oldest()
+        self._notify(evicted, "bytes")
+        return entry_id
+
+    def peek(self, destination: int) -> tuple[int, int, bytes] | None:
+        """Returns the oldest (entry_id, msg_type, payload) for `destination`."""
+        self.expire()
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, msg_type, payload FROM messages WHERE destination = ? ORDER BY id LIMIT 1",
+                (destination,)
+            ).fetchone()
+
+    def remove(self, entry_id: int) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM messages WHERE id = ?", (entry_id,))
+
+    def count(self, destination: int) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM messages WHERE destination = ?", (destination,)
+            ).fetchone()[0]
+
+    def destinations(self) -> set[int]:
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT DISTINCT destination FROM messages")}
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM messages").fetchone()[0]
+
+    def expire(self) -> list[int]:
+        """Drops entries older than max_age and returns their IDs."""
+        cutoff = self._clock() - self.max_age
+        with self._lock, self._db:
+            expired = [row[0] for row in self._db.execute("SELECT id FROM messages WHERE created <= ?", (cutoff,))]
+            self._db.execute("DELETE FROM messages WHERE created <= ?", (cutoff,))
+        self._notify(expired, "age")
+        return expired
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _evict_oldest(self) -> list[int]:
+        # Caller holds the lock, inside a transaction
+        total = self._db.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM messages").fetchone()[0]
+        evicted = []
+        for entry_id, size in self._db.execute("SELECT id, LENGTH(payload) FROM messages ORDER BY id").fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append(entry_id)
+            total -= size
+        self._db.executemany("DELETE FROM messages WHERE id = ?", [(entry_id,) for entry_id in evicted])
+        return evicted
+
+    def _notify(self, entry_ids: list[int], reason: str) -> None:
+        if not entry_ids:
+            return
+        self.evictions[reason] += len(entry_ids)
+        if self._on_evict is not None:
+            for entry_id in entry_ids:
+                self._on_evict(entry_id, reason)
@@ -0,0 +1,225 @@
+"""
+Interrupt-driven continuous receive for Semtech SX127x (RFM95x) radios.
+
+The chip is left in RX_CONTINUOUS mode with DIO0 mapped to RxDone. Every
+rising edge on DIO0 copies the frame out of the chip FIFO (plus its packet
+RSSI/SNR) into a preallocated ring buffer that receive() drains, so frames
+arriving between receive() calls are no longer lost.
+
+Register access and the DIO0 line are abstracted behind RegisterBus and
+InterruptPin so a fake SPI device can drive this in tests.
+"""
+import threading
+import time
+
+# LoRa-mode registers
+REG_FIFO = 0x00
+REG_OP_MODE = 0x01
+REG_FIFO_ADDR_PTR = 0x0D
+REG_FIFO_RX_CURRENT_ADDR = 0x10
+REG_IRQ_FLAGS = 0x12
+REG_RX_NB_BYTES = 0x13
+REG_PKT_SNR_VALUE = 0x19
+REG_PKT_RSSI_VALUE = 0x1A
+REG_DIO_MAPPING1 = 0x40
+
+OP_MODE_MASK = 0x07
+OP_MODE_LOW_FREQUENCY = 0x08
+MODE_STDBY = 0x01
+MODE_RX_CONTINUOUS = 0x05
+MODE_CAD = 0x07
+
+DIO0_MAPPING_MASK = 0xC0  # bits 7-6, 0b00 = RxDone
+
+IRQ_CAD_DETECTED = 0x01
+IRQ_CAD_DONE = 0x04
+IRQ_VALID_HEADER = 0x10
+IRQ_PAYLOAD_CRC_ERROR = 0x20
+IRQ_RX_DONE = 0x40
+
+FIFO_SIZE = 256
+
+
+class RegisterBus:
+    """Register-level access to the radio (SPI on real hardware)."""
+
+    def read_u8(self, address: int) -> int:
+        raise NotImplementedError
+
+    def write_u8(self, address: int, value: int) -> None:
+        raise NotImplementedError
+
+    def read_into(self, address: int, buf, length: int) -> None:
+        """Burst-read `length` bytes starting at `address` into `buf`."""
+        raise NotImplementedError
+
+
+class InterruptPin:
+    """Edge-triggered input line (DIO0)."""
+
+    def on_rising(self, callback) -> None:
+        """Call `callback()` on every rising edge."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class FrameRingBuffer:
+    """
+    Fixed-size ring of preallocated frame slots.
+
+    Single producer (the DIO0 handler) fills slots in place via reserve() and
+    commit(); consumers pop() frames in arrival order. When full, the oldest
+    frame is overwritten and counted in `overflows`.
+    """
+
+    def __init__(self, slots: int = 16, frame_size: int = FIFO_SIZE):
+        self._frames = [bytearray(frame_size) for _ in range(slots)]
+        self._views = [memoryview(frame) for frame in self._frames]
+        self._lengths = [0] * slots
+        self._rssi = [0.0] * slots
+        self._snr = [0.0] * slots
+        self._head = 0
+        self._count = 0
+        self._woken = False
+        self._cond = threading.Condition()
+        self.overflows = 0
+
+    def __len__(self):
+        with self._cond:
+            return self._count
+
+    def _tail(self) -> int:
+        return (self._head + self._count) % len(self._frames)
+
+    def reserve(self) -> memoryview:
+        """Return the slot the next frame should be written into."""
+        with self._cond:
+            if self._count == len(self._frames):
+                self._head = (self._head + 1) % len(self._frames)
+                self._count -= 1
+                self.overflows += 1
+            return self._views[self._tail()]
+
+    def commit(self, length: int, rssi: float, snr: float) -> None:
+        """Publish the slot returned by the last reserve()."""
+        with self._cond:
+            tail = self._tail()
+            self._lengths[tail] = length
+            self._rssi[tail] = rssi
+            self._snr[tail] = snr
+            self._count += 1
+            self._cond.notify_all()
+
+    def pop(self) -> tuple[bytes, float, float] | None:
+        """Remove the oldest frame. Returns (data, rssi, snr) or None."""
+        with self._cond:
+            if not self._count:
+                return None
+            head = self._head
+            frame = bytes(self._views[head][:self._lengths[head]])
+            self._head = (head + 1) % len(self._frames)
+            self._count -= 1
+            return frame, self._rssi[head], self._snr[head]
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until a frame is available, the timeout expires or wake() is called."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._count or self._woken, timeout)
+            self._woken = False
+            return self._count > 0
+
+    def wake(self) -> None:
+        with self._cond:
+            self._woken = True
+            self._cond.notify_all()
+
+
+class ContinuousReceiver:
+    """
+    Keeps an SX127x in RX_CONTINUOUS and moves frames into a FrameRingBuffer
+    on each DIO0 RxDone edge.
+
+    `lock` serialises register access with other users of the bus (e.g. the
+    transmit path), since the edge callback runs on its own thread.
+    """
+
+    def __init__(self, bus: RegisterBus, irq: InterruptPin, ring: FrameRingBuffer,
+                 lock=None):
+        self.bus = bus
+        self.irq = irq
+        self.ring = ring
+        self.lock = lock or threading.Lock()
+        self.crc_errors = 0
+
+    def start(self) -> None:
+        with self.lock:
+            self.listen()
+        self.irq.on_rising(self._on_dio0)
+
+    def stop(self) -> None:
+        self.irq.close()
+        self.ring.wake()
+
+    def listen(self) -> None:
+        """Map DIO0 to RxDone and enter RX_CONTINUOUS. Caller holds the lock."""
+        mapping = self.bus.read_u8(REG_DIO_MAPPING1)
+        self.bus.write_u8(REG_DIO_MAPPING1, mapping & ~DIO0_MAPPING_MASK & 0xFF)
+        op_mode = self.bus.read_u8(REG_OP_MODE)
+        self.bus.write_u8(REG_OP_MODE, (op_mode & ~OP_MODE_MASK & 0xFF) | MODE_RX_CONTINUOUS)
+
+    def channel_activity(self, timeout: float = 0.1) -> bool:
+        """
+        Runs one channel activity detection (CAD) and returns to RX_CONTINUOUS.
+        True if a LoRa preamble was detected. A CAD that doesn't finish within
+        the timeout reports the channel as free.
+        """
+        with self.lock:
+            op_mode = self.bus.read_u8(REG_OP_MODE) & ~OP_MODE_MASK & 0xFF
+            self.bus.write_u8(REG_OP_MODE, op_mode | MODE_STDBY)
+            self.bus.write_u8(REG_IRQ_FLAGS, IRQ_CAD_DONE | IRQ_CAD_DETECTED)
+            self.bus.write_u8(REG_OP_MODE, op_mode | MODE_CAD)
+
+            # A CAD lasts about two symbols: ~2 ms at SF7, ~65 ms at SF12 / 125 kHz
+            deadline = time.monotonic() + timeout
+            flags = self.bus.read_u8(REG_IRQ_FLAGS)
+            while not flags & IRQ_CAD_DONE and time.monotonic() < deadline:
+                time.sleep(0.001)
+                flags = self.bus.read_u8(REG_IRQ_FLAGS)
+
+            self.bus.write_u8(REG_IRQ_FLAGS, IRQ_CAD_DONE | IRQ_CAD_DETECTED)
+            self.listen()
+            return bool(flags & IRQ_CAD_DONE and flags & IRQ_CAD_DETECTED)
+
+    def _on_dio0(self, *_):
+        with self.lock:
+            flags = self.bus.read_u8(REG_IRQ_FLAGS)
+            if not flags & IRQ_RX_DONE:
+                # DIO0 is remapped to TxDone while transmitting
+                return
+
+            # Clear RX flags first so DIO0 drops and the next RxDone raises a new edge
+            self.bus.write_u8(REG_IRQ_FLAGS, IRQ_RX_DONE | IRQ_PAYLOAD_CRC_ERROR | IRQ_VALID_HEADER)
+            if flags & IRQ_PAYLOAD_CRC_ERROR:
+                self.crc_errors += 1
+                return
+
+            length = self.bus.read_u8(REG_RX_NB_BYTES)
+            self.bus.write_u8(REG_FIFO_ADDR_PTR, self.bus.read_u8(REG_FIFO_RX_CURRENT_ADDR))
+            slot = self.ring.reserve()
+            self.bus.read_into(REG_FIFO, slot, length)
+            self.ring.commit(length, self._packet_rssi(), self._packet_snr())
+
+    def _packet_rssi(self) -> float:
+        raw = self.bus.read_u8(REG_PKT_RSSI_VALUE)
+        # Datasheet offsets: LF port (< 525 MHz) -164, HF port -157
+        if self.bus.read_u8(REG_OP_MODE) & OP_MODE_LOW_FREQUENCY:
+            return raw - 164
+        return raw - 157
+
+    def _packet_snr(self) -> float:
+        raw = self.bus.read_u8(REG_PKT_SNR_VALUE)
+        if raw > 127:
+            raw -= 256
+        return raw / 4
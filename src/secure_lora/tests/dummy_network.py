@@ -1,3 +1,5 @@
+import threading
+import time
 from typing import Optional
 from collections import deque
 from secure_lora.radio import RadioInterface
@@ -6,28 +8,69 @@ class LoopbackNetwork:
     """
     Simulates a simple network connecting multiple DummyRadio instances.
     Each radio registers itself and can send data to the network.
+    Receivers can block on the shared condition variable until data arrives.
+
+    Each send keeps the channel busy for `busy_time` seconds as seen by the
+    other radios' channel_busy() (a stand-in for LoRa CAD).
+
+    disconnect() takes a pair of radios out of range of each other, e.g. to
+    build a multi-hop line topology.
     """
-    def __init__(self):
-        self._queues = {}  # radio_id -> list of messages
+    def __init__(self, busy_time: float = 0.0):
+        self._queues = {}  # radio_id -> deque of messages
+        self._woken = set()  # radios whose pending wait should return early
+        self._cond = threading.Condition()
+        self.busy_time = busy_time
+        self._busy_until = 0.0
+        self._last_sender = None
+        self._out_of_range = set()  # frozensets of radio pairs that can't hear each other
 
     def register(self, radio):
-        self._queues[radio] = []
+        with self._cond:
+            self._queues[radio] = deque()
 
     def send(self, sender, data):
         # Deliver to all other radios except sender
-        for radio in self._queues:
-            if radio != sender:
-                self._queues[radio].append(data)
+        with self._cond:
+            for radio, pending in self._queues.items():
+                if radio != sender and frozenset((radio, sender)) not in self._out_of_range:
+                    pending.append(data)
+            self._busy_until = time.monotonic() + self.busy_time
+            self._last_sender = sender
+            self._cond.notify_all()
 
         print(data)
 
+    def disconnect(self, radio_a, radio_b):
+        with self._cond:
+            self._out_of_range.add(frozenset((radio_a, radio_b)))
+
     def receive(self, radio):
-        if self._queues[radio]:
-            return self._queues[radio].pop(0)
+        with self._cond:
+            if self._queues[radio]:
+                return self._queues[radio].popleft()
         return None
 
+    def wait(self, radio, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._queues[radio] or radio in self._woken,
+                timeout
+            )
+            self._woken.discard(radio)
+            return bool(self._queues[radio])
+
+    def channel_busy(self, radio) -> bool:
+        with self._cond:
+            return radio != self._last_sender and time.monotonic() < self._busy_until
+
+    def wake(self, radio):
+        with self._cond:
+            self._woken.add(radio)
+            self._cond.notify_all()
 
-class DummyRadio:
+
+class DummyRadio(RadioInterface):
     """
     Dummy radio that sends/receives via the LoopbackNetwork.
     """
@@ -40,3 +83,12 @@ class DummyRadio:
 
     def receive(self) -> bytes | None:
         return self.network.receive(self)
+
+    def wait_for_packet(self, timeout: float | None = None) -> bool:
+        return self.network.wait(self, timeout)
+
+    def wake(self) -> None:
+        self.network.wake(self)
+
+    def channel_busy(self) -> bool:
+        return self.network.channel_busy(self)
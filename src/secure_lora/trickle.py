@@ -0,0 +1,55 @@
+import random
+
+from .constants import TRICKLE_IMAX, TRICKLE_IMIN
+
+
+class TrickleTimer:
+    """
+    Trickle-style (RFC 6206) interval for discovery beacons.
+
+    Each interval of length I calls `fire()` once at a random point in
+    [I/2, I). The interval doubles up to `imax` while nothing changes and
+    drops back to `imin` on reset(), i.e. whenever the neighbourhood changes.
+    There is no suppression by neighbours' beacons (the RFC's k), since a
+    beacon announces its sender's own presence; `fire()` decides whether a
+    beacon is actually needed.
+
+    `schedule(delay, callback)` runs a callback later (the SecureLoRa I/O
+    thread, or a simulated clock in benchmarks).
+    """
+
+    def __init__(self, fire, schedule, imin: float = TRICKLE_IMIN, imax: float = TRICKLE_IMAX,
+                 rng=random):
+        self._fire = fire
+        self._schedule = schedule
+        self.imin = imin
+        self.imax = imax
+        self._rng = rng
+        self.interval = imin
+        self._epoch = 0  # invalidates timers from a previous interval
+
+    def start(self):
+        self._begin_interval()
+
+    def reset(self):
+        """Inconsistency (new, changed or lost neighbour): go back to the shortest interval."""
+        if self.interval > self.imin:
+            self.interval = self.imin
+            self._begin_interval()
+
+    def _begin_interval(self):
+        self._epoch += 1
+        epoch = self._epoch
+        t = self._rng.uniform(self.interval / 2, self.interval)
+        self._schedule(t, lambda: self._at_t(epoch))
+        self._schedule(self.interval, lambda: self._at_end(epoch))
+
+    def _at_t(self, epoch: int):
+        if epoch == self._epoch:
+            self._fire()
+
+    def _at_end(self, epoch: int):
+        if epoch != self._epoch:
+            return
+        self.interval = min(self.interval * 2, self.imax)
+        self._begin_interval()
@@ -5,14 +5,17 @@ from datetime import datetime
 from typing import List, Dict, Optional, Set
 from pathlib import Path
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, RedirectResponse
 from pydantic import BaseModel
 
 from secure_lora.secure_lora import SecureLoRa
-from secure_lora.constants import MsgType
+from secure_lora.constants import BROADCAST_ID, MsgType
+from secure_lora.peers import PEER_ADDED
+from secure_lora.aio import AsyncSecureLoRa
+from secure_lora.store_forward import STORE_SENT
 
 # =====================================================
 # App Factory
@@ -93,11 +96,26 @@ messages: List[Message] = []
 nodes: Dict[str, Node] = {}
 prev_nodes: Set[str] = set()
 active_connections: List[WebSocket] = []
+queued_messages: Dict[int, Message] = {}  # store entry ID -> message waiting for its recipient
+settled_entries: Dict[int, str] = {}  # store entry ID -> event seen before its message was queued
 
 # =====================================================
-# WebSocket Helper
+# Helpers
 # =====================================================
 
+def parse_node_id(node_id: str) -> int:
+    """
+    Node IDs reach the UI as decimal strings, and "broadcast" addresses every
+    node. Raises ValueError for anything else, so a typo is never broadcast.
+    """
+    if node_id.strip().lower() == "broadcast":
+        return BROADCAST_ID
+    value = int(node_id, 10)
+    if not 0 <= value < BROADCAST_ID:
+        raise ValueError(f"Node ID {node_id} out of range")
+    return value
+
+
 async def notify_websockets(msg: dict):
     for ws in active_connections.copy():
         try:
@@ -199,6 +217,11 @@ def register_routes(app: FastAPI):
     @app.post("/api/messages")
     async def send_message(message: MessageCreate, request: Request):
         secure_lora = request.app.state.secure_lora
+        lora_async = request.app.state.lora_async
+        try:
+            destination = parse_node_id(message.recipient)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid recipient {message.recipient!r}")
 
         new_message = Message(
             id=f"{app.state.current_node_id}_{len(messages)}_{datetime.now().isoformat()}",
@@ -212,7 +235,18 @@ def register_routes(app: FastAPI):
 
         try:
             content = message.sender_name + "|" + message.content if message.sender_name else message.content
-            secure_lora.send(MsgType.DATA, content.encode("utf-8"))
+            if secure_lora.store is not None and destination != BROADCAST_ID:
+                # Held on disk until the recipient ACKs it
+                entry_id = await lora_async.send_or_store(MsgType.DATA, content.encode("utf-8"), destination)
+                if entry_id is not None:
+                    event = settled_entries.pop(entry_id, None)
+                    if event is None:
+                        new_message.status = "queued"
+                        queued_messages[entry_id] = new_message
+                    else:
+                        new_message.status = "sent" if event == STORE_SENT else "failed"
+            else:
+                await lora_async.send(MsgType.DATA, content.encode("utf-8"), destination=destination)
             messages.append(new_message)
         except Exception as e:
             new_message.status = "failed"
@@ -268,70 +302,84 @@ def register_background_tasks(app: FastAPI):
 
     @app.on_event("startup")
     async def startup_event():
+        app.state.lora_async = AsyncSecureLoRa(app.state.secure_lora)
         asyncio.create_task(discover_nodes(app))
         asyncio.create_task(listen_for_lora_messages(app))
+        if app.state.secure_lora.store is not None:
+            asyncio.create_task(track_queued_messages(app))
 
 
 async def discover_nodes(app: FastAPI):
-    secure_lora = app.state.secure_lora
+    lora_async = app.state.lora_async
+
+    for peer_id in app.state.secure_lora.get_peers():
+        nodes[str(peer_id)] = Node(id=str(peer_id), name=str(peer_id), last_seen=datetime.now().isoformat())
+        prev_nodes.add(str(peer_id))
 
     while True:
+        event, peer = await lora_async.wait_peer_change()
+        peer_id = str(peer.sender_id)
         try:
-            peers = secure_lora.get_peers()
-            update = peers - prev_nodes
-
-            for peer_id in update:
-                nodes[str(peer_id)] = Node(
-                    id=str(peer_id),
-                    name=str(peer_id),
+            if event == PEER_ADDED:
+                nodes[peer_id] = Node(
+                    id=peer_id,
+                    name=peer_id,
                     last_seen=datetime.now().isoformat(),
                 )
-
-            if update:
-                prev_nodes.update(update)
-                print(f"Discovered new peers: {list(update)}, sending update to websockets.")
-                await notify_websockets({
-                    "type": "nodes_update",
-                    "data": [node.model_dump() for node in nodes.values()],
-                })
+                prev_nodes.add(peer_id)
+                print(f"Discovered new peer: {peer_id}, sending update to websockets.")
+            else:
+                nodes.pop(peer_id, None)
+                prev_nodes.discard(peer_id)
+                print(f"Lost peer: {peer_id}, sending update to websockets.")
+
+            await notify_websockets({
+                "type": "nodes_update",
+                "data": [node.model_dump() for node in nodes.values()],
+            })
         except Exception as e:
-            print(f"Error discovering nodes: {e}")
+            print(f"Error updating nodes: {e}")
 
-        await asyncio.sleep(0.5)
+async def track_queued_messages(app: FastAPI):
+    while True:
+        event, entry_id = await app.state.lora_async.wait_store_event()
+        message = queued_messages.pop(entry_id, None)
+        if message is None:
+            settled_entries[entry_id] = event
+            continue
+        message.status = "sent" if event == STORE_SENT else "failed"
+        await notify_websockets({
+            "type": "message_update",
+            "data": message.model_dump(),
+        })
 
 async def listen_for_lora_messages(app: FastAPI):
-    secure_lora = app.state.secure_lora
-
-    while True:
+    async for packet in app.state.lora_async.packets():
         try:
-            packet = secure_lora.receive()
-            if packet:
-                content_str = packet.get_payload_as_string()
-                sender_name = content_str.split("|")[0] if "|" in content_str else None
-                content = content_str.split("|", 1)[1] if "|" in content_str else content_str
-                sender = str(packet.sender_id)
-
-                if sender_name:
-                    nodes[sender].name = sender_name
-
-                incoming_msg = Message(
-                    id=f"{sender}_{len(messages)}_{datetime.now().isoformat()}",
-                    sender=sender,
-                    sender_name=sender_name,
-                    recipient=app.state.current_node_id,
-                    content=content,
-                    timestamp=datetime.now().isoformat(),
-                    status="received",
-                )
-
-                messages.append(incoming_msg)
-
-                await notify_websockets({
-                    "type": "new_message",
-                    "data": incoming_msg.dict(),
-                })
+            content_str = packet.get_payload_as_string()
+            sender_name = content_str.split("|")[0] if "|" in content_str else None
+            content = content_str.split("|", 1)[1] if "|" in content_str else content_str
+            sender = str(packet.sender_id)
+
+            if sender_name and sender in nodes:
+                nodes[sender].name = sender_name
+
+            incoming_msg = Message(
+                id=f"{sender}_{len(messages)}_{datetime.now().isoformat()}",
+                sender=sender,
+                sender_name=sender_name,
+                recipient=app.state.current_node_id,
+                content=content,
+                timestamp=datetime.now().isoformat(),
+                status="received",
+            )
+
+            messages.append(incoming_msg)
+
+            await notify_websockets({
+                "type": "new_message",
+                "data": incoming_msg.dict(),
+            })
 
         except Exception as e:
             print(f"Error receiving secure LoRa message: {e}")
-
-        await asyncio.sleep(1)
@@ -14,7 +14,9 @@ import uvicorn
 
 load_dotenv()
 
-keys = KeyStore()
+# Optional: pin the AES-GCM backend ("pycryptodome" or "cryptography"),
+# otherwise the fastest installed one is benchmarked at startup
+keys = KeyStore(os.environ.get("CRYPTO_BACKEND"))
 
 if "KEYS" not in os.environ or "SENDER_ID" not in os.environ:
     raise EnvironmentError("KEYS and SENDER_ID must be set in the environment variables or defined in .env file.")
@@ -23,6 +25,13 @@ for key in os.environ["KEYS"].split(","):
     node_id, key_hex = key.split(":")
     keys.add_key(int(node_id, 16), bytes.fromhex(key_hex))
 
+# Optional: preset compression dictionary shared by all nodes
+# (see benchmarks/compression.py for training one)
+compression_dict = None
+if "COMPRESSION_DICT" in os.environ:
+    with open(os.environ["COMPRESSION_DICT"], "rb") as f:
+        compression_dict = f.read()
+
 spi = busio.SPI(clock=board.SCK, MOSI=board.MOSI, MISO=board.MISO)
 radio = RFM95xRadio(spi, board.CE1, board.D25, freq_mhz=915.0, tx_power=5)
 
@@ -31,6 +40,12 @@ with SecureLoRa(
     int(os.environ["SENDER_ID"], 16),
     keys,
     debug=True,
+    counter_path=os.environ.get("COUNTER_FILE", "secure_lora_counter"),
+    store_path=os.environ.get("STORE_FILE", "secure_lora_store.db"),
+    # Compressed payloads need compact frames
+    compact=compression_dict is not None,
+    compression=compression_dict is not None,
+    compression_dict=compression_dict,
 ) as secure_lora:
     app = create_app(secure_lora)
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,13 @@
+import pytest
+
+class FakeClock:
+    """Stands in for time.monotonic / time.time; tests move `now` by hand."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -11,7 +11,7 @@ class NetworkManager(BaseManager):
 # Register the name so the manager knows what to look for
 NetworkManager.register('get_network')
 
-class DummyRadio:
+class DummyRadio(RadioInterface):
     def __init__(self, node_id):
         self.node_id = node_id
         self.manager = NetworkManager(address=('127.0.0.1', 5000), authkey=b'radio_secret')
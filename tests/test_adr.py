@@ -0,0 +1,46 @@
+import pytest
+from secure_lora.adr import AdrController, LinkEstimate
+
+NEIGHBOUR = 0xB4E82D53
+
+@pytest.fixture
+def adr():
+    return AdrController(margin=5.0, alpha=0.5, min_samples=2)
+
+def observe(adr, snr, times=2, bandwidth=125000):
+    for _ in range(times):
+        adr.observe(NEIGHBOUR, -80.0, snr, bandwidth)
+
+def test_no_settings_until_enough_samples(adr):
+    assert adr.select(NEIGHBOUR) is None
+    observe(adr, 10.0, times=1)
+    assert adr.select(NEIGHBOUR) is None
+
+def test_strong_link_gets_fastest_sf(adr):
+    observe(adr, 8.0)
+    assert adr.select(NEIGHBOUR) == {"spreading_factor": 7, "signal_bandwidth": 125000}
+
+def test_weak_link_gets_slower_sf(adr):
+    # Needs -10 dB + 5 dB margin <= -6 dB -> SF9 (-12.5 + 5 = -7.5)
+    observe(adr, -6.0)
+    assert adr.select(NEIGHBOUR)["spreading_factor"] == 9
+
+def test_marginal_link_falls_back_to_most_robust(adr):
+    observe(adr, -25.0)
+    assert adr.select(NEIGHBOUR)["spreading_factor"] == 12
+
+def test_wider_bandwidth_chosen_when_margin_allows():
+    adr = AdrController(bandwidths=(125000, 250000), margin=5.0, min_samples=1)
+    # At 250 kHz the SNR is 3 dB worse: 0 dB, still above SF7's -2.5 dB
+    adr.observe(NEIGHBOUR, -80.0, 3.0, 125000)
+    assert adr.select(NEIGHBOUR) == {"spreading_factor": 7, "signal_bandwidth": 250000}
+
+def test_estimate_smooths_and_rereferences_bandwidth():
+    link = LinkEstimate()
+    link.update(-80.0, 0.0, 125000, 0.5)
+    link.update(-90.0, 0.0, 250000, 0.5)
+
+    assert link.rssi == pytest.approx(-85.0)
+    # 0 dB at 125 kHz is about -3 dB at 250 kHz, averaged with the new 0 dB
+    assert link.snr == pytest.approx(-1.505, abs=0.01)
+    assert link.bandwidth == 250000
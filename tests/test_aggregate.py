@@ -0,0 +1,122 @@
+import pytest
+from secure_lora.constants import MsgType, BROADCAST_ID
+from secure_lora.aggregate import Aggregator, split_aggregate
+
+DEST = 0xB4E82D53
+
+@pytest.fixture
+def sent():
+    return []
+
+@pytest.fixture
+def timers():
+    return []  # (delay, callback) handed to schedule()
+
+@pytest.fixture
+def aggregator(sent, timers):
+    return Aggregator(lambda *frame: sent.append(frame), lambda *timer: timers.append(timer),
+                      max_delay=10.0, max_bytes=20)
+
+def test_batch_flushed_as_one_frame(aggregator, sent):
+    aggregator.add(MsgType.DATA, b"abc", DEST)
+    aggregator.add(MsgType.DATA, b"defg", DEST)
+    aggregator.flush()
+
+    assert len(sent) == 1
+    msg_type, payload, destination = sent[0]
+    assert (msg_type, destination) == (MsgType.AGGREGATE, DEST)
+    assert list(split_aggregate(payload)) == [(MsgType.DATA, b"abc"), (MsgType.DATA, b"defg")]
+    assert aggregator.frames_saved == 1
+
+def test_single_message_sent_plain(aggregator, sent):
+    aggregator.add(MsgType.DATA, b"solo", DEST)
+    aggregator.flush(DEST)
+
+    assert sent == [(MsgType.DATA, b"solo", DEST)]
+
+def test_full_batch_sent_before_adding(aggregator, sent):
+    aggregator.add(MsgType.DATA, b"x" * 10, DEST)
+    aggregator.add(MsgType.DATA, b"y" * 10, DEST)
+
+    assert sent == [(MsgType.DATA, b"x" * 10, DEST)]
+
+def test_destinations_batched_separately(aggregator, sent):
+    aggregator.add(MsgType.DATA, b"a", DEST)
+    aggregator.add(MsgType.DATA, b"b", BROADCAST_ID)
+    aggregator.flush()
+
+    assert sorted(sent) == sorted([(MsgType.DATA, b"a", DEST), (MsgType.DATA, b"b", BROADCAST_ID)])
+
+def test_delay_flushes_batch(aggregator, sent, timers):
+    aggregator.add(MsgType.DATA, b"late", DEST)
+    assert sent == []
+
+    (delay, callback), = timers
+    assert delay == 10.0
+    callback()
+    assert sent == [(MsgType.DATA, b"late", DEST)]
+
+def test_stale_timer_ignored(aggregator, sent, timers):
+    aggregator.add(MsgType.DATA, b"early", DEST)
+    aggregator.flush()
+    aggregator.add(MsgType.DATA, b"next", DEST)
+
+    timers[0][1]()  # belongs to the batch already flushed
+    assert sent == [(MsgType.DATA, b"early", DEST)]
+
+def test_timed_flush_retried_when_queue_full(sent, timers):
+    full = [True]
+    def send_frame(*frame):
+        if full[0]:
+            raise RuntimeError("TX queue full")
+        sent.append(frame)
+    aggregator = Aggregator(send_frame, lambda *timer: timers.append(timer), max_delay=10.0)
+
+    aggregator.add(MsgType.DATA, b"a", DEST)
+    aggregator.add(MsgType.DATA, b"b", DEST)
+    timers.pop(0)[1]()
+    assert sent == [] and len(timers) == 1
+
+    full[0] = False
+    timers.pop(0)[1]()
+    assert [frame[0] for frame in sent] == [MsgType.AGGREGATE]
+    assert aggregator.frames_saved == 1
+
+def test_full_batch_kept_when_queue_full(sent, timers):
+    full = [True]
+    def send_frame(*frame):
+        if full[0]:
+            raise RuntimeError("TX queue full")
+        sent.append(frame)
+    aggregator = Aggregator(send_frame, lambda *timer: timers.append(timer), max_delay=10.0, max_bytes=20)
+
+    aggregator.add(MsgType.DATA, b"x" * 10, DEST)
+    aggregator.add(MsgType.DATA, b"y" * 10, DEST)  # closes the first batch, doesn't raise
+    aggregator.flush()
+
+    full[0] = False
+    retries = [callback for delay, callback in timers]
+    for callback in retries:
+        callback()
+    # Still in order
+    assert sent == [(MsgType.DATA, b"x" * 10, DEST), (MsgType.DATA, b"y" * 10, DEST)]
+
+def test_waiting_batches_bounded(timers):
+    dropped = []
+    def send_frame(*frame):
+        raise RuntimeError("TX queue full")
+    aggregator = Aggregator(send_frame, lambda *timer: timers.append(timer), max_delay=10.0, max_bytes=20,
+                            max_ready=2, on_drop=lambda *drop: dropped.append(drop))
+
+    for _ in range(4):
+        aggregator.add(MsgType.DATA, b"z" * 10, DEST)
+    assert dropped == [(DEST, 1)]
+
+    aggregator.discard()
+    assert dropped == [(DEST, 1)] * 4
+
+def test_malformed_aggregate_rejected():
+    with pytest.raises(ValueError):
+        list(split_aggregate(b"\x01\x05abc"))
+    with pytest.raises(ValueError):
+        list(split_aggregate(bytes([MsgType.AGGREGATE, 0])))
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import pytest
+from dummy_network import DummyRadio, LoopbackNetwork
+from secure_lora.aio import AsyncSecureLoRa
+from secure_lora.constants import MsgType
+from secure_lora.keystore import KeyStore
+from secure_lora.peers import PEER_ADDED
+from secure_lora.rx_queue import BLOCK
+from secure_lora.secure_lora import SecureLoRa
+from secure_lora.store_forward import STORE_SENT
+
+NODE_A = 0xA3F91C42
+NODE_B = 0xB4E82D53
+
+@pytest.fixture
+def keys():
+    keys = KeyStore()
+    keys.add_key(NODE_A, b"A" * 16)
+    keys.add_key(NODE_B, b"B" * 16)
+    return keys
+
+@pytest.fixture
+def network():
+    return LoopbackNetwork()
+
+@pytest.fixture
+def lora_a(network, keys):
+    with SecureLoRa(DummyRadio(network), NODE_A, keys) as lora:
+        yield lora
+
+@pytest.fixture
+def lora_b(network, keys):
+    with SecureLoRa(DummyRadio(network), NODE_B, keys) as lora:
+        yield lora
+
+def test_packets_and_peer_change(lora_a, lora_b):
+    async def scenario():
+        lora = AsyncSecureLoRa(lora_b)
+        await AsyncSecureLoRa(lora_a).send(MsgType.DATA, b"async hello")
+
+        packet = await asyncio.wait_for(anext(lora.packets()), 1.0)
+        event, peer = await asyncio.wait_for(lora.wait_peer_change(), 1.0)
+        lora.close()
+        return packet, event, peer
+
+    packet, event, peer = asyncio.run(scenario())
+
+    assert packet.payload == b"async hello"
+    assert (event, peer.sender_id) == (PEER_ADDED, NODE_A)
+    # Closed facades no longer divert packets from receive()
+    assert lora_b.receive() is None
+
+def test_send_reliable_awaits_ack(lora_a, lora_b):
+    async def scenario():
+        lora = AsyncSecureLoRa(lora_a)
+        return await asyncio.wait_for(lora.send_reliable(MsgType.DATA, b"ack me", NODE_B), 2.0)
+
+    assert asyncio.run(scenario()) is True
+    assert lora_b.receive(timeout=1.0).payload == b"ack me"
+
+def test_send_or_store_runs_off_the_loop(network, keys, lora_b, tmp_path):
+    async def scenario():
+        loop_thread = threading.get_ident()
+        with SecureLoRa(DummyRadio(network), NODE_A, keys, store_path=str(tmp_path / "store.db")) as lora_a:
+            threads = []
+            put = lora_a.store.put
+            lora_a.store.put = lambda *args: threads.append(threading.get_ident()) or put(*args)
+            lora_a.peers.observe(NODE_B)
+            lora = AsyncSecureLoRa(lora_a)
+            entry_id = await lora.send_or_store(MsgType.DATA, b"stored", NODE_B)
+            event = await asyncio.wait_for(lora.wait_store_event(), 2.0)
+            lora.close()
+        return loop_thread, threads, entry_id, event
+
+    loop_thread, threads, entry_id, event = asyncio.run(scenario())
+
+    assert threads and loop_thread not in threads
+    assert event == (STORE_SENT, entry_id)
+
+def test_receive_timeout(lora_a):
+    async def scenario():
+        return await AsyncSecureLoRa(lora_a).receive(timeout=0.05)
+
+    assert asyncio.run(scenario()) is None
+
+def test_full_queue_drops_oldest(lora_a, lora_b):
+    async def scenario():
+        lora = AsyncSecureLoRa(lora_b, queue_size=2)
+        for i in range(3):
+            lora_a.send(MsgType.DATA, b"msg %d" % i)
+
+        async def overflowed():
+            while not lora.overflows["packets"]:
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(overflowed(), 2.0)
+        packets = [await lora.receive(timeout=1.0) for _ in range(2)]
+        lora.close()
+        return lora, packets
+
+    lora, packets = asyncio.run(scenario())
+
+    assert [p.payload for p in packets] == [b"msg 1", b"msg 2"]
+    assert lora.overflows["packets"] == 1
+
+def test_block_policy_rejected(lora_a):
+    async def scenario():
+        AsyncSecureLoRa(lora_a, overflow=BLOCK)
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
@@ -0,0 +1,39 @@
+import pytest
+from secure_lora.airtime import DutyCycleExceeded, DutyCycleLimiter, time_on_air
+
+@pytest.fixture
+def limiter(clock):
+    # 1% of 100 s = 1 s of airtime
+    return DutyCycleLimiter(0.01, window=100.0, clock=clock)
+
+@pytest.mark.parametrize("length, sf, expected_ms", [
+    (23, 7, 61.7),
+    (23, 12, 1482.8),  # low data rate optimisation kicks in
+    (51, 10, 616.4),
+])
+def test_time_on_air_matches_semtech_formula(length, sf, expected_ms):
+    assert time_on_air(length, spreading_factor=sf) * 1000 == pytest.approx(expected_ms, abs=0.1)
+
+def test_longer_frames_take_longer():
+    assert time_on_air(100) > time_on_air(10)
+    assert time_on_air(10, bandwidth=250000) < time_on_air(10)
+
+def test_budget_spent_then_delayed(limiter, clock):
+    assert limiter.reserve(0.6) == 0
+    clock.now = 10.0
+    assert limiter.reserve(0.3) == 0
+    assert limiter.remaining() == pytest.approx(0.1)
+
+    # Needs the first entry to age out at t=100
+    assert limiter.reserve(0.2) == pytest.approx(90.0)
+
+def test_budget_recovers_after_window(limiter, clock):
+    limiter.reserve(1.0)
+    clock.now = 100.0
+
+    assert limiter.remaining() == pytest.approx(1.0)
+    assert limiter.reserve(0.5) == 0
+
+def test_frame_larger_than_budget_rejected(limiter):
+    with pytest.raises(DutyCycleExceeded):
+        limiter.reserve(2.0)
@@ -0,0 +1,40 @@
+import os
+import pytest
+from secure_lora.compression import Compressor, dictionary_id, train_dictionary
+
+SAMPLES = [f"field-station-{i}|temp={20 + i % 7}.5C batt=3.9V all clear".encode() for i in range(50)]
+
+@pytest.fixture
+def zdict():
+    return train_dictionary(SAMPLES)
+
+def test_dictionary_beats_plain_deflate(zdict):
+    message = b"field-station-9|temp=22.5C batt=3.9V all clear"
+
+    with_dict = Compressor(zdict).compress(message)
+
+    assert Compressor().compress(message) is None  # too short to shrink on its own
+    assert len(with_dict) < len(message) / 2
+    assert Compressor(zdict).decompress(with_dict, 128) == message
+
+def test_incompressible_payload_left_raw(zdict):
+    assert Compressor(zdict).compress(os.urandom(64)) is None
+
+def test_corrupt_or_oversized_payload_rejected(zdict):
+    compressor = Compressor(zdict)
+    bomb = Compressor().compress(bytes(1000))
+
+    with pytest.raises(ValueError):
+        compressor.decompress(b"\xff\xff\xff", 128)
+    with pytest.raises(ValueError):
+        compressor.decompress(bomb, 128)
+
+def test_dictionary_size_and_content(zdict):
+    assert 0 < len(zdict) <= 2048
+    assert b"batt=3.9V all clear" in zdict
+    assert len(train_dictionary(SAMPLES, size=16)) == 16
+
+def test_dictionary_id(zdict):
+    assert dictionary_id(None) == Compressor().dictionary_id == 0
+    assert 1 <= dictionary_id(zdict) <= 255
+    assert dictionary_id(zdict) != dictionary_id(zdict + b"!")
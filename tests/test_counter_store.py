@@ -0,0 +1,47 @@
+import os
+import pytest
+from secure_lora.counter_store import CounterStore
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "counter")
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    calls = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (calls.append(fd), real_fsync(fd)))
+    return calls
+
+def test_fresh_store_starts_at_zero(path):
+    assert CounterStore(path).load() == 0
+
+def test_writes_once_per_block(path, fsyncs):
+    store = CounterStore(path, block_size=10)
+    store.load()
+
+    for counter in range(1, 10):
+        store.ensure_reserved(counter)
+    writes_for_first_block = len(fsyncs)
+    store.ensure_reserved(11)
+
+    assert writes_for_first_block > 0
+    assert len(fsyncs) == 2 * writes_for_first_block
+
+def test_resume_skips_past_every_used_counter(path):
+    store = CounterStore(path, block_size=10)
+    store.load()
+    for counter in range(1, 26):
+        store.ensure_reserved(counter)
+
+    # "Crash" and restart
+    resumed = CounterStore(path, block_size=10).load()
+
+    assert resumed >= 25
+
+def test_corrupt_file_refuses_to_start(path):
+    with open(path, "w") as f:
+        f.write("garbage")
+
+    with pytest.raises(ValueError):
+        CounterStore(path).load()
@@ -1,3 +1,5 @@
+import threading
+import time
 import pytest
 from dummy_network import DummyRadio, LoopbackNetwork
 
@@ -37,3 +39,41 @@ def test_bidirectional(radio1, radio2):
     # Each radio receives the other's message
     assert radio2.receive() == msg1
     assert radio1.receive() == msg2
+
+def test_wait_for_packet_wakes_on_send(radio1, radio2):
+    threading.Timer(0.05, radio1.send, args=(b"late",)).start()
+
+    assert radio2.wait_for_packet(timeout=2.0)
+    assert radio2.receive() == b"late"
+
+def test_wait_for_packet_times_out(radio1):
+    start = time.monotonic()
+    assert radio1.wait_for_packet(timeout=0.05) is False
+    assert time.monotonic() - start >= 0.05
+
+def test_wake_interrupts_wait(radio1):
+    threading.Timer(0.05, radio1.wake).start()
+
+    start = time.monotonic()
+    assert radio1.wait_for_packet(timeout=5.0) is False
+    assert time.monotonic() - start < 1.0
+
+def test_channel_busy_after_other_radio_sends():
+    network = LoopbackNetwork(busy_time=0.05)
+    radio1, radio2 = DummyRadio(network), DummyRadio(network)
+
+    radio1.send(b"on air")
+
+    assert radio2.channel_busy()
+    assert not radio1.channel_busy()
+    time.sleep(0.06)
+    assert not radio2.channel_busy()
+
+def test_disconnected_radios_dont_hear_each_other(loopback_network, radio1, radio2):
+    radio3 = DummyRadio(loopback_network)
+    loopback_network.disconnect(radio1, radio3)
+
+    radio1.send(b"near")
+
+    assert radio2.receive() == b"near"
+    assert radio3.receive() is None
@@ -0,0 +1,52 @@
+import pytest
+from secure_lora.constants import MsgType, MAX_FRAGMENTS
+from secure_lora.fragment import Reassembler, fragment_payload, FRAGMENT_CHUNK_SIZE, MAX_MESSAGE_SIZE
+
+SENDER = 0xA3F91C42
+
+@pytest.fixture
+def reassembler(clock):
+    return Reassembler(max_messages=2, timeout=10.0, clock=clock)
+
+def test_roundtrip_out_of_order(reassembler):
+    message = bytes(range(256)) * 2
+    fragments = list(fragment_payload(MsgType.DATA, 7, message))
+    assert len(fragments) == -(-len(message) // FRAGMENT_CHUNK_SIZE)
+
+    results = [reassembler.add(SENDER, f) for f in reversed(fragments)]
+
+    assert results[:-1] == [None] * (len(fragments) - 1)
+    assert results[-1] == (MsgType.DATA, message)
+    assert len(reassembler) == 0
+
+def test_too_large_payload_rejected():
+    with pytest.raises(ValueError):
+        list(fragment_payload(MsgType.DATA, 1, bytes(MAX_MESSAGE_SIZE + 1)))
+
+def test_malformed_fragments_rejected(reassembler):
+    first = next(fragment_payload(MsgType.DATA, 1, bytes(FRAGMENT_CHUNK_SIZE * 2)))
+
+    with pytest.raises(ValueError):
+        reassembler.add(SENDER, first[:3])
+    with pytest.raises(ValueError):
+        reassembler.add(SENDER, first[:-1])  # short non-final fragment
+    bad_count = bytearray(first)
+    bad_count[4] = MAX_FRAGMENTS + 1
+    with pytest.raises(ValueError):
+        reassembler.add(SENDER, bytes(bad_count))
+
+def test_incomplete_message_times_out(reassembler, clock):
+    first, second = fragment_payload(MsgType.DATA, 1, bytes(FRAGMENT_CHUNK_SIZE + 1))
+    reassembler.add(SENDER, first)
+
+    clock.now += 11.0
+
+    assert reassembler.add(SENDER, second) is None
+    assert reassembler.timeouts == 1
+
+def test_oldest_message_evicted_when_full(reassembler):
+    for message_id in (1, 2, 3):
+        reassembler.add(SENDER, next(fragment_payload(MsgType.DATA, message_id, bytes(FRAGMENT_CHUNK_SIZE * 2))))
+
+    assert len(reassembler) == 2
+    assert reassembler.evictions == 1
@@ -0,0 +1,71 @@
+import pytest
+from secure_lora.keystore import KeyStore
+from secure_lora.crypto import BACKENDS, benchmark_backend
+
+SENDER = 0xA3F91C42
+NONCE = bytes(12)
+
+@pytest.fixture
+def keys():
+    keys = KeyStore()
+    keys.add_key(SENDER, b"K" * 16)
+    return keys
+
+def test_cipher_context_is_cached(keys):
+    assert keys.get_cipher(SENDER) is keys.get_cipher(SENDER)
+
+def test_unknown_sender_has_no_cipher(keys):
+    assert keys.get_cipher(0xDEADBEEF) is None
+
+def test_add_key_invalidates_cached_context(keys):
+    old = keys.get_cipher(SENDER)
+    ciphertext, tag = old.encrypt(NONCE, b"payload")
+
+    keys.add_key(SENDER, b"N" * 16)
+    new = keys.get_cipher(SENDER)
+
+    assert new is not old
+    with pytest.raises(ValueError):
+        new.decrypt(NONCE, ciphertext, tag)
+
+def test_invalid_key_length_rejected():
+    keys = KeyStore()
+    keys.add_key(SENDER, b"supersecretkey123")
+
+    with pytest.raises(ValueError):
+        keys.get_cipher(SENDER)
+
+@pytest.mark.parametrize("name", sorted(BACKENDS))
+def test_explicit_backend_selection(name):
+    assert KeyStore(backend=name).backend is BACKENDS[name]
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        KeyStore(backend="rot13")
+
+@pytest.mark.skipif(len(BACKENDS) < 2, reason="needs both crypto backends installed")
+def test_backends_are_byte_identical():
+    key = b"K" * 16
+    pycryptodome = BACKENDS["pycryptodome"](key)
+    cryptography = BACKENDS["cryptography"](key)
+
+    sealed = pycryptodome.encrypt(NONCE, b"payload", b"header")
+
+    assert cryptography.encrypt(NONCE, b"payload", b"header") == sealed
+    assert cryptography.decrypt(NONCE, *sealed, b"header") == b"payload"
+    with pytest.raises(ValueError):
+        cryptography.decrypt(NONCE, *sealed, b"tampered")
+
+@pytest.mark.parametrize("name", sorted(BACKENDS))
+def test_truncated_tag_roundtrip(name):
+    context = BACKENDS[name](b"K" * 16)
+    ciphertext, tag = context.encrypt(NONCE, b"payload", b"header")
+
+    for _ in range(2):  # the second decrypt reuses whatever the backend cached
+        assert context.decrypt(NONCE, ciphertext, tag[:8], b"header") == b"payload"
+    with pytest.raises(ValueError):
+        context.decrypt(NONCE, ciphertext, bytes(8), b"header")
+
+@pytest.mark.parametrize("name", sorted(BACKENDS))
+def test_benchmark_covers_truncated_tags(name):
+    assert benchmark_backend(BACKENDS[name], rounds=2) > 0
@@ -0,0 +1,116 @@
+import pytest
+from secure_lora.packet import (
+    Packet, PACKET_HEADER, decode_varint, encode_varint, make_nonce, set_hops, varint_size
+)
+from secure_lora.constants import (
+    BROADCAST_ID, COMPACT_PROTOCOL_VERSION, COMPACT_TAG_SIZES, MsgType, PROTOCOL_VERSION
+)
+
+@pytest.fixture
+def packet():
+    return Packet(
+        version=PROTOCOL_VERSION,
+        sender_id=0xA3F91C42,
+        msg_type=MsgType.DATA,
+        payload=b"ciphertext",
+        auth_tag=b"T" * 16,
+        nonce=b"N" * 12,
+    )
+
+def test_serialize_parse_roundtrip(packet):
+    parsed = Packet.parse(packet.serialize())
+
+    assert (parsed.version, parsed.sender_id, parsed.msg_type, parsed.nonce) == \
+        (packet.version, packet.sender_id, packet.msg_type, packet.nonce)
+    assert bytes(parsed.payload) == packet.payload
+    assert bytes(parsed.auth_tag) == packet.auth_tag
+
+def test_parse_does_not_copy_payload(packet):
+    frame = packet.serialize()
+    parsed = Packet.parse(frame)
+
+    frame[PACKET_HEADER.size] = ord("X")
+
+    assert bytes(parsed.payload).startswith(b"X")
+
+def test_serialize_into_offset(packet):
+    buffer = bytearray(4 + packet.serialized_size())
+
+    end = packet.serialize_into(buffer, 4)
+
+    assert end == len(buffer)
+    assert buffer[4:] == packet.serialize()
+
+def test_parse_rejects_short_frame():
+    with pytest.raises(ValueError):
+        Packet.parse(b"\x01" * 20)
+
+def test_packet_has_no_instance_dict(packet):
+    with pytest.raises(AttributeError):
+        packet.extra = 1
+
+@pytest.mark.parametrize("destination", [0xB4E82D53, BROADCAST_ID])
+@pytest.mark.parametrize("tag_size", COMPACT_TAG_SIZES)
+def test_compact_roundtrip(destination, tag_size):
+    packet = Packet(
+        version=COMPACT_PROTOCOL_VERSION,
+        sender_id=0xA3F91C42,
+        msg_type=MsgType.DATA,
+        payload=b"ciphertext",
+        auth_tag=b"T" * 16,
+        nonce=make_nonce(300, 0xA3F91C42),
+        destination=destination,
+        tag_size=tag_size,
+    )
+
+    frame = packet.serialize()
+    parsed = Packet.parse(frame)
+
+    assert len(frame) == packet.serialized_size()
+    assert (parsed.version, parsed.sender_id, parsed.msg_type, parsed.destination) == \
+        (COMPACT_PROTOCOL_VERSION, 0xA3F91C42, MsgType.DATA, destination)
+    assert parsed.nonce == packet.nonce
+    assert bytes(parsed.payload) == b"ciphertext"
+    assert bytes(parsed.auth_tag) == b"T" * tag_size
+    assert parsed.header() == packet.header()
+
+def test_compact_frame_is_smaller(packet):
+    compact = Packet(COMPACT_PROTOCOL_VERSION, packet.sender_id, packet.msg_type, packet.payload,
+                     packet.auth_tag, make_nonce(1, packet.sender_id), tag_size=8)
+
+    assert len(compact.serialize()) < len(packet.serialize()) - 20
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 2**32, 2**64 - 1])
+def test_varint_roundtrip(value):
+    buffer = bytearray(10)
+    end = encode_varint(value, buffer, 0)
+
+    assert end == varint_size(value)
+    assert decode_varint(buffer, 0) == (value, end)
+
+@pytest.mark.parametrize("version", [PROTOCOL_VERSION, COMPACT_PROTOCOL_VERSION])
+def test_hop_field_is_not_associated_data(packet, version):
+    packet.version = version
+    packet.tag_size = 8 if version == COMPACT_PROTOCOL_VERSION else 16
+    packet.hop_limit = 3
+    frame = packet.serialize()
+
+    set_hops(frame, 2)
+    relayed = Packet.parse(frame)
+
+    assert (relayed.msg_type, relayed.hop_limit, relayed.relayed) == (MsgType.DATA, 2, True)
+    assert relayed.header() == packet.header()
+
+def test_hop_limit_out_of_range(packet):
+    packet.hop_limit = 8
+
+    with pytest.raises(ValueError):
+        packet.serialize()
+
+def test_compressed_flag_only_in_compact_frames(packet):
+    packet.compressed = True
+    with pytest.raises(ValueError):
+        packet.serialize()
+
+    packet.version, packet.tag_size = COMPACT_PROTOCOL_VERSION, 8
+    assert Packet.parse(packet.serialize()).compressed
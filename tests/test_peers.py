@@ -0,0 +1,73 @@
+import pytest
+from secure_lora.peers import PEER_ADDED, PEER_LOST, PeerTable
+
+PEER = 0xB4E82D53
+OTHER = 0xA3F91C42
+
+@pytest.fixture
+def events():
+    return []
+
+@pytest.fixture
+def table(clock, events):
+    table = PeerTable(timeout=10.0, alpha=0.5, clock=clock)
+    table.subscribe(lambda event, peer: events.append((event, peer.sender_id)))
+    return table
+
+def test_observe_tracks_link_stats(table):
+    table.observe(PEER, rssi=-80.0, snr=5.0)
+    peer = table.observe(PEER, rssi=-90.0, snr=3.0)
+
+    assert peer.packets == 2
+    assert peer.rssi == pytest.approx(-85.0)
+    assert peer.snr == pytest.approx(4.0)
+
+def test_delivery_ratio_from_beacon_gaps(table):
+    peer = table.observe(PEER)
+    table.beacon(PEER, 1)
+    table.beacon(PEER, 1)  # copy, ignored
+    assert peer.delivery_ratio == pytest.approx(1.0)
+
+    table.beacon(PEER, 3)  # missed 2: halved, then halfway back up for 3
+    assert peer.delivery_ratio == pytest.approx(0.75)
+
+    for seq in range(4, 12):
+        table.beacon(PEER, seq)
+    assert peer.delivery_ratio > 0.99  # recent beacons outweigh old losses
+
+    table.beacon(PEER, 1)  # restarted, not 65000 losses
+    assert peer.delivery_ratio > 0.99
+
+def test_added_event_only_once(table, events):
+    table.observe(PEER)
+    table.observe(PEER)
+
+    assert events == [(PEER_ADDED, PEER)]
+
+def test_expiry_after_timeout(table, clock, events):
+    table.observe(PEER)
+    clock.now = 5.0
+    table.observe(OTHER)
+
+    clock.now = 12.0
+    assert [p.sender_id for p in table.expire()] == [PEER]
+    assert PEER not in table and OTHER in table
+    assert events[-1] == (PEER_LOST, PEER)
+
+def test_refreshed_peer_not_expired(table, clock):
+    table.observe(PEER)
+    clock.now = 8.0
+    table.observe(PEER)
+
+    clock.now = 12.0
+    assert table.expire() == []
+
+    clock.now = 18.0
+    assert [p.sender_id for p in table.expire()] == [PEER]
+
+def test_unsubscribe(table, events):
+    table.subscribe(events.append)
+    table.unsubscribe(events.append)
+    table.observe(PEER)
+
+    assert events == [(PEER_ADDED, PEER)]
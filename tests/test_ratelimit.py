@@ -0,0 +1,26 @@
+import pytest
+from secure_lora.ratelimit import TokenBucketLimiter
+
+SENDER = 0xA3F91C42
+
+@pytest.fixture
+def limiter(clock):
+    return TokenBucketLimiter(rate=2.0, burst=3, clock=clock)
+
+def test_burst_then_reject(limiter):
+    assert [limiter.allow(SENDER) for _ in range(4)] == [True, True, True, False]
+
+def test_tokens_refill_over_time(limiter, clock):
+    for _ in range(3):
+        limiter.allow(SENDER)
+
+    clock.now += 0.5
+
+    assert limiter.allow(SENDER)
+    assert not limiter.allow(SENDER)
+
+def test_senders_have_separate_buckets(limiter):
+    for _ in range(3):
+        limiter.allow(SENDER)
+
+    assert limiter.allow(0xB4E82D53)
@@ -0,0 +1,127 @@
+import random
+import pytest
+from secure_lora.constants import MsgType, RELIABLE_MIN_RTO
+from secure_lora.reliable import (
+    ACK_PAYLOAD, RELIABLE_HEADER, DuplicateFilter, ReliableSender, RttEstimator
+)
+
+DEST = 0xB4E82D53
+
+class Harness:
+    """Captures transmitted frames and scheduled timers."""
+    def __init__(self, clock):
+        self.clock = clock
+        self.sent = []
+        self.timers = []
+        self.sender = ReliableSender(
+            lambda *frame: self.sent.append(frame),
+            lambda delay, callback: self.timers.append((delay, callback)),
+            max_pending=2, max_retries=2, clock=self.clock,
+        )
+
+    def send(self, payload):
+        future = self.sender.send(MsgType.DATA, payload, DEST)
+        # The first attempt is scheduled right away on the I/O thread
+        delay, callback = self.timers.pop()
+        assert delay == 0.0
+        callback()
+        return future
+
+    def fire_timers(self):
+        timers, self.timers = self.timers, []
+        for _, callback in timers:
+            callback()
+
+    def ack(self, sequence, sender_id=DEST):
+        return self.sender.on_ack(sender_id, ACK_PAYLOAD.pack(sequence))
+
+@pytest.fixture
+def harness(clock):
+    return Harness(clock)
+
+def sequence_of(frame):
+    return RELIABLE_HEADER.unpack_from(frame[1])[1]
+
+def test_ack_completes_future(harness):
+    future = harness.send(b"hi")
+
+    msg_type, payload, destination = harness.sent[0]
+    assert (msg_type, destination) == (MsgType.RELIABLE, DEST)
+    assert payload[RELIABLE_HEADER.size:] == b"hi"
+
+    harness.clock.now = 0.5
+    assert harness.ack(sequence_of(harness.sent[0]))
+    assert future.result(timeout=0) is True
+
+def test_retransmits_then_gives_up(harness):
+    future = harness.send(b"lost")
+    first_timeout = harness.timers[0][0]
+
+    harness.fire_timers()
+    assert len(harness.sent) == 2
+    assert harness.timers[0][0] == pytest.approx(2 * first_timeout)  # backoff
+
+    harness.fire_timers()
+    harness.fire_timers()
+
+    assert len(harness.sent) == 3
+    assert harness.sender.retransmissions == 2
+    with pytest.raises(TimeoutError):
+        future.result(timeout=0)
+
+def test_stale_timer_after_ack_ignored(harness):
+    harness.send(b"hi")
+    harness.ack(sequence_of(harness.sent[0]))
+
+    harness.fire_timers()
+
+    assert len(harness.sent) == 1
+
+def test_ack_from_wrong_sender_ignored(harness):
+    future = harness.send(b"hi")
+
+    assert not harness.ack(sequence_of(harness.sent[0]), sender_id=0x12345678)
+    assert not future.done()
+
+def test_rtt_sample_shortens_rto(harness):
+    harness.send(b"hi")
+    harness.clock.now = 0.3
+    harness.ack(sequence_of(harness.sent[0]))
+
+    # SRTT 0.3, RTTVAR 0.15 -> 0.9
+    assert harness.sender.rto(DEST, 10) == pytest.approx(0.9)
+
+def test_buffer_bounded(harness):
+    harness.send(b"one")
+    harness.send(b"two")
+
+    with pytest.raises(RuntimeError):
+        harness.send(b"three")
+
+def test_rtt_estimator_smooths():
+    estimator = RttEstimator()
+    estimator.sample(1.0)
+    estimator.sample(2.0)
+
+    assert estimator.srtt == pytest.approx(1.125)
+    assert estimator.rto() > RELIABLE_MIN_RTO
+
+def test_restarted_sender_not_deduplicated(clock, monkeypatch):
+    starts = iter([0, 0x8000])
+    monkeypatch.setattr(random, "getrandbits", lambda bits: next(starts))
+    dedup = DuplicateFilter()
+    for _ in range(2):  # the same node before and after a restart
+        harness = Harness(clock)
+        for _ in range(4):
+            harness.send(b"hi")
+            harness.ack(sequence_of(harness.sent[-1]))
+        assert all(dedup.first_time(DEST, sequence_of(frame)) for frame in harness.sent)
+
+def test_duplicate_filter_bounded():
+    duplicates = DuplicateFilter(history=2)
+
+    assert duplicates.first_time(DEST, 1)
+    assert not duplicates.first_time(DEST, 1)
+    duplicates.first_time(DEST, 2)
+    duplicates.first_time(DEST, 3)
+    assert duplicates.first_time(DEST, 1)  # forgotten
@@ -0,0 +1,40 @@
+import pytest
+from secure_lora.replay import ReplayProtection
+
+SENDER = 0xA3F91C42
+
+@pytest.fixture
+def replay():
+    return ReplayProtection(window_size=8)
+
+def test_duplicate_rejected(replay):
+    assert replay.check_and_update(SENDER, 5)
+    assert not replay.check_and_update(SENDER, 5)
+
+def test_reordered_frames_inside_window_accepted_once(replay):
+    for counter in (10, 8, 9, 7):
+        assert replay.check_and_update(SENDER, counter)
+
+    assert not replay.check_and_update(SENDER, 8)
+
+def test_counter_behind_window_rejected(replay):
+    replay.update(SENDER, 20)
+
+    assert replay.check(SENDER, 13)
+    assert not replay.check(SENDER, 12)
+
+def test_large_jump_resets_bitmap(replay):
+    replay.update(SENDER, 3)
+    replay.update(SENDER, 100)
+
+    assert replay.check(SENDER, 99)
+    assert not replay.check(SENDER, 3)
+
+def test_check_does_not_modify_state(replay):
+    assert replay.check(SENDER, 1)
+    assert replay.check(SENDER, 1)
+
+def test_senders_are_independent(replay):
+    replay.update(SENDER, 1)
+
+    assert replay.check(0xB4E82D53, 1)
@@ -0,0 +1,149 @@
+import pytest
+from secure_lora.constants import BROADCAST_ID, MsgType, ROUTE_DISCOVERY_RETRIES
+from secure_lora.packet import Packet
+from secure_lora.peers import Peer
+from secure_lora.routing import (
+    ROUTE_ERROR, ROUTE_REPLY, ROUTE_REQUEST, ROUTED_HEADER, Router, link_etx
+)
+
+NODE_A = 0xA3F91C42
+NODE_B = 0xB4E82D53
+NODE_C = 0xC5D73E64
+NODE_D = 0xD6C84F75
+
+class Node:
+    """A Router capturing its transmitted frames and scheduled timers."""
+    def __init__(self, node_id, clock, costs=None):
+        self.clock = clock
+        self.sent = []
+        self.timers = []
+        self.costs = costs or {}
+        self.router = Router(
+            node_id,
+            lambda *frame: self.sent.append(frame),
+            lambda delay, callback: self.timers.append((delay, callback)),
+            lambda neighbour: self.costs.get(neighbour, 1.0),
+            lifetime=60.0, clock=self.clock,
+        )
+
+    def hear(self, sender_id, frame):
+        msg_type, payload, _ = frame
+        packet = Packet(1, sender_id, msg_type, payload, b"", b"")
+        return self.router.handle(packet)
+
+    def pop(self):
+        frames, self.sent = self.sent, []
+        return frames
+
+def relay_request(nodes, path):
+    """Passes the origin's route request along `path`, returns the request as the last node heard it."""
+    (request,) = nodes[path[0]].pop()
+    for previous, node in zip(path, path[1:]):
+        nodes[node].hear(previous, request)
+        frames = nodes[node].pop()
+        if frames:
+            request = frames[0]
+    return frames
+
+@pytest.fixture
+def line(clock):
+    # A - B - C
+    return {node_id: Node(node_id, clock) for node_id in (NODE_A, NODE_B, NODE_C)}
+
+def discover(line):
+    line[NODE_A].router.send(MsgType.DATA, b"hello", NODE_C)
+    (reply,) = relay_request(line, [NODE_A, NODE_B, NODE_C])
+    line[NODE_B].hear(NODE_C, reply)
+    (reply,) = line[NODE_B].pop()
+    line[NODE_A].hear(NODE_B, reply)
+
+def test_discovery_installs_routes_both_ways(line):
+    discover(line)
+
+    assert line[NODE_A].router.routes() == {NODE_C: NODE_B}
+    assert line[NODE_B].router.routes() == {NODE_A: NODE_A, NODE_C: NODE_C}
+    assert line[NODE_C].router.routes() == {NODE_A: NODE_B}
+
+def test_buffered_message_follows_route(line):
+    discover(line)
+
+    (frame,) = line[NODE_A].pop()
+    assert frame[0] == MsgType.ROUTED and frame[2] == NODE_B
+    line[NODE_B].hear(NODE_A, frame)
+    (frame,) = line[NODE_B].pop()
+    assert frame[2] == NODE_C
+
+    assert line[NODE_C].hear(NODE_B, frame) == (NODE_A, MsgType.DATA, b"hello")
+
+def test_request_rebroadcast_once(line):
+    line[NODE_A].router.send(MsgType.DATA, b"hello", NODE_C)
+    (request,) = line[NODE_A].pop()
+
+    line[NODE_B].hear(NODE_A, request)
+    line[NODE_B].hear(NODE_A, request)
+
+    assert len(line[NODE_B].pop()) == 1
+
+def test_cheaper_path_preferred(clock):
+    # A reaches D through B (cost 1 + 1) or C (cost 4 + 1); C's copy arrives first
+    nodes = {n: Node(n, clock) for n in (NODE_A, NODE_B, NODE_C)}
+    nodes[NODE_D] = Node(NODE_D, clock, costs={NODE_B: 1.0, NODE_C: 1.0})
+    nodes[NODE_C].costs[NODE_A] = 4.0
+    nodes[NODE_A].router.send(MsgType.DATA, b"x", NODE_D)
+    (request,) = nodes[NODE_A].pop()
+
+    for relay in (NODE_C, NODE_B):
+        nodes[relay].hear(NODE_A, request)
+        (forwarded,) = nodes[relay].pop()
+        nodes[NODE_D].hear(relay, forwarded)
+
+    replies = nodes[NODE_D].pop()
+    assert [frame[2] for frame in replies] == [NODE_C, NODE_B]
+    assert nodes[NODE_D].router.next_hop(NODE_A) == NODE_B
+
+def test_discovery_retries_then_drops(line):
+    node = line[NODE_A]
+    node.router.send(MsgType.DATA, b"nobody", 0x12345678)
+
+    for attempt in range(ROUTE_DISCOVERY_RETRIES + 1):
+        (frame,) = node.pop()
+        assert (frame[0], frame[2]) == (MsgType.ROUTE_REQUEST, BROADCAST_ID)
+        (delay, callback), = node.timers
+        node.timers.clear()
+        callback()
+
+    assert node.pop() == []
+    assert node.router.counts["no_route"] == 1
+
+def test_route_error_when_next_hop_gone(line):
+    discover(line)
+    line[NODE_B].router.link_lost(NODE_C)
+
+    (frame,) = line[NODE_A].pop()
+    line[NODE_B].hear(NODE_A, frame)
+    (error,) = line[NODE_B].pop()
+    assert (error[0], error[2]) == (MsgType.ROUTE_ERROR, NODE_A)
+
+    line[NODE_A].hear(NODE_B, error)
+    assert line[NODE_A].router.routes() == {}
+    assert line[NODE_A].router.counts["errors"] == 1
+
+def test_routes_expire(line):
+    discover(line)
+    line[NODE_A].clock.now = 61.0
+
+    assert line[NODE_A].router.next_hop(NODE_C) is None
+
+def test_malformed_frame_rejected(line):
+    with pytest.raises(ValueError):
+        line[NODE_B].hear(NODE_A, (MsgType.ROUTE_REPLY, b"short", NODE_B))
+
+def test_link_etx():
+    peer = Peer(NODE_B, 0.0)
+    peer.delivery = 0.5
+    assert link_etx(peer) == pytest.approx(4.0)
+
+    peer.delivery, peer.snr = 1.0, -10.0
+    assert link_etx(peer, required_snr=-20.0) == pytest.approx(1.0)
+    assert link_etx(peer, required_snr=-12.5) == pytest.approx(4.0)
+    assert link_etx(None) == pytest.approx(100.0)
@@ -0,0 +1,61 @@
+import threading
+import pytest
+from secure_lora.rx_queue import BLOCK, DROP_NEWEST, DROP_OLDEST, PacketQueue
+
+def test_get_many_drains_in_order():
+    q = PacketQueue(capacity=8)
+    for i in range(5):
+        q.put(i)
+
+    assert q.get_many(3) == [0, 1, 2]
+    assert q.get_many(10) == [3, 4]
+    assert q.get_many(10) == []
+
+def test_drop_oldest():
+    q = PacketQueue(capacity=2, policy=DROP_OLDEST)
+    results = [q.put(i) for i in range(3)]
+
+    assert results == [True, True, False]
+    assert q.get_many(10) == [1, 2]
+    assert q.overflows == 1
+
+def test_drop_newest():
+    q = PacketQueue(capacity=2, policy=DROP_NEWEST)
+    for i in range(3):
+        q.put(i)
+
+    assert q.get_many(10) == [0, 1]
+    assert q.overflows == 1
+
+def test_block_waits_for_space():
+    q = PacketQueue(capacity=1, policy=BLOCK)
+    q.put(0)
+    producer = threading.Thread(target=q.put, args=(1,))
+    producer.start()
+    producer.join(timeout=0.05)
+    assert producer.is_alive()
+
+    assert q.get_many(1) == [0]
+    producer.join(timeout=1.0)
+    assert q.get_many(1, timeout=1.0) == [1]
+    assert q.overflows == 0
+
+def test_close_releases_blocked_producer():
+    q = PacketQueue(capacity=1, policy=BLOCK)
+    q.put(0)
+    producer = threading.Thread(target=q.put, args=(1,))
+    producer.start()
+
+    q.close()
+    producer.join(timeout=1.0)
+    assert not producer.is_alive()
+
+def test_get_many_waits_for_first_item():
+    q = PacketQueue()
+    threading.Timer(0.05, q.put, args=("late",)).start()
+
+    assert q.get_many(4, timeout=1.0) == ["late"]
+
+def test_invalid_policy_rejected():
+    with pytest.raises(ValueError):
+        PacketQueue(policy="drop_everything")
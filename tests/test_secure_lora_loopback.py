@@ -0,0 +1,685 @@
+import itertools
+import random
+import threading
+import time
+import pytest
+from dummy_network import DummyRadio, LoopbackNetwork
+import secure_lora.secure_lora
+from secure_lora.secure_lora import SecureLoRa, TxQueueFull
+from secure_lora.keystore import KeyStore
+from secure_lora.constants import (
+    MsgType, PROTOCOL_VERSION, COMPACT_PROTOCOL_VERSION, MAX_PAYLOAD_SIZE, DUTY_CYCLE_WINDOW, BROADCAST_ID,
+    STORE_FLUSH_INTERVAL, HOP_RELAYED
+)
+from secure_lora.fragment import FRAGMENT_CHUNK_SIZE
+from secure_lora.packet import Packet
+from secure_lora.peers import PEER_ADDED, PEER_LOST
+from secure_lora.radio import radio_param
+from secure_lora.routing import ROUTED_COUNTER, ROUTED_HEADER
+from secure_lora.store_forward import STORE_EVICTED, STORE_SENT
+
+NODE_A = 0xA3F91C42
+NODE_B = 0xB4E82D53
+NODE_C = 0xC5D73E64
+
+@pytest.fixture
+def keys():
+    keys = KeyStore()
+    keys.add_key(NODE_A, b"A" * 16)
+    keys.add_key(NODE_B, b"B" * 16)
+    keys.add_key(NODE_C, b"C" * 16)
+    return keys
+
+@pytest.fixture
+def network():
+    return LoopbackNetwork()
+
+@pytest.fixture
+def lora_a(network, keys):
+    with SecureLoRa(DummyRadio(network), NODE_A, keys) as lora:
+        yield lora
+
+@pytest.fixture
+def lora_b(network, keys):
+    with SecureLoRa(DummyRadio(network), NODE_B, keys) as lora:
+        yield lora
+
+def test_data_roundtrip(lora_a, lora_b):
+    lora_a.send(MsgType.DATA, b"Secure Hello LoRa")
+
+    packet = lora_b.receive(timeout=1.0)
+
+    assert packet is not None
+    assert packet.sender_id == NODE_A
+    assert packet.payload == b"Secure Hello LoRa"
+
+def test_stop_interrupts_blocking_receive(network, keys):
+    lora = SecureLoRa(DummyRadio(network), NODE_A, keys)
+    lora.stop()
+
+    assert not lora._io_thread.is_alive()
+
+def test_replayed_frame_dropped(network, lora_a, lora_b):
+    sniffer = DummyRadio(network)
+    lora_a.send(MsgType.DATA, b"once")
+    assert lora_b.receive(timeout=1.0).payload == b"once"
+
+    # Drain anything else the sniffer heard (e.g. discovery) and replay the DATA frame
+    frames = []
+    while (frame := sniffer.receive()) is not None:
+        frames.append(frame)
+    for frame in frames:
+        sniffer.send(frame)
+
+    assert lora_b.receive(timeout=0.3) is None
+
+def test_counter_resumes_after_restart(network, keys, tmp_path):
+    path = str(tmp_path / "counter")
+
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, counter_path=path) as lora:
+        lora.send(MsgType.DATA, b"before restart")
+        used = lora.counter
+
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, counter_path=path) as lora:
+        assert lora.counter >= used
+
+def forged_frame(sender_id, counter=1):
+    nonce = counter.to_bytes(8, "big") + sender_id.to_bytes(4, "big")
+    return Packet(PROTOCOL_VERSION, sender_id, MsgType.DATA, b"garbage", b"T" * 16, nonce).serialize()
+
+def test_rx_filter_drop_counters(network, lora_b):
+    attacker = DummyRadio(network)
+    attacker.send(b"short")
+    attacker.send(forged_frame(0xDEADBEEF))
+    attacker.send(forged_frame(NODE_A))
+
+    assert lora_b.receive(timeout=0.3) is None
+    stats = lora_b.get_drop_stats()
+    assert stats["malformed"] == 1
+    assert stats["unknown_sender"] == 1
+    assert stats["auth_failed"] == 1
+
+def test_forged_flood_is_rate_limited_before_decrypt(network, lora_b):
+    attacker = DummyRadio(network)
+    for counter in range(1, 51):
+        attacker.send(forged_frame(NODE_A, counter))
+
+    deadline = time.monotonic() + 2.0
+    while sum(lora_b.get_drop_stats().values()) < 50 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    stats = lora_b.get_drop_stats()
+    assert stats["rate_limited"] > 0
+    assert stats["auth_failed"] + stats["rate_limited"] == 50
+
+def test_unicast_for_other_node_dropped_before_decrypt(lora_a, lora_b):
+    lora_a.send(MsgType.DATA, b"not yours", destination=0xC0FFEE00)
+    lora_a.send(MsgType.DATA, b"yours", destination=NODE_B)
+
+    packet = lora_b.receive(timeout=1.0)
+
+    assert packet.payload == b"yours"
+    assert packet.destination == NODE_B
+    assert lora_b.get_drop_stats()["not_for_us"] == 1
+
+def test_group_destination(lora_a, lora_b):
+    lora_b.join_group(0x10)
+    lora_a.send(MsgType.DATA, b"group", destination=0x10)
+
+    assert lora_b.receive(timeout=1.0).payload == b"group"
+
+def test_destination_is_authenticated(network, lora_b):
+    sniffer = DummyRadio(network)
+    with SecureLoRa(DummyRadio(network), NODE_A, lora_b.key_store) as lora_a:
+        lora_a.send(MsgType.DATA, b"to a group", destination=0x10)
+
+    lora_b.join_group(0x20)
+    for frame in iter(sniffer.receive, None):
+        packet = Packet.parse(bytearray(frame))
+        if packet.destination == 0x10:
+            packet.destination = 0x20
+            sniffer.send(packet.serialize())
+
+    assert lora_b.receive(timeout=0.3) is None
+    assert lora_b.get_drop_stats()["auth_failed"] == 1
+
+def test_relayed_discovery_dropped(network, keys):
+    sniffer = DummyRadio(network)
+    with SecureLoRa(DummyRadio(network), NODE_A, keys) as lora_a:
+        lora_a._send_discovery()
+    frames = [bytearray(frame) for frame in iter(sniffer.receive, None)]
+    discovery = next(f for f in frames if Packet.parse(f).msg_type == MsgType.DISCOVERY)
+    discovery[5] |= HOP_RELAYED << 4  # unauthenticated, so anyone can set it
+
+    with SecureLoRa(DummyRadio(network), NODE_B, keys) as lora_b:
+        sniffer.send(bytes(discovery))
+        deadline = time.monotonic() + 1.0
+        while not lora_b.get_drop_stats() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert lora_b.get_drop_stats()["relayed_link_local"] == 1
+        assert lora_b.peers.get(NODE_A) is None
+        # The I/O thread is still running
+        with SecureLoRa(DummyRadio(network), NODE_A, keys) as lora_a:
+            lora_a.send(MsgType.DATA, b"still here")
+            assert lora_b.receive(timeout=1.0).payload == b"still here"
+
+def test_compact_frames_only_towards_capable_peers(network, keys, lora_b):
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, compact=True, tag_size=8) as lora_a:
+        lora_a.peers.observe(NODE_B).versions = {PROTOCOL_VERSION}
+        lora_a.send(MsgType.DATA, b"legacy peer", destination=NODE_B)
+        lora_a.peers.get(NODE_B).versions = {PROTOCOL_VERSION, COMPACT_PROTOCOL_VERSION}
+        lora_a.send(MsgType.DATA, b"compact peer", destination=NODE_B)
+
+        first = lora_b.receive(timeout=1.0)
+        second = lora_b.receive(timeout=1.0)
+
+    assert (first.version, first.payload) == (PROTOCOL_VERSION, b"legacy peer")
+    assert (second.version, second.payload) == (COMPACT_PROTOCOL_VERSION, b"compact peer")
+    assert len(second.auth_tag) == 8
+
+def test_tags_below_minimum_refused(network, keys):
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, compact=True, tag_size=4) as lora_a, \
+            SecureLoRa(DummyRadio(network), NODE_B, keys, tag_size=16) as lora_b:
+        lora_a.peers.observe(NODE_B).versions = {PROTOCOL_VERSION, COMPACT_PROTOCOL_VERSION}
+        lora_a.send(MsgType.DATA, b"weak tag", destination=NODE_B)
+
+        assert lora_b.receive(timeout=0.3) is None
+        assert lora_b.get_drop_stats()["short_tag"] == 1
+
+    with pytest.raises(ValueError):
+        SecureLoRa(DummyRadio(network), NODE_B, keys, min_rx_tag_size=6)
+
+def test_discovery_advertises_compact_support(lora_a, lora_b):
+    deadline = time.monotonic() + 3.0
+    while NODE_A not in lora_b.peers and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert lora_b.peers.get(NODE_A).versions == {PROTOCOL_VERSION, COMPACT_PROTOCOL_VERSION}
+
+def test_send_large_reassembles(lora_a, lora_b):
+    message = bytes(range(256)) * 4
+
+    lora_a.send_large(MsgType.DATA, message)
+
+    packet = lora_b.receive(timeout=1.0)
+    assert packet.msg_type == MsgType.DATA
+    assert packet.payload == message
+
+def test_restarted_sender_fragments_not_merged(network, keys, tmp_path, monkeypatch):
+    starts = itertools.count(0, 0x1001)
+    monkeypatch.setattr(random, "getrandbits", lambda bits: next(starts))
+    counter_path = str(tmp_path / "counter")
+    sniffer = DummyRadio(network)
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, counter_path=counter_path) as lora_a:
+        lora_a.send_large(MsgType.DATA, bytes(FRAGMENT_CHUNK_SIZE * 3))
+    fragments = [f for f in iter(sniffer.receive, None) if Packet.parse(f).msg_type == MsgType.FRAGMENT]
+
+    with SecureLoRa(DummyRadio(network), NODE_B, keys) as lora_b:
+        for frame in fragments[:2]:  # the last fragment was lost before the reboot
+            sniffer.send(frame)
+        with SecureLoRa(DummyRadio(network), NODE_A, keys, counter_path=counter_path) as lora_a:
+            lora_a.send_large(MsgType.DATA, b"after reboot" * 15)  # two fragments, not three
+
+        assert lora_b.receive(timeout=1.0).payload == b"after reboot" * 15
+
+def test_send_rejects_oversized_payload(lora_a):
+    with pytest.raises(ValueError):
+        lora_a.send(MsgType.DATA, bytes(MAX_PAYLOAD_SIZE + 1))
+
+def test_aggregated_messages_split_on_receive(network, keys, lora_b):
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, aggregation_delay=0.05) as lora_a:
+        for i in range(3):
+            lora_a.send(MsgType.DATA, b"reading %d" % i)
+
+        payloads = [lora_b.receive(timeout=1.0).payload for _ in range(3)]
+
+    assert payloads == [b"reading 0", b"reading 1", b"reading 2"]
+    assert lora_a.aggregator.frames_saved == 2
+
+class SlowRadio(DummyRadio):
+    """DummyRadio whose frames each take 1 s of airtime."""
+    def time_on_air(self, length):
+        return 1.0
+
+def test_duty_cycle_drops_frames_over_budget(network, keys, lora_b):
+    with SecureLoRa(SlowRadio(network), NODE_A, keys, duty_cycle=2.5 / DUTY_CYCLE_WINDOW) as lora:
+        for payload in (b"one", b"two", b"three"):
+            lora.send(MsgType.DATA, payload)
+
+        assert lora_b.receive(timeout=1.0).payload == b"one"
+        assert lora_b.receive(timeout=1.0).payload == b"two"
+        assert lora_b.receive(timeout=0.3) is None
+        assert lora.get_duty_cycle_remaining() == pytest.approx(0.5)
+        assert lora.get_tx_drop_stats() == {"duty_cycle": 1}
+
+class GatedRadio(DummyRadio):
+    """DummyRadio whose send() blocks until the test opens the gate."""
+    def __init__(self, network):
+        super().__init__(network)
+        self.sending = threading.Event()
+        self.gate = threading.Event()
+
+    def send(self, data):
+        self.sending.set()
+        self.gate.wait(timeout=2.0)
+        super().send(data)
+
+def test_tx_queue_sends_by_priority(network, keys):
+    sniffer = DummyRadio(network)
+    radio = GatedRadio(network)
+    with SecureLoRa(radio, NODE_A, keys) as lora:
+        lora.send(MsgType.DATA, b"first")
+        assert radio.sending.wait(timeout=1.0)
+
+        lora.send(MsgType.DATA, b"data")
+        lora.send(MsgType.ACK, b"ack")
+        lora.send(MsgType.COMMAND, b"command")
+        radio.gate.set()
+
+        deadline = time.monotonic() + 1.0
+        frames = []
+        while len(frames) < 4 and time.monotonic() < deadline:
+            if sniffer.wait_for_packet(0.1):
+                frames.append(Packet.parse(sniffer.receive()))
+
+    assert [f.msg_type for f in frames] == [MsgType.DATA, MsgType.COMMAND, MsgType.ACK, MsgType.DATA]
+    # Counters follow transmission order
+    assert [f.counter for f in frames] == sorted(f.counter for f in frames)
+
+def test_full_tx_queue_raises(network, keys):
+    radio = GatedRadio(network)
+    with SecureLoRa(radio, NODE_A, keys, tx_queue_size=2) as lora:
+        lora.send(MsgType.DATA, b"in flight")
+        assert radio.sending.wait(timeout=1.0)
+        lora.send(MsgType.DATA, b"queued 1")
+        lora.send(MsgType.DATA, b"queued 2")
+
+        with pytest.raises(TxQueueFull):
+            lora.send(MsgType.DATA, b"overflow")
+        radio.gate.set()
+
+def test_aggregated_sends_survive_full_tx_queue(network, keys):
+    radio = GatedRadio(network)
+    with SecureLoRa(radio, NODE_A, keys, tx_queue_size=1, aggregation_delay=5.0) as lora:
+        lora.send(MsgType.COMMAND, b"in flight")
+        assert radio.sending.wait(timeout=1.0)
+        for _ in range(9):
+            lora.send(MsgType.DATA, bytes(100))  # each one closes the previous batch
+    # Batches the queue never took are counted, not lost silently
+    assert lora.get_tx_drop_stats()["tx_queue_full"] > 0
+
+class LossyRadio(DummyRadio):
+    """DummyRadio that loses the first `losses` frames of a given type."""
+    def __init__(self, network, msg_type, losses=1):
+        super().__init__(network)
+        self.msg_type = msg_type
+        self.losses = losses
+
+    def send(self, data):
+        if self.losses and Packet.parse(data).msg_type == self.msg_type:
+            self.losses -= 1
+            return
+        super().send(data)
+
+def test_send_reliable_acknowledged(lora_a, lora_b):
+    future = lora_a.send_reliable(MsgType.DATA, b"important", NODE_B)
+
+    assert future.result(timeout=2.0) is True
+    packet = lora_b.receive(timeout=1.0)
+    assert (packet.msg_type, packet.payload) == (MsgType.DATA, b"important")
+
+def test_send_reliable_retransmits_lost_frame(network, keys, lora_b):
+    with SecureLoRa(LossyRadio(network, MsgType.RELIABLE), NODE_A, keys) as lora_a:
+        lora_a.reliable.initial_rto = 0.1
+        future = lora_a.send_reliable(MsgType.DATA, b"second try", NODE_B)
+
+        assert future.result(timeout=2.0) is True
+        assert lora_a.reliable.retransmissions == 1
+    assert lora_b.receive(timeout=1.0).payload == b"second try"
+
+def test_lost_ack_delivers_once(network, keys, lora_a):
+    with SecureLoRa(LossyRadio(network, MsgType.ACK), NODE_B, keys) as lora_b:
+        lora_a.reliable.initial_rto = 0.1
+        future = lora_a.send_reliable(MsgType.DATA, b"once only", NODE_B)
+
+        assert future.result(timeout=2.0) is True
+        assert lora_b.receive(timeout=1.0).payload == b"once only"
+        assert lora_b.receive(timeout=0.2) is None
+        assert lora_b.get_drop_stats()["duplicate"] == 1
+
+def test_send_reliable_rejects_broadcast(lora_a):
+    with pytest.raises(ValueError):
+        lora_a.send_reliable(MsgType.DATA, b"everyone", BROADCAST_ID)
+
+class TunableRadio(DummyRadio):
+    """DummyRadio with LoRa settings that records the SF of every frame sent."""
+    def __init__(self, network, snr=10.0):
+        super().__init__(network)
+        self._sf = 12
+        self._bw = 125000
+        self.snr = snr
+        self.sent_sf = []
+
+    @property
+    @radio_param("enum", [7, 8, 9, 10, 11, 12])
+    def spreading_factor(self):
+        return self._sf
+
+    @spreading_factor.setter
+    def spreading_factor(self, value):
+        self._sf = value
+
+    @property
+    @radio_param("enum", [125000, 250000, 500000])
+    def signal_bandwidth(self):
+        return self._bw
+
+    @signal_bandwidth.setter
+    def signal_bandwidth(self, value):
+        self._bw = value
+
+    def signal_quality(self):
+        return -70.0, self.snr
+
+    def send(self, data):
+        self.sent_sf.append((Packet.parse(data).destination, self._sf))
+        super().send(data)
+
+def test_adr_switches_sf_for_close_unicast_peer(network, keys, lora_b):
+    radio = TunableRadio(network)
+    with SecureLoRa(radio, NODE_A, keys, adr=True) as lora_a:
+        for i in range(3):
+            lora_b.send(MsgType.DATA, b"hello %d" % i, destination=NODE_A)
+            assert lora_a.receive(timeout=1.0).snr == 10.0
+
+        lora_a.send(MsgType.DATA, b"fast", destination=NODE_B)
+        lora_a.send(MsgType.DATA, b"everyone")
+        assert lora_b.receive(timeout=1.0).payload == b"fast"
+        assert lora_b.receive(timeout=1.0).payload == b"everyone"
+
+    assert (NODE_B, 7) in radio.sent_sf
+    assert (BROADCAST_ID, 12) in radio.sent_sf
+    assert radio.spreading_factor == 12
+
+def test_adr_requires_tunable_radio(network, keys):
+    with pytest.raises(ValueError):
+        SecureLoRa(DummyRadio(network), NODE_A, keys, adr=True)
+
+def test_listen_before_talk_defers_while_channel_busy(keys):
+    network = LoopbackNetwork(busy_time=0.1)
+    with SecureLoRa(DummyRadio(network), NODE_B, keys) as lora_b, \
+            SecureLoRa(DummyRadio(network), NODE_A, keys, listen_before_talk=True) as lora_a:
+        lora_b.send(MsgType.DATA, b"talking")
+        assert lora_a.receive(timeout=1.0).payload == b"talking"
+        lora_a.send(MsgType.DATA, b"after you")
+
+        assert lora_b.receive(timeout=2.0).payload == b"after you"
+        stats = lora_a.get_lbt_stats()
+    assert stats["deferrals"] >= 1
+    assert stats["collisions_avoided"] == 1
+
+def test_beacon_suppressed_after_broadcast_data(lora_a, lora_b):
+    lora_a._beacon()
+    assert lora_b.receive(timeout=0.3) is None  # discovery isn't delivered to the app
+
+    lora_a.send(MsgType.DATA, b"still here")
+    assert lora_b.receive(timeout=1.0).payload == b"still here"
+    # The I/O thread notes the broadcast just after the radio returns
+    deadline = time.monotonic() + 1.0
+    while lora_a._last_presence == float("-inf") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    lora_a._beacon()
+
+    assert lora_a.get_beacon_stats()["sent"] >= 1
+    assert lora_a.get_beacon_stats()["suppressed"] == 1
+
+def test_any_authenticated_frame_marks_peer_present(lora_a, lora_b):
+    lora_a.send(MsgType.DATA, b"hello")
+    lora_b.receive(timeout=1.0)
+
+    assert NODE_A in lora_b.get_peers()
+
+def test_link_estimate_ignores_unrelated_traffic(network, keys, lora_b):
+    with SecureLoRa(DummyRadio(network), NODE_A, keys) as lora_a:
+        for _ in range(4):
+            for _ in range(3):
+                lora_a.send(MsgType.DATA, b"for someone else", destination=0xC0FFEE00)
+            lora_a._send_discovery()
+        deadline = time.monotonic() + 1.0
+        while lora_b.get_drop_stats().get("not_for_us", 0) < 12 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    peer = lora_b.peers.get(NODE_A)
+    assert peer.beacon_seq == lora_a._beacon_seq
+    assert peer.delivery_ratio == pytest.approx(1.0)
+
+def test_peer_events_and_expiry(network, keys, lora_b):
+    events = []
+    lora_b.peers.timeout = 0.3
+    lora_b.subscribe_peers(lambda event, peer: events.append((event, peer.sender_id)))
+
+    with SecureLoRa(DummyRadio(network), NODE_A, keys) as lora_a:
+        lora_a.send(MsgType.DATA, b"hello")
+        packet = lora_b.receive(timeout=1.0)
+
+    assert lora_b.peers.get(NODE_A).packets >= 1
+    deadline = time.monotonic() + 2.0
+    while len(events) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert events == [(PEER_ADDED, NODE_A), (PEER_LOST, NODE_A)]
+    assert NODE_A not in lora_b.get_peers()
+
+def test_receive_many_and_overflow_accounting(network, keys, lora_a):
+    with SecureLoRa(DummyRadio(network), NODE_B, keys, rx_queue_size=3) as lora_b:
+        for i in range(5):
+            lora_a.send(MsgType.DATA, b"msg %d" % i)
+
+        deadline = time.monotonic() + 1.0
+        while lora_b.get_drop_stats().get("rx_overflow", 0) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        packets = lora_b.receive_many(10)
+        assert [p.payload for p in packets] == [b"msg 2", b"msg 3", b"msg 4"]
+        assert lora_b.get_drop_stats()["rx_overflow"] == 2
+        assert lora_b.receive_many(10) == []
+
+@pytest.fixture
+def line(network, keys):
+    """A <-> relay B <-> C, with A and C out of range of each other."""
+    radio_a, radio_b, radio_c = DummyRadio(network), DummyRadio(network), DummyRadio(network)
+    network.disconnect(radio_a, radio_c)
+    with SecureLoRa(radio_a, NODE_A, keys, hop_limit=2) as lora_a, \
+            SecureLoRa(radio_b, NODE_B, keys, relay=True) as relay, \
+            SecureLoRa(radio_c, NODE_C, keys) as lora_c:
+        yield lora_a, relay, lora_c
+
+def test_relay_forwards_to_node_out_of_range(line):
+    lora_a, relay, lora_c = line
+    lora_a.send(MsgType.DATA, b"two hops", destination=NODE_C)
+
+    packet = lora_c.receive(timeout=2.0)
+
+    assert packet.payload == b"two hops"
+    assert (packet.sender_id, packet.relayed, packet.hop_limit) == (NODE_A, True, 1)
+    # Heard only through the relay, so not a neighbour
+    assert NODE_A not in lora_c.get_peers()
+    assert relay.receive(timeout=0.1) is None
+    assert relay.get_relay_stats()["relayed"] == 1
+
+def test_relayed_broadcast_delivered_once(line):
+    lora_a, relay, lora_c = line
+    lora_a.send(MsgType.DATA, b"everyone")
+
+    assert relay.receive(timeout=2.0).payload == b"everyone"
+    assert lora_c.receive(timeout=2.0).payload == b"everyone"
+    assert lora_c.receive(timeout=0.3) is None
+
+def test_frames_without_hop_limit_not_relayed(network, keys):
+    radio_a, radio_c = DummyRadio(network), DummyRadio(network)
+    network.disconnect(radio_a, radio_c)
+    with SecureLoRa(radio_a, NODE_A, keys) as lora_a, \
+            SecureLoRa(DummyRadio(network), NODE_B, keys, relay=True) as relay, \
+            SecureLoRa(radio_c, NODE_C, keys) as lora_c:
+        lora_a.send(MsgType.DATA, b"one hop")
+
+        assert relay.receive(timeout=1.0).payload == b"one hop"
+        assert lora_c.receive(timeout=0.3) is None
+        assert relay.get_relay_stats() == {}
+
+def test_relay_suppressed_after_enough_copies(network, keys, monkeypatch):
+    monkeypatch.setattr("secure_lora.secure_lora.random.uniform", lambda low, high: high)
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, hop_limit=1) as lora_a, \
+            SecureLoRa(DummyRadio(network), NODE_B, keys, relay=True) as relay:
+        sniffer = DummyRadio(network)
+        relay.radio.time_on_air = lambda length: 0.1  # rebroadcast after 0.4 s
+        lora_a.send(MsgType.DATA, b"crowded")
+        assert relay.receive(timeout=1.0).payload == b"crowded"
+
+        # Other relays in range got there first
+        frame = next(f for f in iter(sniffer.receive, None) if Packet.parse(f).msg_type == MsgType.DATA)
+        for _ in range(2):
+            sniffer.send(frame)
+
+        deadline = time.monotonic() + 2.0
+        while not relay.get_relay_stats().get("suppressed") and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert relay.get_relay_stats() == {"scheduled": 1, "suppressed": 1}
+        assert relay.get_drop_stats()["flood_duplicate"] == 2
+
+def test_send_routed_over_two_hops(network, keys):
+    radio_a, radio_b, radio_c = DummyRadio(network), DummyRadio(network), DummyRadio(network)
+    network.disconnect(radio_a, radio_c)
+    with SecureLoRa(radio_a, NODE_A, keys, routing=True) as lora_a, \
+            SecureLoRa(radio_b, NODE_B, keys, routing=True) as lora_b, \
+            SecureLoRa(radio_c, NODE_C, keys, routing=True) as lora_c:
+        lora_a.send_routed(MsgType.DATA, b"via b", NODE_C)
+
+        packet = lora_c.receive(timeout=2.0)
+        assert (packet.sender_id, packet.payload, packet.relayed) == (NODE_A, b"via b", True)
+        assert lora_a.get_routes() == {NODE_C: NODE_B}
+        assert lora_b.get_route_stats()["forwarded"] == 1
+        assert lora_b.receive(timeout=0.1) is None
+
+def test_routed_origin_cannot_be_spoofed(network, keys):
+    with SecureLoRa(DummyRadio(network), NODE_B, keys) as lora_b, \
+            SecureLoRa(DummyRadio(network), NODE_C, keys, routing=True) as lora_c:
+        # B claims to pass on a message A never sealed
+        forged = ROUTED_HEADER.pack(NODE_A, NODE_C, 1, MsgType.DATA) + ROUTED_COUNTER.pack(99) + b"forged" + b"T" * 16
+        lora_b.send(MsgType.ROUTED, forged, destination=NODE_C)
+
+        assert lora_c.receive(timeout=0.3) is None
+        assert lora_c.get_drop_stats()["auth_failed"] == 1
+
+def test_send_routed_requires_routing(lora_a):
+    with pytest.raises(RuntimeError):
+        lora_a.send_routed(MsgType.DATA, b"x", NODE_B)
+
+def test_store_and_forward_flushes_when_peer_returns(network, keys, tmp_path):
+    events = []
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, store_path=str(tmp_path / "store.db")) as lora_a:
+        lora_a.subscribe_store(lambda *event: events.append(event))
+        first = lora_a.send_or_store(MsgType.DATA, b"while asleep", NODE_B)
+        second = lora_a.send_or_store(MsgType.DATA, b"x" * 300, NODE_B)
+        assert first is not None and second is not None
+
+        with SecureLoRa(DummyRadio(network), NODE_B, keys) as lora_b:
+            # B's first beacon makes it a peer again
+            assert lora_b.receive(timeout=2.0).payload == b"while asleep"
+            assert lora_b.receive(timeout=STORE_FLUSH_INTERVAL + 2.0).payload == b"x" * 300
+            assert events == [(STORE_SENT, first), (STORE_SENT, second)]
+
+            # In range now, so sent with the next flush, and stored until ACKed
+            third = lora_a.send_or_store(MsgType.DATA, b"awake", NODE_B)
+            assert lora_b.receive(timeout=STORE_FLUSH_INTERVAL + 1.0).payload == b"awake"
+            deadline = time.monotonic() + 1.0
+            while len(events) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert events[2] == (STORE_SENT, third)
+        assert len(lora_a.store) == 0
+
+def test_stored_message_kept_until_acked(network, keys, tmp_path):
+    events = []
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, store_path=str(tmp_path / "store.db")) as lora_a:
+        lora_a.subscribe_store(lambda *event: events.append(event))
+        lora_a.reliable.initial_rto = 0.1
+        lora_a.reliable.max_retries = 1
+        lora_a.peers.observe(NODE_B)  # still in the peer table, but gone
+        entry_id = lora_a.send_or_store(MsgType.DATA, b"are you there", NODE_B)
+
+        time.sleep(1.0)  # both attempts time out
+        assert len(lora_a.store) == 1 and events == []
+
+        with SecureLoRa(DummyRadio(network), NODE_B, keys) as lora_b:
+            # Heard again through its first beacon
+            assert lora_b.receive(timeout=2.0).payload == b"are you there"
+            deadline = time.monotonic() + 1.0
+            while not events and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert events == [(STORE_SENT, entry_id)]
+        assert len(lora_a.store) == 0
+
+def test_stored_messages_expire_without_peer(network, keys, tmp_path, monkeypatch):
+    monkeypatch.setattr(secure_lora.secure_lora, "STORE_EXPIRE_INTERVAL", 0.05)
+    events = []
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, store_path=str(tmp_path / "store.db")) as lora_a:
+        lora_a.subscribe_store(lambda *event: events.append(event))
+        lora_a.store.max_age = 0.1
+        entry_id = lora_a.send_or_store(MsgType.DATA, b"never collected", NODE_B)
+
+        deadline = time.monotonic() + 1.0
+        while not events and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert events == [(STORE_EVICTED, entry_id)]
+        assert lora_a.get_store_stats() == {"age": 1}
+        assert len(lora_a.store) == 0
+
+def test_send_or_store_requires_store(lora_a):
+    with pytest.raises(RuntimeError):
+        lora_a.send_or_store(MsgType.DATA, b"x", NODE_B)
+
+def test_compressed_payload_roundtrip(network, keys):
+    zdict = b"|temp=C batt=V all clear field-station-"
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, compact=True, compression=True,
+                    compression_dict=zdict) as lora_a, \
+            SecureLoRa(DummyRadio(network), NODE_B, keys, compact=True, compression_dict=zdict) as lora_b:
+        peer = lora_a.peers.observe(NODE_B)
+        peer.versions, peer.dictionary = {PROTOCOL_VERSION, COMPACT_PROTOCOL_VERSION}, lora_b.compressor.dictionary_id
+        message = b"field-station-4|temp=21.5C batt=3.9V all clear"
+        lora_a.send(MsgType.DATA, message, destination=NODE_B)
+        lora_a.send(MsgType.DATA, bytes(range(40)), destination=NODE_B)
+
+        assert lora_b.receive(timeout=1.0).payload == message
+        assert lora_b.receive(timeout=1.0).payload == bytes(range(40))
+        stats = lora_a.get_compression_stats()
+        assert (stats["compressed"], stats["raw"]) == (1, 1)
+        assert stats["bytes_saved"] > 10
+
+def test_compression_needs_matching_dictionary(network, keys):
+    message = b"field-station-4|temp=21.5C batt=3.9V all clear"
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, compact=True, compression=True,
+                    compression_dict=b"|temp=C batt=V all clear field-station-") as lora_a, \
+            SecureLoRa(DummyRadio(network), NODE_B, keys, compact=True, compression_dict=b"other") as lora_b:
+        peer = lora_a.peers.observe(NODE_B)
+        peer.versions, peer.dictionary = {PROTOCOL_VERSION, COMPACT_PROTOCOL_VERSION}, lora_b.compressor.dictionary_id
+        lora_a.send(MsgType.DATA, message, destination=NODE_B)
+        assert lora_b.receive(timeout=1.0).payload == message
+        assert lora_a.get_compression_stats() == {}
+
+        # A peer entry claiming our dictionary, e.g. from before B's was changed
+        peer.dictionary = lora_a.compressor.dictionary_id
+        lora_a.send(MsgType.DATA, message, destination=NODE_B)
+        assert lora_b.receive(timeout=0.3) is None
+        assert lora_b.get_drop_stats()["auth_failed"] == 1
+
+def test_discovery_advertises_dictionary(network, keys):
+    with SecureLoRa(DummyRadio(network), NODE_A, keys, compression_dict=b"shared") as lora_a, \
+            SecureLoRa(DummyRadio(network), NODE_B, keys) as lora_b:
+        lora_a._send_discovery()
+        deadline = time.monotonic() + 1.0
+        while (lora_b.peers.get(NODE_A) is None or lora_b.peers.get(NODE_A).dictionary is None) \
+                and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert lora_b.peers.get(NODE_A).dictionary == lora_a.compressor.dictionary_id != 0
@@ -0,0 +1,59 @@
+import pytest
+from secure_lora.constants import MsgType
+from secure_lora.store_forward import MessageStore
+
+NODE_B = 0xB4E82D53
+NODE_C = 0xC5D73E64
+
+@pytest.fixture
+def evicted():
+    return []
+
+@pytest.fixture
+def store(tmp_path, clock, evicted):
+    store = MessageStore(str(tmp_path / "store.db"), max_age=60.0, max_bytes=16,
+                         on_evict=lambda *entry: evicted.append(entry), clock=clock)
+    yield store
+    store.close()
+
+def test_fifo_per_destination(store):
+    first = store.put(NODE_B, MsgType.DATA, b"one")
+    store.put(NODE_C, MsgType.DATA, b"other")
+    store.put(NODE_B, MsgType.COMMAND, b"two")
+
+    assert store.peek(NODE_B) == (first, MsgType.DATA, b"one")
+    store.remove(first)
+    assert store.peek(NODE_B)[1:] == (MsgType.COMMAND, b"two")
+    assert store.count(NODE_B) == 1
+    assert store.destinations() == {NODE_B, NODE_C}
+
+def test_survives_reopen(store, clock):
+    entry_id = store.put(NODE_B, MsgType.DATA, b"durable")
+    store.close()
+
+    reopened = MessageStore(store.path, clock=clock)
+    assert reopened.peek(NODE_B) == (entry_id, MsgType.DATA, b"durable")
+    reopened.close()
+
+def test_evicts_by_age(store, clock, evicted):
+    old = store.put(NODE_B, MsgType.DATA, b"old")
+    clock.now += 30
+    store.put(NODE_B, MsgType.DATA, b"new")
+    clock.now += 31
+
+    assert store.peek(NODE_B)[2] == b"new"
+    assert evicted == [(old, "age")]
+
+def test_evicts_oldest_over_byte_budget(store, evicted):
+    first = store.put(NODE_B, MsgType.DATA, b"12345678")
+    store.put(NODE_C, MsgType.DATA, b"12345678")
+    store.put(NODE_C, MsgType.DATA, b"123")
+
+    assert store.total_bytes() == 11
+    assert store.peek(NODE_B) is None
+    assert evicted == [(first, "bytes")]
+    assert store.evictions["bytes"] == 1
+
+def test_rejects_payload_larger_than_store(store):
+    with pytest.raises(ValueError):
+        store.put(NODE_B, MsgType.DATA, b"x" * 17)
@@ -0,0 +1,106 @@
+import threading
+import pytest
+from secure_lora.sx127x import (
+    ContinuousReceiver, FrameRingBuffer, InterruptPin, RegisterBus,
+    REG_FIFO, REG_FIFO_ADDR_PTR, REG_FIFO_RX_CURRENT_ADDR, REG_IRQ_FLAGS, REG_OP_MODE,
+    REG_RX_NB_BYTES, REG_PKT_RSSI_VALUE, REG_PKT_SNR_VALUE,
+    IRQ_RX_DONE, IRQ_PAYLOAD_CRC_ERROR, IRQ_CAD_DONE, IRQ_CAD_DETECTED, MODE_RX_CONTINUOUS, MODE_CAD,
+)
+
+class FakeSPIDevice(RegisterBus):
+    """Register file + FIFO standing in for an SX1276 on the SPI bus."""
+    def __init__(self):
+        self.registers = {REG_OP_MODE: 0x81}
+        self.fifo = bytearray(256)
+        self.activity = False  # what the next CAD detects
+
+    def read_u8(self, address):
+        return self.registers.get(address, 0)
+
+    def write_u8(self, address, value):
+        if address == REG_IRQ_FLAGS:
+            # Write-one-to-clear
+            self.registers[address] = self.read_u8(address) & ~value
+        else:
+            self.registers[address] = value
+        if address == REG_OP_MODE and value & 0x07 == MODE_CAD:
+            self.registers[REG_IRQ_FLAGS] = IRQ_CAD_DONE | (IRQ_CAD_DETECTED if self.activity else 0)
+
+    def read_into(self, address, buf, length):
+        assert address == REG_FIFO
+        start = self.registers[REG_FIFO_ADDR_PTR]
+        buf[:length] = self.fifo[start:start + length]
+
+    def deliver(self, frame, rssi_raw=100, snr_raw=40, flags=IRQ_RX_DONE, addr=0x20):
+        self.fifo[addr:addr + len(frame)] = frame
+        self.registers[REG_FIFO_RX_CURRENT_ADDR] = addr
+        self.registers[REG_RX_NB_BYTES] = len(frame)
+        self.registers[REG_PKT_RSSI_VALUE] = rssi_raw
+        self.registers[REG_PKT_SNR_VALUE] = snr_raw
+        self.registers[REG_IRQ_FLAGS] = flags
+
+class FakePin(InterruptPin):
+    def on_rising(self, callback):
+        self.callback = callback
+
+    def fire(self):
+        self.callback()
+
+@pytest.fixture
+def device():
+    return FakeSPIDevice()
+
+@pytest.fixture
+def pin():
+    return FakePin()
+
+@pytest.fixture
+def receiver(device, pin):
+    receiver = ContinuousReceiver(device, pin, FrameRingBuffer(slots=2))
+    receiver.start()
+    return receiver
+
+def test_start_enters_rx_continuous(device, receiver):
+    assert device.read_u8(REG_OP_MODE) & 0x07 == MODE_RX_CONTINUOUS
+
+def test_rx_done_copies_frame_and_signal_quality(device, pin, receiver):
+    device.deliver(b"\xff\x01\x00\x00hello", rssi_raw=100, snr_raw=0xF8)
+    pin.fire()
+
+    assert receiver.ring.pop() == (b"\xff\x01\x00\x00hello", 100 - 157, -2.0)
+    assert device.read_u8(REG_IRQ_FLAGS) == 0
+
+def test_crc_error_and_tx_done_edges_are_dropped(device, pin, receiver):
+    device.deliver(b"corrupt", flags=IRQ_RX_DONE | IRQ_PAYLOAD_CRC_ERROR)
+    pin.fire()
+    device.deliver(b"ignored", flags=0x08)  # TxDone
+    pin.fire()
+
+    assert receiver.ring.pop() is None
+    assert receiver.crc_errors == 1
+
+def test_ring_overwrites_oldest_when_full(device, pin, receiver):
+    for frame in (b"one", b"two", b"three"):
+        device.deliver(frame)
+        pin.fire()
+
+    assert receiver.ring.overflows == 1
+    assert receiver.ring.pop()[0] == b"two"
+    assert receiver.ring.pop()[0] == b"three"
+
+def test_wait_wakes_on_edge(device, pin, receiver):
+    device.deliver(b"late")
+    threading.Timer(0.05, pin.fire).start()
+
+    assert receiver.ring.wait(timeout=2.0)
+    assert receiver.ring.pop()[0] == b"late"
+
+def test_channel_activity_detection(device, receiver):
+    assert not receiver.channel_activity()
+
+    device.activity = True
+    assert receiver.channel_activity()
+
+    # Back listening with the CAD flags cleared
+    assert device.read_u8(REG_OP_MODE) & 0x07 == MODE_RX_CONTINUOUS
+    assert device.read_u8(REG_IRQ_FLAGS) == 0
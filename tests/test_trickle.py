@@ -0,0 +1,61 @@
+import pytest
+from secure_lora.trickle import TrickleTimer
+
+class FakeScheduler:
+    """Runs scheduled callbacks on a virtual clock."""
+    def __init__(self):
+        self.now = 0.0
+        self.pending = []
+
+    def __call__(self, delay, callback):
+        self.pending.append((self.now + delay, len(self.pending), callback))
+
+    def run_until(self, end):
+        while self.pending:
+            self.pending.sort()
+            due, _, callback = self.pending[0]
+            if due > end:
+                break
+            self.pending.pop(0)
+            self.now = due
+            callback()
+        self.now = end
+
+@pytest.fixture
+def scheduler():
+    return FakeScheduler()
+
+@pytest.fixture
+def fired(scheduler):
+    return []
+
+@pytest.fixture
+def trickle(scheduler, fired):
+    trickle = TrickleTimer(lambda: fired.append(scheduler.now), scheduler, imin=1.0, imax=8.0)
+    trickle.start()
+    return trickle
+
+def test_interval_doubles_up_to_imax(scheduler, fired, trickle):
+    scheduler.run_until(1.0 + 2.0 + 4.0 + 8.0 + 8.0)
+
+    assert len(fired) == 5
+    assert trickle.interval == 8.0
+    # One beacon in the second half of each interval
+    for (start, length), when in zip([(0, 1), (1, 2), (3, 4), (7, 8), (15, 8)], fired):
+        assert start + length / 2 <= when < start + length
+
+def test_reset_returns_to_imin(scheduler, fired, trickle):
+    scheduler.run_until(7.0)
+    assert trickle.interval == 8.0
+
+    trickle.reset()
+    scheduler.run_until(8.0)
+
+    assert trickle.interval == 2.0
+    assert len(fired) == 4  # three intervals plus one after the reset
+
+def test_reset_at_imin_keeps_interval(scheduler, fired, trickle):
+    trickle.reset()
+    scheduler.run_until(1.0)
+
+    assert len(fired) == 1